@@ -1,5 +1,5 @@
 from django.contrib import admin
-from core.models import URLTable, ExtraURLTable, StressTable, PerformanceLighthouseTable, ResponsiveTable
+from core.models import URLTable, ExtraURLTable, StressTable, PerformanceLighthouseTable, ResponsiveTable, AnalysisJob, LlmReviewCache, LinkRankingCache, LinkHealthCache, PageSpeedCache, PerformanceMetricSample
 
 # Register your models here.
 admin.site.register(URLTable)
@@ -7,3 +7,9 @@ admin.site.register(ExtraURLTable)
 admin.site.register(StressTable)
 admin.site.register(PerformanceLighthouseTable)
 admin.site.register(ResponsiveTable)
+admin.site.register(AnalysisJob)
+admin.site.register(LlmReviewCache)
+admin.site.register(LinkRankingCache)
+admin.site.register(LinkHealthCache)
+admin.site.register(PageSpeedCache)
+admin.site.register(PerformanceMetricSample)
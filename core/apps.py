@@ -1,6 +1,28 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
+# manage.py commands that serve requests or jobs; the rest (migrate, test, ...) never need a browser
+SERVING_COMMANDS = {'runserver', 'runworkers'}
+
+
+def is_serving() -> bool:
+    """True in a WSGI/ASGI server or a serving manage.py command, but not runserver's reloader parent."""
+    if os.path.basename(sys.argv[0]) != 'manage.py':
+        return True
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'runserver':
+        return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+    return command in SERVING_COMMANDS
+
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        if is_serving():
+            # Imported lazily: selenium is only needed by serving processes
+            from core.automation.driver_pool import warm_up_driver_pool_in_background
+            warm_up_driver_pool_in_background()
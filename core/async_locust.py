@@ -18,7 +18,7 @@ async def load_test_main(target_url: URLModel, load_test_source_path: Optional[s
         start_time = time.time()
         tasks = []
         logger.info("Starting performance tests...")
-        target_urls = generate_valid_links(target_url.url)
+        target_urls = await asyncio.to_thread(generate_valid_links, target_url.url)
 
         from core.break_test import run_break_test
         from core.locust_test.locustfile_stress_check import run_stress_test
@@ -1,13 +1,15 @@
-from selenium import webdriver
-import os
 import time
 import logging
 import sys
 import asyncio
 from typing import Optional
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from core.automation.take_screenshot import TakeScreenshot
+from django.conf import settings
+from core.automation.take_screenshot import TakeScreenshot, keep_image, review_devices, review_screenshots
+from core.utils import url_artifact_name
+from core.automation.captured_image import CapturedImage
+from core.automation.driver_pool import get_driver_pool
+from core.automation.executor import loop_semaphore
+from core.singleflight import get_singleflight, flight_key
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -28,43 +30,85 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Semaphore to limit concurrency
+# Limit concurrency; the semaphore itself is created per event loop (see loop_semaphore)
 MAX_CONCURRENT_TASKS = 20
-semaphore = asyncio.Semaphore(MAX_CONCURRENT_TASKS)  # Adjust MAX_CONCURRENT_TASKS based on system capacity
 
 async def create_stealth_driver(url: str, device: Optional[str] = 'desktop', save_dir: Optional[str] = "Z:/trryfix.ai/capture_screenshots"):
     """
-    Creates a Chrome driver with stealth settings and captures a screenshot.
+    Leases a warm Chrome driver from the pool and captures a screenshot.
     """
-    async with semaphore:  # Limit concurrency
-        driver = None
+    async with loop_semaphore('create_stealth_driver', MAX_CONCURRENT_TASKS):  # Limit concurrency
         try:
             start_time = time.time()
 
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
+            # The pool resets cookies, storage and emulation when the driver comes back
+            async with get_driver_pool().lease_async() as driver:
+                screenshot = TakeScreenshot(driver)
+                await screenshot.capture_screenshot(url=url, devices=device_dimensions, save_dir=save_dir)
+            logger.info(f"Captured {url} in {time.time() - start_time:.2f} seconds")
 
+        except Exception as e:
+            logger.error(f"Error in create_stealth_driver for {url} on {device}: {e}")
 
-            # Create the WebDriver (blocking call)
-            if os.getenv('LOCAL_WEBDRIVE'):
-                driver = webdriver.Chrome(options=chrome_options)
-            else:
-                driver = webdriver.Remote(
-                command_executor='http://selenium:4444/wd/hub',
-                options=chrome_options
-                )
 
-            # Capture the screenshot
-            screenshot = TakeScreenshot(driver)
-            await screenshot.capture_screenshot(url=url, devices=device_dimensions, save_dir=save_dir)
+async def shoot_device(url: str, device: str, clip: Optional[dict] = None):
+    """Screenshot one (url, device) cell on its own leased driver; returns (bytes, format) or None."""
+    async with loop_semaphore('capture_device', settings.SCREENSHOT_MAX_CONCURRENCY):
+        async with get_driver_pool().lease_async() as driver:
+            image = await TakeScreenshot(driver).capture_device(url, device, device_dimensions[device], None, clip=clip, keep=False)
+    return (image.data, image.format) if image else None
 
-        except Exception as e:
-            logger.error(f"Error in create_stealth_driver for {url} on {device}: {e}")
+
+async def capture_device(url: str, device: str, save_dir: str, clip: Optional[dict] = None) -> Optional[CapturedImage]:
+    """Capture a single (url, device) cell of the task matrix.
+
+    Jobs capturing the same page at the same time share one screenshot; every caller
+    gets its own CapturedImage over the shared bytes, kept in its own `save_dir`.
+    """
+    try:
+        key = flight_key('capture', url, device=device, format=settings.SCREENSHOT_FORMAT,
+                         quality=settings.SCREENSHOT_QUALITY, clip=clip)
+        shot = await get_singleflight().do_async(
+            key, lambda: shoot_device(url, device, clip),
+            memo_seconds=settings.SINGLEFLIGHT_CAPTURE_MEMO_SECONDS,
+        )
+        if shot is None:
+            return None
+        image = CapturedImage(*shot)
+        await keep_image(image, url, device, save_dir)
+        return image
+    except Exception as e:
+        logger.error(f"Error in capture_device for {url} on {device}: {e}")
+
+
+async def capture_url_matrix(urls, save_dir: str):
+    """
+    Fan every (url, device) pair out to its own driver at once, so a URL costs about as
+    much as its slowest viewport instead of the sum of all of them.
+    Returns {url: {device: CapturedImage}}; buffers are released once reviewed, `.path` stays set when artifacts are kept.
+    """
+    start_time = time.time()
+    matrix = [(url, device) for url in urls for device in device_dimensions]
+    images = await asyncio.gather(*(capture_device(url, device, save_dir) for url, device in matrix))
+
+    captured = {url: {} for url in urls}
+    for (url, device), image in zip(matrix, images):
+        if image:
+            captured[url][device] = image
+    logger.info(f"Captured {len(matrix)} url/device pairs in {time.time() - start_time:.2f} seconds")
+
+    # Every captured device of every URL is reviewed
+    if settings.LLM_REVIEW_BATCH_SIZE > 1:
+        # One flat list, so batches can also span the shots of several small URLs
+        try:
+            await review_screenshots([
+                (url_artifact_name(url, prefix=device), f"{device} view of {url}", image)
+                for url, devices in captured.items() for device, image in devices.items()
+            ], save_dir)
         finally:
-            # Ensure the driver is closed
-            if driver:
-                logger.info(f"Closing driver for {device}")
-                driver.quit()
+            for devices in captured.values():
+                for image in devices.values():
+                    image.release()
+    else:
+        await asyncio.gather(*(review_devices(url, devices, save_dir) for url, devices in captured.items()))
+    return captured
@@ -0,0 +1,81 @@
+import base64
+import os
+from typing import Optional
+from selenium.common.exceptions import WebDriverException
+
+SCREENSHOT_FORMATS = {
+    'png': ('image/png', 'png'),
+    'jpeg': ('image/jpeg', 'jpg'),
+    'webp': ('image/webp', 'webp'),
+}
+
+
+class CapturedImage:
+    """Encoded screenshot bytes kept in memory; written to disk only when the artifact has to be kept."""
+
+    def __init__(self, data: bytes, image_format: str = 'png'):
+        if image_format not in SCREENSHOT_FORMATS:
+            raise ValueError(f"Unsupported screenshot format: {image_format}")
+        self.data = data
+        self.format = image_format
+        self.path = None
+        self._tracker = None
+
+    @property
+    def mime_type(self) -> str:
+        return SCREENSHOT_FORMATS[self.format][0]
+
+    @property
+    def extension(self) -> str:
+        return SCREENSHOT_FORMATS[self.format][1]
+
+    def spill(self, save_dir: str, file_name: str) -> str:
+        """Write the image to `save_dir` once and remember where it went."""
+        if self.path is None:
+            os.makedirs(save_dir, exist_ok=True)
+            path = os.path.join(save_dir, f"{file_name}.{self.extension}")
+            with open(path, 'wb') as f:
+                f.write(self.data)
+            self.path = path
+        return self.path
+
+    def track(self, tracker):
+        """Count this buffer against a job's MemoryTracker until release()."""
+        if tracker is not None and self._tracker is None:
+            self._tracker = tracker
+            tracker.add(len(self.data))
+
+    def release(self):
+        """Drop the in-memory bytes once they have been reviewed (and spilled, if kept)."""
+        if self._tracker is not None:
+            self._tracker.discard(len(self.data))
+            self._tracker = None
+        self.data = b''
+
+    def as_blob(self) -> dict:
+        """Inline-data part for the Gemini SDK; hands over the bytes object as-is, no decode or copy."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"<CapturedImage(format={self.format}, bytes={len(self.data)}, path={self.path})>"
+
+
+def capture_cdp_screenshot(driver, image_format: str = 'png', quality: Optional[int] = None, clip: Optional[dict] = None) -> CapturedImage:
+    """Grab the viewport with Page.captureScreenshot and keep the bytes in memory (blocking call).
+
+    `quality` (0-100) applies to jpeg/webp; `clip` is {x, y, width, height[, scale]} in CSS pixels.
+    Grids that don't expose CDP fall back to WebDriver's PNG screenshot.
+    """
+    params = {"format": image_format}
+    if quality is not None and image_format != 'png':
+        params["quality"] = int(quality)
+    if clip:
+        params["clip"] = {"scale": 1, **clip}
+    try:
+        result = driver.execute_cdp_cmd("Page.captureScreenshot", params)
+    except (AttributeError, WebDriverException):
+        return CapturedImage(driver.get_screenshot_as_png(), 'png')
+    return CapturedImage(base64.b64decode(result["data"]), image_format)
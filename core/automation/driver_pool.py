@@ -0,0 +1,340 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from core.automation.executor import get_webdriver_executor, run_webdriver
+
+logger = logging.getLogger(__name__)
+
+
+def build_chrome_options() -> Options:
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    return chrome_options
+
+
+def new_driver():
+    """Start a Chrome session, locally or on the Selenium grid (blocking call)."""
+    if os.getenv('LOCAL_WEBDRIVE'):
+        return webdriver.Chrome(options=build_chrome_options())
+    return webdriver.Remote(
+        command_executor=settings.WEBDRIVER_REMOTE_URL,
+        options=build_chrome_options()
+    )
+
+
+class PooledDriver:
+    """A WebDriver session plus the bookkeeping the pool needs to decide when to recycle it."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.time()
+        self.uses = 0
+        self.baseline_heap_mb = None
+
+    def js_heap_mb(self) -> Optional[float]:
+        """JS heap in use by the current page: CDP Performance.getMetrics, else performance.memory."""
+        used = None
+        try:
+            self.driver.execute_cdp_cmd("Performance.enable", {})
+            metrics = self.driver.execute_cdp_cmd("Performance.getMetrics", {}).get("metrics", [])
+            used = next((metric["value"] for metric in metrics if metric["name"] == "JSHeapUsedSize"), None)
+        except (AttributeError, WebDriverException):
+            pass
+        if used is None:
+            try:
+                used = self.driver.execute_script(
+                    "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null"
+                )
+            except WebDriverException:
+                return None
+        return used / (1024 * 1024) if used else None
+
+    def is_healthy(self) -> bool:
+        """Ping the session; a crashed tab or a dead grid node fails here."""
+        try:
+            return self.driver.execute_script("return 1") == 1 and bool(self.driver.window_handles)
+        except WebDriverException:
+            return False
+
+    def reset(self):
+        """Drop cookies, storage, emulation overrides and extra tabs left by the previous lease."""
+        driver = self.driver
+        try:
+            origin = urlsplit(driver.current_url)
+            if origin.scheme in ('http', 'https'):
+                driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+                self._cdp("Storage.clearDataForOrigin", {
+                    "origin": f"{origin.scheme}://{origin.netloc}",
+                    "storageTypes": "all",
+                })
+        except WebDriverException:
+            pass
+        driver.delete_all_cookies()
+        self._cdp("Network.clearBrowserCookies", {})
+        self._cdp("Emulation.clearDeviceMetricsOverride", {})
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+
+    def _cdp(self, cmd: str, params: dict):
+        # Remote sessions on some grids don't expose CDP; resetting is best effort there
+        try:
+            self.driver.execute_cdp_cmd(cmd, params)
+        except (AttributeError, WebDriverException):
+            pass
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.error(f"Error quitting driver: {e}")
+
+
+class DriverPool:
+    """Process-wide pool of warm Chrome sessions.
+
+    Callers lease a driver, use it and hand it back; the pool pings idle sessions
+    before reuse and recycles them after `max_uses` leases or when the JS heap grows
+    more than `max_heap_growth_mb` over its value after warm-up.
+    """
+
+    def __init__(self, size: int, max_uses: int, max_heap_growth_mb: float, lease_timeout: float):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_heap_growth_mb = max_heap_growth_mb
+        self.lease_timeout = lease_timeout
+        self._idle = deque()
+        self._total = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _create(self) -> PooledDriver:
+        pooled = PooledDriver(new_driver())
+        pooled.baseline_heap_mb = pooled.js_heap_mb()
+        return pooled
+
+    def _discard(self, pooled: PooledDriver):
+        pooled.quit()
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def warm_up(self, count: Optional[int] = None):
+        """Open up to `count` (default: pool size) sessions in parallel so the first leases are fast."""
+        with self._cond:
+            count = min(count or self.size, self.size - self._total)
+            self._total += max(count, 0)
+        if count <= 0:
+            return
+
+        def start_one():
+            try:
+                pooled = self._create()
+            except Exception as e:
+                logger.error(f"Error warming up driver: {e}")
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+        threads = [threading.Thread(target=start_one, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.info(f"Driver pool warmed up with {len(self._idle)} sessions")
+
+    def _take(self):
+        """Pop an idle driver or reserve a slot for a new one; None when the pool is exhausted.
+
+        Must be called with the condition held.
+        """
+        if self._closed:
+            raise RuntimeError("Driver pool is shut down")
+        if self._idle:
+            return self._idle.popleft()
+        if self._total < self.size:
+            self._total += 1
+            return False
+        return None
+
+    def _checkout(self, taken) -> Optional[PooledDriver]:
+        """Turn the result of _take() into a usable driver (blocking); None if it had crashed."""
+        if taken is False:
+            try:
+                pooled = self._create()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+        else:
+            pooled = taken
+            if not pooled.is_healthy():
+                logger.info("Discarding crashed driver from the pool")
+                self._discard(pooled)
+                return None
+        pooled.uses += 1
+        return pooled
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledDriver:
+        deadline = time.monotonic() + (timeout if timeout is not None else self.lease_timeout)
+        while True:
+            with self._cond:
+                taken = self._take()
+                while taken is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a WebDriver from the pool")
+                    self._cond.wait(remaining)
+                    taken = self._take()
+            pooled = self._checkout(taken)
+            if pooled is not None:
+                return pooled
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> PooledDriver:
+        """Like acquire(), but waits on the event loop so no executor thread sits blocked on the pool."""
+        deadline = time.monotonic() + (timeout if timeout is not None else self.lease_timeout)
+        while True:
+            with self._cond:
+                taken = self._take()
+            if taken is None:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError("Timed out waiting for a WebDriver from the pool")
+                await asyncio.sleep(0.05)
+                continue
+            future = get_webdriver_executor().submit(self._checkout, taken)
+            try:
+                # Shielded so a timeout or cancel never stops _checkout midway and strands the slot
+                pooled = await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(future)), settings.WEBDRIVER_SESSION_TIMEOUT
+                )
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                future.add_done_callback(functools.partial(self._return_late, taken))
+                raise
+            if pooled is not None:
+                return pooled
+
+    def _return_late(self, taken, future):
+        """Hand back a driver whose checkout finished after its caller gave up waiting."""
+        if future.cancelled():
+            # _checkout never ran: free the reserved slot or put the idle driver back
+            pooled = taken or None
+            if pooled is None:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+        elif future.exception() is not None:
+            return  # _checkout already gave the slot back
+        else:
+            pooled = future.result()
+        if pooled is not None:
+            get_webdriver_executor().submit(self.release, pooled)
+
+    def release(self, pooled: PooledDriver, check_health: bool = False, discard: bool = False):
+        if discard or self._closed or (check_health and not pooled.is_healthy()):
+            self._discard(pooled)
+            return
+        if pooled.uses >= self.max_uses:
+            logger.info(f"Recycling driver after {pooled.uses} uses")
+            self._discard(pooled)
+            return
+        # Measured on the page the lease left behind; after reset() it is about:blank
+        heap_mb = pooled.js_heap_mb()
+        try:
+            pooled.reset()
+        except Exception as e:
+            logger.error(f"Error resetting driver, recycling it: {e}")
+            self._discard(pooled)
+            return
+        if heap_mb is not None and pooled.baseline_heap_mb is not None \
+                and heap_mb - pooled.baseline_heap_mb > self.max_heap_growth_mb:
+            logger.info(f"Recycling driver after JS heap grew to {heap_mb:.0f} MB")
+            self._discard(pooled)
+            return
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        pooled = self.acquire(timeout)
+        failed = False
+        try:
+            yield pooled.driver
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(pooled, check_health=failed)
+
+    @asynccontextmanager
+    async def lease_async(self, timeout: Optional[float] = None):
+        pooled = await self.acquire_async(timeout)
+        failed = timed_out = False
+        try:
+            yield pooled.driver
+        except asyncio.TimeoutError:
+            # An operation may still be running on this driver, so it can't go back to the pool
+            timed_out = True
+            raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            await run_webdriver(
+                self.release, pooled, failed, timed_out,
+                timeout=settings.WEBDRIVER_SESSION_TIMEOUT,
+            )
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for pooled in idle:
+            self._discard(pooled)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool(
+                size=settings.WEBDRIVER_POOL_SIZE,
+                max_uses=settings.WEBDRIVER_MAX_USES,
+                max_heap_growth_mb=settings.WEBDRIVER_MAX_HEAP_GROWTH_MB,
+                lease_timeout=settings.WEBDRIVER_LEASE_TIMEOUT,
+            )
+        return _pool
+
+
+def warm_up_driver_pool_in_background():
+    """Warm the pool without blocking startup (called from CoreConfig.ready); no-op when WEBDRIVER_POOL_WARM_UP is off."""
+    if settings.WEBDRIVER_POOL_WARM_UP:
+        threading.Thread(target=get_driver_pool().warm_up, name="driver-pool-warm-up", daemon=True).start()
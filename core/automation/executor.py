@@ -0,0 +1,53 @@
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# event loop -> {name: Semaphore}; every asyncio.run() (one per request or job) gets its own set
+_loop_semaphores = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+
+
+def get_webdriver_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool reserved for blocking Selenium calls."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.WEBDRIVER_EXECUTOR_WORKERS,
+                thread_name_prefix='webdriver',
+            )
+        return _executor
+
+
+async def run_webdriver(fn, *args, timeout: Optional[float] = None, **kwargs):
+    """Await a blocking WebDriver call on the dedicated executor.
+
+    Raises asyncio.TimeoutError after `timeout` seconds (WEBDRIVER_OPERATION_TIMEOUT by
+    default). The thread can't be interrupted, so callers should treat the driver as
+    broken after a timeout.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(get_webdriver_executor(), functools.partial(fn, *args, **kwargs))
+    return await asyncio.wait_for(future, timeout or settings.WEBDRIVER_OPERATION_TIMEOUT)
+
+
+def loop_semaphore(name: str, limit: int) -> asyncio.Semaphore:
+    """Return the semaphore called `name` for the running event loop, creating it on first use.
+
+    Module-level semaphores would be shared by every loop in the process (and bound to the
+    first one that waits on them); these are scoped to the loop that uses them.
+    """
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        semaphores = _loop_semaphores.setdefault(loop, {})
+        if name not in semaphores:
+            semaphores[name] = asyncio.Semaphore(limit)
+        return semaphores[name]
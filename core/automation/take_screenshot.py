@@ -1,8 +1,17 @@
 import json
 import asyncio
 import os
-from PIL import Image
-from core.llm.config import ApiClient
+import time
+from core.llm import PROMPT, MODEL_NAME
+from core.llm.config import get_api_client, parse_batch_review
+from core.llm.review_cache import get_review_cache
+from core import metrics
+from core.utils import url_artifact_name
+from core.automation.executor import run_webdriver
+from core.automation.captured_image import CapturedImage, capture_cdp_screenshot
+from core.memory import current_memory_tracker
+from core.result_sink import write_results
+from django.conf import settings
 import sys
 import logging
 # Configure logging
@@ -16,74 +25,199 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Semaphore to limit concurrency
-MAX_CONCURRENT_TASKS = 40
-semaphore = asyncio.Semaphore(MAX_CONCURRENT_TASKS)
+def device_metrics(width, height):
+    return {
+        "width": width,
+        "height": height,
+        "deviceScaleFactor": 1,
+        "mobile": True if width < 768 else False, #Example of mobile detection.
+    }
+
+
+async def save_reviews(save_dir, entries):
+    """Queue (file_path, response) entries for the job's result sink; they end up in all_responses.json."""
+    await write_results(save_dir, [{"file_path": file_path, "response": response} for file_path, response in entries])
+
+
+async def ask_llm(captured: CapturedImage):
+    """One review request for one screenshot; returns the list of findings."""
+    # The encoded bytes go straight to the LLM, no PIL decode
+    start_time = time.time()
+    issue_identify_by_llm = await get_api_client().generate_content_for_image(image=captured)
+    if issue_identify_by_llm is None:
+        raise ValueError("LLM review failed, no response")
+    response = json.loads(issue_identify_by_llm.text)[0]['response']
+    metrics.increment('llm_review.calls')
+    metrics.increment('llm_review.latency_seconds', time.time() - start_time)
+    logger.info("LLm successfully processed image")
+    return response
+
+
+async def ask_llm_batch(images, labels):
+    """One review request for several screenshots, falling back to a request per image
+    when the batched answer is missing or doesn't match the schema."""
+    start_time = time.time()
+    batch_response = await get_api_client().generate_content_for_images(images, labels=labels)
+    try:
+        if batch_response is None:
+            raise ValueError("no response")
+        responses = parse_batch_review(batch_response.text, len(images))
+    except Exception as e:
+        logger.error(f"Batched review of {len(images)} images failed, reviewing them one by one: {e}")
+        metrics.increment('llm_review.batch_fallbacks')
+        return await asyncio.gather(*(ask_llm(image) for image in images), return_exceptions=True)
+    metrics.increment('llm_review.calls')
+    metrics.increment('llm_review.batch_calls')
+    metrics.increment('llm_review.batched_images', len(images))
+    metrics.increment('llm_review.latency_seconds', time.time() - start_time)
+    logger.info(f"LLm successfully processed {len(images)} images in one request")
+    return responses
+
+
+def review_batches(pending):
+    """Group (index, label, image) misses into batches of LLM_REVIEW_BATCH_SIZE and LLM_REVIEW_BATCH_MAX_BYTES."""
+    batch, batch_bytes = [], 0
+    for item in pending:
+        size = len(item[2])
+        if batch and (len(batch) >= settings.LLM_REVIEW_BATCH_SIZE or batch_bytes + size > settings.LLM_REVIEW_BATCH_MAX_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(item)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+async def review_screenshot(captured: CapturedImage, save_dir, name):
+    """Ask the LLM to review a captured screenshot and record the answer in all_responses.json."""
+    try:
+        # Near-identical screenshots reviewed recently are answered from the cache
+        cache = get_review_cache()
+        fingerprint, response = await cache.lookup(captured.data, PROMPT, MODEL_NAME) if cache else (None, None)
+        if response is None:
+            response = await ask_llm(captured)
+            if cache:
+                await cache.store(fingerprint, response)
+        else:
+            logger.info(f"LLM review served from cache for {name}")
+
+        await save_reviews(save_dir, [(captured.path or name, response)])
+        return response
+    except Exception as e:
+        logger.error(f"Error processing image: {e}")
+
+
+async def review_screenshots(items, save_dir):
+    """Review (name, label, CapturedImage) items, several screenshots per LLM request.
+
+    Items are batched in order, so the device shots of one URL (or a few small URLs)
+    share a request. Returns the findings per item, None where the review failed.
+    """
+    cache = get_review_cache()
+    if cache:
+        lookups = await asyncio.gather(*(cache.lookup(image.data, PROMPT, MODEL_NAME) for _, _, image in items))
+    else:
+        lookups = [(None, None)] * len(items)
+    results = [response for _, response in lookups]
+    pending = [(index, label, image) for index, (_, label, image) in enumerate(items) if results[index] is None]
+    logger.info(f"{len(items) - len(pending)} of {len(items)} LLM reviews served from cache")
+
+    async def run_batch(batch):
+        if len(batch) == 1:
+            responses = await asyncio.gather(ask_llm(batch[0][2]), return_exceptions=True)
+        else:
+            responses = await ask_llm_batch([image for _, _, image in batch], [label for _, label, _ in batch])
+        for (index, _, _), response in zip(batch, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Error processing image {items[index][0]}: {response}")
+                continue
+            results[index] = response
+            if cache:
+                await cache.store(lookups[index][0], response)
+
+    await asyncio.gather(*(run_batch(batch) for batch in review_batches(pending)))
+    try:
+        await save_reviews(save_dir, [
+            (image.path or name, response)
+            for (name, _, image), response in zip(items, results) if response is not None
+        ])
+    except Exception as e:
+        logger.error(f"Error saving LLM reviews: {e}")
+    return results
+
+
+async def review_devices(url, images, save_dir):
+    """Review all device screenshots of a URL, then free their buffers."""
+    try:
+        if settings.LLM_REVIEW_BATCH_SIZE > 1:
+            return await review_screenshots([
+                (url_artifact_name(url, prefix=device), f"{device} view of {url}", image)
+                for device, image in images.items()
+            ], save_dir)
+        return await asyncio.gather(*(
+            review_screenshot(image, save_dir, url_artifact_name(url, prefix=device))
+            for device, image in images.items()
+        ))
+    finally:
+        for image in images.values():
+            image.release()
+
+
+async def keep_image(image: CapturedImage, url, device, save_dir):
+    """Account the buffer to the current job and spill it to `save_dir` if artifacts are kept."""
+    image.track(current_memory_tracker())
+    if settings.SCREENSHOT_KEEP_ARTIFACTS:
+        await asyncio.to_thread(image.spill, save_dir, url_artifact_name(url, prefix=device))
+        logger.info(f"Screenshot saved: {image.path}")
+
 
 class TakeScreenshot:
     def __init__(self, driver):
         self.driver = driver
 
+    async def grab(self, url, device, save_dir, clip=None, keep=True) -> CapturedImage:
+        """Screenshot the current viewport into memory; `keep` hands it to keep_image()."""
+        image = await run_webdriver(
+            capture_cdp_screenshot, self.driver,
+            settings.SCREENSHOT_FORMAT, settings.SCREENSHOT_QUALITY, clip,
+        )
+        if keep:
+            await keep_image(image, url, device, save_dir)
+        return image
+
+    async def capture_device(self, url, device, dimensions, save_dir, clip=None, keep=True):
+        """Capture one device viewport of a URL on this tab; returns the CapturedImage."""
+        try:
+            # The viewport is set before navigating, so the page lays out once at its final size
+            await run_webdriver(self.driver.execute_cdp_cmd, "Emulation.setDeviceMetricsOverride", device_metrics(dimensions[0], dimensions[1]))
+            await run_webdriver(self.driver.get, url, timeout=settings.WEBDRIVER_PAGE_LOAD_TIMEOUT)
+            return await self.grab(url, device, save_dir, clip=clip, keep=keep)
+        except asyncio.TimeoutError:
+            # The call is still running on the executor; let the pool discard this driver
+            logger.error(f"Timed out capturing screenshot for {url} on {device}")
+            raise
+        except Exception as e:
+            logger.error(f"Error capturing screenshot for {url} on {device}: {e}")
+
     async def capture_screenshot(self, url, devices, save_dir):
         """Capture screenshot for a URL with specific device dimensions."""
         try:
-            # Create directory if it doesn't exist
-            if not os.path.exists(save_dir):
-                os.makedirs(save_dir)
-
-            # File path for saving the screenshot
-            # TODO : this need to move to bottom
-
-            # Navigate to URL (blocking call)
-            self.driver.get(url)
+            # Navigate to URL (blocking call, awaited on the WebDriver executor)
+            await run_webdriver(self.driver.get, url, timeout=settings.WEBDRIVER_PAGE_LOAD_TIMEOUT)
+            images = {}
             for key, value in devices.items():
-                cdp_command = {
-                    "width": value[0],
-                    "height": value[1],
-                    "deviceScaleFactor": 1,
-                    "mobile": True if value[0] < 768 else False, #Example of mobile detection.
-                }
-                self.driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", cdp_command)
+                cdp_command = device_metrics(value[0], value[1])
+                await run_webdriver(self.driver.execute_cdp_cmd, "Emulation.setDeviceMetricsOverride", cdp_command)
                 logger.info(f"Navigated to {url} on {devices}")
 
-                file_name = f"{key}_{str(url).split('//')[1].split('/')[0]}.png"
-                save_path = os.path.join(save_dir, file_name)
-                # Save the screenshot (blocking call)
-                self.driver.save_screenshot(save_path)
-                logger.info(f"Screenshot saved: {save_path}")
-
-            try:
-                # Process the image (if needed, move this logic to another function for clarity)
-                try:
-                    image = await asyncio.to_thread(Image.open, save_path)
-                except Exception as e:
-                    logger.error(f"Error opening image: {e}")
-                    return
-                issue_identify_by_llm = await ApiClient().generate_content_for_image(image=image)
-                response = json.loads(issue_identify_by_llm.text)[0]['response']
-                logger.info("LLm successfully processed image")
-
-                # Path for the main JSON file to store all responses
-                main_response_file = os.path.join(save_dir, "all_responses.json")
-
-                # Load existing responses if the file exists
-                if os.path.exists(main_response_file):
-                    with open(main_response_file, 'r') as file:
-                        all_responses = json.load(file)
-                else:
-                    all_responses = []
-
-                # Append the new response
-                all_responses.append({"file_path": save_path, "response": response})
-
-                # Save all responses back to the main JSON file
-                with open(main_response_file, 'w') as file:
-                    json.dump(all_responses, file, indent=4)
-                logger.info(f"Response saved to main JSON file: {main_response_file}")
-            except Exception as e:
-                logger.error(f"Error processing image: {e}")
-
-            return response
+                # Capture into memory (blocking call)
+                images[key] = await self.grab(url, key, save_dir)
+
+            # Every device gets reviewed, not only the last one
+            return await review_devices(url, images, save_dir)
 
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out capturing screenshot for {url} on {devices}")
+            raise
         except Exception as e:
             logger.error(f"Error capturing screenshot for {url} on {devices}: {e}")
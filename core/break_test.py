@@ -8,6 +8,7 @@ import asyncio
 import aiohttp
 import statistics
 from time import time
+from core.utils import url_artifact_name
 
 # Configure logging
 logging.basicConfig(
@@ -73,7 +74,7 @@ class LoadTester:
         tasks = [self.make_request(url) for _ in range(num_requests)]
         await asyncio.gather(*tasks)
 
-    def save_results(self, url: str) -> None:
+    def save_results(self, url: str, results_dir: str) -> None:
         """Save test results to JSON file"""
         report = {
             "target_url": url,
@@ -87,11 +88,10 @@ class LoadTester:
             "test_duration": self.stats.last_request_time - self.stats.start_time
         }
 
-        results_dir = Path("reports/break_check")
+        results_dir = Path(results_dir)
         results_dir.mkdir(parents=True, exist_ok=True)
 
-        url_part = url.replace('https://', '').replace('http://', '').replace('/', '_').replace('.', '_')
-        filename = results_dir / f"{url_part}.json"
+        filename = results_dir / url_artifact_name(url, extension="json")
         
         with open(filename, "w") as f:
             json.dump(report, f, indent=4)
@@ -99,7 +99,7 @@ class LoadTester:
 
 class LoadTestRunner:
     """Manages execution of load tests for multiple URLs"""
-    async def run_concurrent_tests(self, urls: List[str], requests_per_url: int = 1000) -> None:
+    async def run_concurrent_tests(self, urls: List[str], results_dir: str, requests_per_url: int = 1000) -> None:
         """Run load tests for multiple URLs concurrently"""
         unique_urls = list(dict.fromkeys(urls))
         logger.info(f"Starting concurrent tests for {len(unique_urls)} URLs")
@@ -111,9 +111,9 @@ class LoadTestRunner:
                 
                 logger.info(f"Testing {url}")
                 await tester.generate_load(url, requests_per_url)
-                tester.save_results(url)
+                tester.save_results(url, results_dir)
 
-async def run_break_test(urls: List[str], requests_per_url: int = 1000):
+async def run_break_test(urls: List[str], requests_per_url: int = 1000, results_dir: Optional[str] = "reports/break_check"):
     """Main entry point for running load tests"""
     if not urls:
         logger.error("No URLs provided")
@@ -121,7 +121,7 @@ async def run_break_test(urls: List[str], requests_per_url: int = 1000):
     runner = LoadTestRunner()
     
     try:
-        await runner.run_concurrent_tests(urls=urls, requests_per_url=requests_per_url)
+        await runner.run_concurrent_tests(urls=urls, results_dir=results_dir, requests_per_url=requests_per_url)
         logger.info("Break tests completed successfully")
     except KeyboardInterrupt:
         logger.info("Tests interrupted by user")
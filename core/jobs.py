@@ -0,0 +1,292 @@
+import contextvars
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import AnalysisJob
+from core.pydantic_model import URLModel
+from core.workspace import JobWorkspace
+from core.memory import track_memory
+
+logger = logging.getLogger(__name__)
+
+# Job currently executing in this context; read by report_progress()
+_current_job_id = contextvars.ContextVar('current_job_id', default=None)
+
+# job_id -> (stage, progress), flushed to the database by the lease heartbeat
+_progress = {}
+_progress_lock = threading.Lock()
+
+
+def _job_runners():
+    # Imported lazily: the runners pull in selenium and the LLM client
+    from core.suss_file import main, capture_screenshots_for_urls
+    from core.load_test import load_test_main
+    return {
+        AnalysisJob.KIND_WEBSITES_PERFORMANCE: main,
+        AnalysisJob.KIND_CAPTURE_SCREENSHOTS: capture_screenshots_for_urls,
+        AnalysisJob.KIND_LOAD_TESTS: load_test_main,
+    }
+
+
+def report_progress(stage: str, progress: Optional[int] = None):
+    """Record progress for the job running in the current context (no-op outside a job)."""
+    job_id = _current_job_id.get()
+    if job_id is None:
+        return
+    with _progress_lock:
+        previous = _progress.get(job_id, ('', 0))
+        _progress[job_id] = (stage, previous[1] if progress is None else max(previous[1], min(progress, 100)))
+
+
+def submit_job(kind: str, target_url: URLModel, user=None) -> AnalysisJob:
+    """Queue an analysis job and wake up the in-process workers."""
+    if kind not in dict(AnalysisJob.KIND_CHOICES):
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = AnalysisJob.objects.create(kind=kind, payload=target_url.model_dump(), user_email=user)
+    ensure_workers_started()
+    return job
+
+
+def _claimable(now):
+    return Q(status=AnalysisJob.STATUS_PENDING) | Q(status=AnalysisJob.STATUS_RUNNING, lease_expires_at__lt=now)
+
+
+def claim_next_job(worker_id: str) -> Optional[AnalysisJob]:
+    """Lease the oldest claimable job, or return None when the queue is empty.
+
+    The claim is a conditional UPDATE, so workers on several nodes can share the table
+    without row locks: only one of them sees its update hit the row.
+    """
+    now = timezone.now()
+    candidates = list(
+        AnalysisJob.objects.filter(_claimable(now)).order_by('created_at').values_list('job_id', flat=True)[:5]
+    )
+    for job_id in candidates:
+        claimed = AnalysisJob.objects.filter(_claimable(now), job_id=job_id).update(
+            status=AnalysisJob.STATUS_RUNNING,
+            lease_owner=worker_id,
+            lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+            started_at=now,
+        )
+        if not claimed:
+            continue
+        job = AnalysisJob.objects.get(job_id=job_id)
+        if job.attempts > settings.JOB_MAX_ATTEMPTS:
+            _finish(job.job_id, worker_id, AnalysisJob.STATUS_FAILED, error="Job lease expired too many times")
+            continue
+        return job
+    return None
+
+
+def _finish(job_id, worker_id: str, status: str, result_path: str = '', error: str = '', metrics: Optional[dict] = None):
+    with _progress_lock:
+        stage, progress = _progress.pop(job_id, ('', 0))
+    AnalysisJob.objects.filter(job_id=job_id, lease_owner=worker_id).update(
+        status=status,
+        stage='done' if status == AnalysisJob.STATUS_SUCCEEDED else stage,
+        progress=100 if status == AnalysisJob.STATUS_SUCCEEDED else progress,
+        result_path=result_path,
+        error=error,
+        metrics=metrics or {},
+        lease_expires_at=None,
+        finished_at=timezone.now(),
+    )
+
+
+class _LeaseHeartbeat(threading.Thread):
+    """Renews the lease of a running job and flushes its progress."""
+
+    def __init__(self, job_id, worker_id: str):
+        super().__init__(name=f"job-heartbeat-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._stopped = threading.Event()
+
+    def run(self):
+        interval = max(settings.JOB_LEASE_SECONDS / 3, 1)
+        try:
+            while not self._stopped.wait(interval):
+                with _progress_lock:
+                    stage, progress = _progress.get(self.job_id, ('', 0))
+                AnalysisJob.objects.filter(
+                    job_id=self.job_id, lease_owner=self.worker_id, status=AnalysisJob.STATUS_RUNNING
+                ).update(
+                    lease_expires_at=timezone.now() + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                    stage=stage,
+                    progress=progress,
+                )
+        except Exception as e:
+            logger.error(f"Lease heartbeat failed for job {self.job_id}: {e}")
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def job_workspace_name(job_id, attempt: int) -> str:
+    # Each attempt writes apart, so a re-claimed job never shares files with the lost run
+    return f"{job_id}-{attempt}"
+
+
+def run_job(job: AnalysisJob, worker_id: str):
+    """Run a claimed job to completion, keeping its workspace as the result.
+
+    The runner re-raises its errors, which fail the job. The archive is streamed from
+    the workspace when the result is fetched.
+    """
+    runner = _job_runners()[job.kind]
+    from core.llm.config import run_async
+    target_url = URLModel(**job.payload)
+    token = _current_job_id.set(job.job_id)
+    heartbeat = _LeaseHeartbeat(job.job_id, worker_id)
+    heartbeat.start()
+    start_time = time.time()
+    metrics = {}
+    try:
+        workspace = JobWorkspace(job_workspace_name(job.job_id, job.attempts))
+        try:
+            report_progress('running', 5)
+            with track_memory() as memory:
+                try:
+                    run_async(runner(target_url=target_url, workspace=workspace, raise_errors=True))
+                finally:
+                    metrics['memory'] = memory.report()
+                    metrics['duration_seconds'] = round(time.time() - start_time, 2)
+        except Exception:
+            workspace.cleanup()
+            raise
+        _finish(job.job_id, worker_id, AnalysisJob.STATUS_SUCCEEDED, result_path=workspace.reports_dir, metrics=metrics)
+        logger.info(f"Job {job.job_id} ({job.kind}) finished in {time.time() - start_time:.2f} seconds, memory: {metrics['memory']}")
+    except Exception as e:
+        logger.error(f"Job {job.job_id} ({job.kind}) failed: {e}")
+        _finish(job.job_id, worker_id, AnalysisJob.STATUS_FAILED, error=str(e), metrics=metrics)
+    finally:
+        heartbeat.stop()
+        _current_job_id.reset(token)
+        for attempt in range(1, job.attempts):
+            # Workspaces left behind by attempts whose lease expired
+            shutil.rmtree(os.path.join(settings.WORKSPACE_ROOT, job_workspace_name(job.job_id, attempt)), ignore_errors=True)
+
+
+def purge_expired_results():
+    """Delete result workspaces older than JOB_RESULT_TTL_SECONDS."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_RESULT_TTL_SECONDS)
+    expired = AnalysisJob.objects.filter(finished_at__lt=cutoff).exclude(result_path='')
+    for job in expired:
+        if os.path.exists(job.result_path):
+            try:
+                shutil.rmtree(os.path.dirname(job.result_path))
+            except OSError as e:
+                logger.error(f"Error deleting result for job {job.job_id}: {e}")
+                continue
+        AnalysisJob.objects.filter(job_id=job.job_id).update(result_path='')
+
+
+class JobWorkerPool:
+    """Bounded pool of worker threads pulling jobs from the AnalysisJob table."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size or settings.JOB_WORKER_COUNT
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self._last_purge = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopped.clear()
+            for n in range(self.size):
+                worker_id = f"{socket.gethostname()}:{os.getpid()}:{n}"
+                thread = threading.Thread(target=self._work, args=(worker_id,), name=f"job-worker-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Started {self.size} job workers")
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._wakeup.set()
+        with self._lock:
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def notify(self):
+        """Wake idle workers so a freshly submitted job starts without waiting for the next poll."""
+        self._wakeup.set()
+
+    def _purge_if_due(self):
+        with self._lock:
+            if time.time() - self._last_purge < settings.JOB_LEASE_SECONDS:
+                return
+            self._last_purge = time.time()
+        purge_expired_results()
+        from core.llm.ranking_cache import get_link_ranking_store
+        ranking_store = get_link_ranking_store()
+        if ranking_store:
+            ranking_store.purge()
+        from core.scrape.health_cache import get_link_health_store
+        health_store = get_link_health_store()
+        if health_store:
+            health_store.purge()
+        from core.lighthouse.pagespeed_cache import get_pagespeed_store
+        pagespeed_store = get_pagespeed_store()
+        if pagespeed_store:
+            pagespeed_store.purge()
+        from core.metric_history import downsample
+        downsample()
+
+    def _work(self, worker_id: str):
+        while not self._stopped.is_set():
+            close_old_connections()
+            try:
+                job = claim_next_job(worker_id)
+                if job is None:
+                    self._purge_if_due()
+            except Exception as e:
+                logger.error(f"Worker {worker_id} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(settings.JOB_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            run_job(job, worker_id)
+        connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> JobWorkerPool:
+    """Process-wide worker pool used by the web process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = JobWorkerPool()
+        return _pool
+
+
+def ensure_workers_started():
+    """Start (and wake) the in-process workers unless jobs are handled by `manage.py runworkers`."""
+    if not settings.JOB_WORKERS_IN_PROCESS:
+        return
+    pool = get_worker_pool()
+    pool.start()
+    pool.notify()
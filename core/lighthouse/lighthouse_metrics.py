@@ -1,28 +1,21 @@
-import requests
 import asyncio
 import json
 import os
-from core.utils import sanitize_filename
+from typing import List, Optional
+from core.utils import closes_db_connection, url_artifact_name
 from core.pydantic_model import URLModel
-
-def fetch(url):
-    """Fetch the URL using HTTPX."""
-    try:
-        google_api = "https://www.googleapis.com/pagespeedonline/v5/runPagespeed?url=" + url
-        response = requests.get(google_api)
-        print("Successfully fetched")
-        return response.json()
-    except Exception as e:
-        print(f"Error fetching URL: {e}")
-        return {}
+from core.workspace import JobWorkspace
+from django.conf import settings
+from core.lighthouse.pagespeed import STRATEGIES, fetch_all
+from core.lighthouse.local_vitals import measure_all
+from core.metric_history import parse_timestamp, record_report
 
 class PerformanceMetrics:
-    def __init__(self, json_string: json, dynamic_file_path: str) -> None:
+    def __init__(self, json_string: json) -> None:
         self.json_string = json_string
         self.metrics_results = {}
-        self.file_path = dynamic_file_path 
 
-    async def get_loading_metrics(self):
+    def get_loading_metrics(self):
         try:
             print("Loading metrics")
             # Extract key loading metrics
@@ -42,7 +35,7 @@ class PerformanceMetrics:
         except Exception as e:
             print(f"Error extracting loading metrics: {e}")
 
-    async def get_lighthouse_metrics(self):
+    def get_lighthouse_metrics(self):
         try:
             # Extract key lighthouse_metrics
             print("Lighthouse metrics")
@@ -63,7 +56,7 @@ class PerformanceMetrics:
         except Exception as e:
             print(f"Error extracting lighthouse metrics: {e}")
 
-    async def lighthouse_audit_issues(self):
+    def lighthouse_audit_issues(self):
         try:
             # Extract Lighthouse audit issues
             print("Lighthouse Audit")
@@ -80,39 +73,56 @@ class PerformanceMetrics:
             self.metrics_results["lighthouse_audit_issues"] = audit_issues
         except Exception as e:
             print(f"Error extracting Lighthouse audit issues: {e}")
-    
-    async def save_to_json(self):
-        try:
-            print("Saving Metrics to JSON File...")
-            with open(self.file_path, "w") as json_file:
-                json.dump(self.metrics_results, json_file, indent=4)
-            print(f"Metrics saved successfully to {self.file_path}")
-        except Exception as e:
-            print(f"Error saving metrics to JSON: {e}")
 
 
-async def performance_metrics(target_url:URLModel):
-    """Run Lighthouse performance metrics."""
-    import time
-    start_time = time.time()
-    json_string = fetch(target_url.url)
+def extract_metrics(json_string) -> dict:
+    # Plain dict lookups, nothing to await
+    metrics = PerformanceMetrics(json_string)
+    metrics.get_loading_metrics()
+    metrics.get_lighthouse_metrics()
+    metrics.lighthouse_audit_issues()
+    return metrics.metrics_results
 
-    # Ensure the directory exists
-    os.makedirs("reports", exist_ok=True)
-    filename = sanitize_filename(target_url.url.__add__(target_url.name)) + '.json'
-    file_path = os.path.join("reports", filename)
 
-    metrics = PerformanceMetrics(json_string, dynamic_file_path=file_path)
+async def performance_metrics(target_url:URLModel, workspace: Optional[JobWorkspace] = None,
+                              urls: Optional[List[str]] = None):
+    """Run Lighthouse performance metrics for the target and `urls`, mobile and desktop.
 
-    # Run all tasks concurrently
-    await asyncio.gather(
-        metrics.get_loading_metrics(),
-        metrics.get_lighthouse_metrics(),
-        metrics.lighthouse_audit_issues()
-    )
-    await metrics.save_to_json()
+    The report keeps the single-URL layout at the top level (the target's desktop metrics,
+    PageSpeed's default strategy) and maps each URL to {strategy: metrics} under "pages";
+    returns its path.
+    """
+    import time
+    start_time = time.time()
+    urls = list(dict.fromkeys([target_url.url, *(urls or [])]))
+    measured_at = {}
+    if settings.PERFORMANCE_METRICS_SOURCE == 'local':
+        report = await measure_all(urls, STRATEGIES)
+    else:
+        payloads = await fetch_all(urls, STRATEGIES, force_fresh=bool(target_url.force_fresh))
+        report = {}
+        for url, by_strategy in payloads.items():
+            report[url] = {strategy: extract_metrics(payload) for strategy, payload in by_strategy.items()}
+            for strategy, payload in by_strategy.items():
+                # Cached runs keep their original time, so they aren't stored twice
+                measured_at[(url, strategy)] = parse_timestamp(payload.get('analysisUTCTimestamp'))
+    try:
+        await asyncio.to_thread(closes_db_connection(record_report), report, settings.PERFORMANCE_METRICS_SOURCE, measured_at)
+    except Exception as e:
+        print(f"Error recording metric history: {e}")
+
+    # Write into the job's own workspace
+    workspace = workspace or JobWorkspace()
+    filename = url_artifact_name(target_url.url, extension='json')
+    file_path = os.path.join(workspace.reports_dir, filename)
+    target_metrics = report.get(target_url.url, {}).get('desktop') or {}
+    try:
+        with open(file_path, "w") as json_file:
+            json.dump({**target_metrics, "pages": report}, json_file, indent=4)
+    except Exception as e:
+        print(f"Error saving metrics to JSON: {e}")
 
-    print(f"Lighthouse performance metrics completed in {time.time() - start_time} seconds.")
+    print(f"Lighthouse performance metrics for {len(urls)} URLs completed in {time.time() - start_time} seconds.")
     return file_path
 
 # if __name__ == '__main__':
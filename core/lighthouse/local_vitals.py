@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from django.conf import settings
+from selenium.common.exceptions import WebDriverException
+
+from core.automation.driver_pool import get_driver_pool
+from core.automation.executor import loop_semaphore, run_webdriver
+from core.singleflight import get_singleflight, flight_key
+
+logger = logging.getLogger(__name__)
+
+# Lighthouse's devtools throttling presets (latency in ms, throughput in bytes/s)
+THROTTLING_PROFILES = {
+    'mobile': {"latency": 562.5, "download": 1474.56 * 1024 / 8, "upload": 675 * 1024 / 8, "cpu": 4},
+    'desktop': {"latency": 150, "download": 9216 * 1024 / 8, "upload": 9216 * 1024 / 8, "cpu": 1},
+}
+VIEWPORTS = {
+    'mobile': {"width": 412, "height": 823, "deviceScaleFactor": 1.75, "mobile": True},
+    'desktop': {"width": 1350, "height": 940, "deviceScaleFactor": 1, "mobile": False},
+}
+# (good up to, poor above), as PageSpeed categorizes field data
+THRESHOLDS = {
+    'fcp': (1800, 3000),
+    'lcp': (2500, 4000),
+    'cls': (0.1, 0.25),
+    'tbt': (200, 600),
+}
+LONG_TASK_MS = 50
+
+# Installed before any page script runs; CLS uses the same session windows as Chrome (1s gap, 5s max)
+OBSERVER_SCRIPT = """
+(() => {
+  const v = window.__trryVitals = {fcp: null, lcp: null, cls: 0, longTasks: [], lastLongTaskEnd: 0};
+  let session = 0, sessionStart = 0, sessionLast = 0;
+  const observe = (type, cb) => {
+    try { new PerformanceObserver(list => list.getEntries().forEach(cb)).observe({type, buffered: true}); } catch (e) {}
+  };
+  observe('paint', e => { if (e.name === 'first-contentful-paint') v.fcp = e.startTime; });
+  observe('largest-contentful-paint', e => { v.lcp = e.startTime; });
+  observe('layout-shift', e => {
+    if (e.hadRecentInput) return;
+    if (session && (e.startTime - sessionLast > 1000 || e.startTime - sessionStart > 5000)) session = 0;
+    if (!session) sessionStart = e.startTime;
+    session += e.value;
+    sessionLast = e.startTime;
+    v.cls = Math.max(v.cls, session);
+  });
+  observe('longtask', e => {
+    v.longTasks.push([e.startTime, e.duration]);
+    v.lastLongTaskEnd = Math.max(v.lastLongTaskEnd, e.startTime + e.duration);
+  });
+})();
+"""
+READ_SCRIPT = "return Object.assign({now: performance.now()}, window.__trryVitals || {});"
+
+
+def category(name: str, value) -> str:
+    good, poor = THRESHOLDS[name]
+    return 'FAST' if value <= good else 'AVERAGE' if value <= poor else 'SLOW'
+
+
+def total_blocking_time(long_tasks, fcp) -> float:
+    # Lighthouse counts from FCP to TTI; here the end is when the page went quiet
+    return sum(max(0.0, duration - LONG_TASK_MS) for start, duration in long_tasks if start + duration > (fcp or 0))
+
+
+def prepare(driver, strategy: str) -> str:
+    """Throttle, size the viewport and install the observers for `strategy`; blocking.
+
+    Returns the id of the injected script, for restore().
+    """
+    profile = THROTTLING_PROFILES[strategy] if settings.LOCAL_VITALS_THROTTLING else None
+    driver.execute_cdp_cmd("Network.enable", {})
+    # Cold load, like Lighthouse; pooled drivers have the previous lease's cache
+    driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+    if profile:
+        driver.execute_cdp_cmd("Network.emulateNetworkConditions", {
+            "offline": False,
+            "latency": profile["latency"],
+            "downloadThroughput": profile["download"],
+            "uploadThroughput": profile["upload"],
+        })
+        driver.execute_cdp_cmd("Emulation.setCPUThrottlingRate", {"rate": profile["cpu"]})
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", VIEWPORTS[strategy])
+    driver.execute_cdp_cmd("Performance.enable", {})
+    return driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": OBSERVER_SCRIPT})["identifier"]
+
+
+def restore(driver, script_id):
+    """Undo prepare(); the pool's reset doesn't know about throttling."""
+    commands = [
+        ("Network.emulateNetworkConditions", {"offline": False, "latency": 0, "downloadThroughput": -1, "uploadThroughput": -1}),
+        ("Emulation.setCPUThrottlingRate", {"rate": 1}),
+        ("Performance.disable", {}),
+    ]
+    if script_id:
+        commands.append(("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script_id}))
+    for cmd, params in commands:
+        try:
+            driver.execute_cdp_cmd(cmd, params)
+        except (AttributeError, WebDriverException):
+            pass
+
+
+async def wait_until_quiet(driver) -> dict:
+    """Poll the observers until no long task has ended for LOCAL_VITALS_QUIET_SECONDS (or the settle timeout)."""
+    started_at = time.monotonic()
+    quiet_ms = settings.LOCAL_VITALS_QUIET_SECONDS * 1000
+    while True:
+        vitals = await run_webdriver(driver.execute_script, READ_SCRIPT)
+        quiet = vitals.get('fcp') is not None and vitals['now'] - vitals.get('lastLongTaskEnd', 0) >= quiet_ms
+        if quiet or time.monotonic() - started_at >= settings.LOCAL_VITALS_SETTLE_TIMEOUT:
+            return vitals
+        await asyncio.sleep(0.5)
+
+
+def to_metrics_results(vitals: dict, performance: dict) -> dict:
+    """Shape local measurements like PerformanceMetrics.metrics_results.
+
+    Field values get PageSpeed's {"percentile", "category"} form (CLS x100, as PageSpeed
+    reports it). Speed Index needs a filmstrip and is left out.
+    """
+    fcp, lcp, cls = vitals.get('fcp'), vitals.get('lcp'), vitals.get('cls', 0)
+    long_tasks = vitals.get('longTasks') or []
+    tbt = total_blocking_time(long_tasks, fcp)
+    loading = {}
+    if cls is not None:
+        loading["Cumulative Layout Shift Score"] = {"percentile": round(cls * 100), "category": category('cls', cls)}
+    if fcp is not None:
+        loading["First Contentful Paint (ms)"] = {"percentile": round(fcp), "category": category('fcp', fcp)}
+    if lcp is not None:
+        loading["Largest Contentful Paint (ms)"] = {"percentile": round(lcp), "category": category('lcp', lcp)}
+    lighthouse = {
+        "Lighthouse First Contentful Paint (ms)": round(fcp) if fcp is not None else None,
+        "Lighthouse Largest Contentful Paint (ms)": round(lcp) if lcp is not None else None,
+        "Lighthouse Total Blocking Time (ms)": round(tbt),
+    }
+
+    issues = {}
+    for name, key, title, value, unit in (
+        ('first-contentful-paint', 'fcp', "First Contentful Paint", fcp, ' ms'),
+        ('largest-contentful-paint', 'lcp', "Largest Contentful Paint", lcp, ' ms'),
+        ('cumulative-layout-shift', 'cls', "Cumulative Layout Shift", cls, ''),
+        ('total-blocking-time', 'tbt', "Total Blocking Time", tbt, ' ms'),
+    ):
+        if value is not None and category(key, value) != 'FAST':
+            issues[name] = {
+                "Title": title,
+                "Description": f"Measured {value:.0f}{unit}, good is {THRESHOLDS[key][0]}{unit} or less." if unit
+                else f"Measured {value:.3f}, good is {THRESHOLDS[key][0]} or less.",
+            }
+    if long_tasks:
+        longest = max(duration for _, duration in long_tasks)
+        issues['long-tasks'] = {
+            "Title": "Avoid long main-thread tasks",
+            "Description": f"{len(long_tasks)} tasks over {LONG_TASK_MS} ms, the longest took {longest:.0f} ms.",
+        }
+    busy = performance.get('TaskDuration')
+    if busy:
+        issues['mainthread-work-breakdown'] = {
+            "Title": "Minimize main-thread work",
+            "Description": (
+                f"Main thread busy for {busy:.2f} s: script {performance.get('ScriptDuration', 0):.2f} s, "
+                f"layout {performance.get('LayoutDuration', 0):.2f} s, style {performance.get('RecalcStyleDuration', 0):.2f} s."
+            ),
+        }
+    return {
+        "loading_metrics": loading,
+        "lighthouse_metrics": {k: v for k, v in lighthouse.items() if v is not None},
+        "lighthouse_audit_issues": issues,
+    }
+
+
+async def measure(url: str, strategy: str) -> dict:
+    """Load `url` on a pooled Chrome session under `strategy`'s throttling and collect its vitals; {} on failure."""
+    async with loop_semaphore('local_vitals', settings.LOCAL_VITALS_CONCURRENCY):
+        try:
+            async with get_driver_pool().lease_async() as driver:
+                script_id = None
+                timed_out = False
+                try:
+                    script_id = await run_webdriver(prepare, driver, strategy)
+                    await run_webdriver(driver.get, url, timeout=settings.WEBDRIVER_PAGE_LOAD_TIMEOUT)
+                    vitals = await wait_until_quiet(driver)
+                    result = await run_webdriver(driver.execute_cdp_cmd, "Performance.getMetrics", {})
+                    performance = {m["name"]: m["value"] for m in result.get("metrics", [])}
+                except asyncio.TimeoutError:
+                    # The timed out call may still be running on the driver, which lease_async
+                    # discards; restoring it now would drive the session from two threads
+                    timed_out = True
+                    raise
+                finally:
+                    if not timed_out:
+                        await run_webdriver(restore, driver, script_id)
+            if vitals.get('fcp') is None:
+                logger.error(f"{url} ({strategy}) never painted within {settings.LOCAL_VITALS_SETTLE_TIMEOUT}s")
+                return {}
+            return to_metrics_results(vitals, performance)
+        except (AttributeError, WebDriverException) as e:
+            # AttributeError: a grid session without CDP
+            logger.error(f"Local vitals unavailable for {url} ({strategy}): {e}")
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out measuring local vitals for {url} ({strategy})")
+        except Exception as e:
+            logger.error(f"Error measuring local vitals for {url} ({strategy}): {e}")
+        return {}
+
+
+async def measure_all(urls: List[str], strategies) -> Dict[str, Dict[str, dict]]:
+    """Local metrics for every URL and strategy: {url: {strategy: metrics_results}}."""
+    pairs = [(url, strategy) for url in urls for strategy in strategies]
+    results = await asyncio.gather(*(
+        get_singleflight().do_async(flight_key('local_vitals', url, strategy=strategy), lambda u=url, s=strategy: measure(u, s))
+        for url, strategy in pairs
+    ))
+    report = {url: {} for url in urls}
+    for (url, strategy), result in zip(pairs, results):
+        report[url][strategy] = result
+    return report
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List
+
+import aiohttp
+from django.conf import settings
+
+from core import metrics
+from core.automation.executor import loop_semaphore
+from core.lighthouse.pagespeed_cache import get_pagespeed_store
+from core.lighthouse.pagespeed_extract import PageSpeedExtractor
+from core.singleflight import get_singleflight, flight_key
+from core.utils import closes_db_connection
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('mobile', 'desktop')
+# PageSpeed answers these when it is overloaded or rate limiting the key
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CHUNK_SIZE = 64 * 1024
+
+
+def new_pagespeed_session() -> aiohttp.ClientSession:
+    """Keep-alive session for the PageSpeed API; one per event loop, like the crawler's."""
+    connector = aiohttp.TCPConnector(limit=settings.PAGESPEED_CONCURRENCY)
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=settings.PAGESPEED_TIMEOUT),
+    )
+
+
+def pagespeed_params(url: str, strategy: str) -> list:
+    # `category` repeats once per category
+    params = [("url", url), ("strategy", strategy)]
+    params += [("category", category) for category in settings.PAGESPEED_CATEGORIES]
+    if settings.PAGESPEED_API_KEY:
+        params.append(("key", settings.PAGESPEED_API_KEY))
+    return params
+
+
+def backoff(attempt: int) -> float:
+    # Full jitter, as in the LLM scheduler
+    return random.uniform(0, min(settings.PAGESPEED_BACKOFF_MAX_SECONDS, settings.PAGESPEED_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+async def fetch(session: aiohttp.ClientSession, url: str, strategy: str = 'mobile') -> dict:
+    """Run PageSpeed on `url` for one strategy; {} when it keeps failing.
+
+    The payload is pruned to what PerformanceMetrics reads (see pagespeed_extract).
+
+    At most PAGESPEED_CONCURRENCY runs are in flight per event loop. Timeouts, network
+    errors, 429 and 5xx are retried with backoff; other errors (e.g. PageSpeed could not
+    load the page) are not.
+    """
+    params = pagespeed_params(url, strategy)
+    for attempt in range(settings.PAGESPEED_MAX_RETRIES + 1):
+        start_time = time.time()
+        try:
+            async with loop_semaphore('pagespeed', settings.PAGESPEED_CONCURRENCY):
+                async with session.get(settings.PAGESPEED_API_URL, params=params) as response:
+                    if response.status == 200:
+                        # Only the fields PerformanceMetrics reads are kept, screenshots and details are skipped
+                        extractor = PageSpeedExtractor()
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            extractor.feed(chunk)
+                        payload = extractor.close()
+                        metrics.increment('pagespeed.calls')
+                        metrics.increment('pagespeed.latency_seconds', time.time() - start_time)
+                        return payload
+                    error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                    retryable = response.status in RETRY_STATUSES
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            error, retryable = str(e) or type(e).__name__, not isinstance(e, ValueError)
+        if not retryable or attempt == settings.PAGESPEED_MAX_RETRIES:
+            break
+        metrics.increment('pagespeed.retries')
+        await asyncio.sleep(backoff(attempt))
+    metrics.increment('pagespeed.failures')
+    logger.error(f"PageSpeed failed for {url} ({strategy}): {error}")
+    return {}
+
+
+async def fetch_once(url: str, strategy: str) -> dict:
+    """fetch() on a session of its own, for background refreshes."""
+    async with new_pagespeed_session() as session:
+        return await fetch(session, url, strategy)
+
+
+async def fetch_cached(session: aiohttp.ClientSession, url: str, strategy: str, force_fresh: bool = False) -> dict:
+    """fetch() behind the PageSpeed cache; a stale hit is served and refreshed in the background."""
+    store = get_pagespeed_store()
+    if store is None:
+        return await fetch(session, url, strategy)
+    categories = settings.PAGESPEED_CATEGORIES
+    if not force_fresh:
+        try:
+            payload, stale = await asyncio.to_thread(closes_db_connection(store.get), url, strategy, categories)
+        except Exception as e:
+            logger.error(f"PageSpeed cache lookup failed: {e}")
+            payload, stale = None, False
+        if payload is not None:
+            if stale:
+                store.refresh_in_background(url, strategy, categories, fetch_once)
+            return payload
+    payload = await fetch(session, url, strategy)
+    if payload:
+        try:
+            await asyncio.to_thread(closes_db_connection(store.put), url, strategy, categories, payload)
+        except Exception as e:
+            logger.error(f"Error caching PageSpeed for {url} ({strategy}): {e}")
+    return payload
+
+
+async def fetch_shared(session: aiohttp.ClientSession, url: str, strategy: str, force_fresh: bool = False) -> dict:
+    # Concurrent runs for the same URL and strategy share one PageSpeed call; forced runs
+    # only share with each other and aren't memoized
+    return await get_singleflight().do_async(
+        flight_key('pagespeed', url, strategy=strategy, fresh=force_fresh),
+        lambda: fetch_cached(session, url, strategy, force_fresh),
+        memo_seconds=0 if force_fresh else None,
+    )
+
+
+async def fetch_all(urls: List[str], strategies=STRATEGIES, force_fresh: bool = False) -> Dict[str, Dict[str, dict]]:
+    """PageSpeed payloads for every URL and strategy, fetched in parallel: {url: {strategy: payload}}.
+
+    Cached runs are used unless `force_fresh`.
+    """
+    async with new_pagespeed_session() as session:
+        pairs = [(url, strategy) for url in urls for strategy in strategies]
+        payloads = await asyncio.gather(*(fetch_shared(session, url, strategy, force_fresh) for url, strategy in pairs))
+    results = {url: {} for url in urls}
+    for (url, strategy), payload in zip(pairs, payloads):
+        results[url][strategy] = payload
+    return results
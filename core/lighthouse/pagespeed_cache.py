@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core import metrics
+from core.models import PageSpeedCache, PageSpeedSite
+from core.utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+def pagespeed_key(url: str, strategy: str, categories) -> str:
+    joined = ','.join(sorted(categories))
+    return hashlib.sha256(f"{normalize_url(url)}\n{strategy}\n{joined}".encode('utf-8')).hexdigest()
+
+
+def site_key(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+class PageSpeedStore:
+    """DB cache of PageSpeed payloads with a TTL, stale-while-revalidate and a size cap.
+
+    A payload younger than `ttl_seconds` is served as is; up to `stale_seconds` past that
+    it is served while a background thread fetches a new one. Rows are evicted least
+    recently used first once their payloads add up to more than `max_bytes`. Blocking,
+    call it off the event loop.
+    """
+
+    def __init__(self, ttl_seconds: int, stale_seconds: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_bytes = max_bytes
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, url: str, strategy: str, categories):
+        """(payload, is_stale) for a servable cached run, (None, False) on a miss."""
+        key = pagespeed_key(url, strategy, categories)
+        entry = PageSpeedCache.objects.filter(cache_key=key).only('id', 'payload', 'fetched_at').first()
+        age = timezone.now() - entry.fetched_at if entry is not None else None
+        if age is None or age >= timedelta(seconds=self.ttl_seconds + self.stale_seconds):
+            metrics.increment('pagespeed_cache.misses')
+            return None, False
+        PageSpeedCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+        stale = age >= timedelta(seconds=self.ttl_seconds)
+        metrics.increment('pagespeed_cache.stale_hits' if stale else 'pagespeed_cache.hits')
+        return json.loads(entry.payload), stale
+
+    def put(self, url: str, strategy: str, categories, payload: dict):
+        text = json.dumps(payload, separators=(',', ':'))
+        now = timezone.now()
+        # One upsert statement; update_or_create's read-then-write transaction deadlocks on SQLite
+        # when several runs finish at once
+        PageSpeedCache.objects.bulk_create([PageSpeedCache(
+            cache_key=pagespeed_key(url, strategy, categories),
+            url=normalize_url(url), strategy=strategy, categories=','.join(sorted(categories)),
+            payload=text, size_bytes=len(text), fetched_at=now, last_used_at=now,
+        )], update_conflicts=True, unique_fields=['cache_key'],
+            update_fields=['url', 'strategy', 'categories', 'payload', 'size_bytes', 'fetched_at', 'last_used_at'])
+        self.evict()
+
+    def site_urls(self, url: str) -> Optional[list]:
+        """URLs last measured for the target `url`, None when unknown or older than the TTL."""
+        cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds)
+        entry = PageSpeedSite.objects.filter(cache_key=site_key(url), fetched_at__gte=cutoff).only('urls').first()
+        metrics.increment('pagespeed_cache.site_hits' if entry is not None else 'pagespeed_cache.site_misses')
+        return json.loads(entry.urls) if entry is not None else None
+
+    def put_site_urls(self, url: str, urls) -> None:
+        PageSpeedSite.objects.bulk_create([PageSpeedSite(
+            cache_key=site_key(url), url=normalize_url(url), urls=json.dumps(list(urls)), fetched_at=timezone.now(),
+        )], update_conflicts=True, unique_fields=['cache_key'], update_fields=['url', 'urls', 'fetched_at'])
+
+    def evict(self) -> int:
+        """Drop least recently used rows until the payloads fit in `max_bytes`."""
+        total = PageSpeedCache.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return 0
+        victims = []
+        for pk, size in PageSpeedCache.objects.order_by('last_used_at').values_list('id', 'size_bytes').iterator():
+            if excess <= 0:
+                break
+            victims.append(pk)
+            excess -= size
+        PageSpeedCache.objects.filter(id__in=victims).delete()
+        metrics.increment('pagespeed_cache.evicted', len(victims))
+        return len(victims)
+
+    def _refresh(self, key, url, strategy, categories, fetch_payload):
+        try:
+            payload = asyncio.run(fetch_payload(url, strategy))
+            if payload:
+                self.put(url, strategy, categories, payload)
+                metrics.increment('pagespeed_cache.refreshes')
+        except Exception as e:
+            logger.error(f"Error refreshing PageSpeed for {url} ({strategy}): {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+            close_old_connections()
+
+    def refresh_in_background(self, url: str, strategy: str, categories, fetch_payload):
+        """Re-run PageSpeed in a thread with `fetch_payload(url, strategy)`, once per key at a time."""
+        key = pagespeed_key(url, strategy, categories)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(
+            target=self._refresh, args=(key, url, strategy, categories, fetch_payload),
+            name='pagespeed-refresh', daemon=True,
+        ).start()
+
+    def purge(self) -> int:
+        """Delete runs too old to be served even stale, then enforce the size cap."""
+        cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds + self.stale_seconds)
+        deleted, _ = PageSpeedCache.objects.filter(fetched_at__lt=cutoff).delete()
+        sites, _ = PageSpeedSite.objects.filter(fetched_at__lt=timezone.now() - timedelta(seconds=self.ttl_seconds)).delete()
+        return deleted + sites + self.evict()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_pagespeed_store() -> Optional[PageSpeedStore]:
+    """Process-wide PageSpeed cache, or None when PAGESPEED_CACHE_ENABLED is off."""
+    global _store
+    if not settings.PAGESPEED_CACHE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = PageSpeedStore(
+                ttl_seconds=settings.PAGESPEED_CACHE_TTL_SECONDS,
+                stale_seconds=settings.PAGESPEED_CACHE_STALE_SECONDS,
+                max_bytes=settings.PAGESPEED_CACHE_MAX_BYTES,
+            )
+        return _store
@@ -0,0 +1,212 @@
+import codecs
+import json
+import re
+
+# Subtrees kept whole, as lists of keys from the root
+CAPTURED = {
+    ('loadingExperience', 'metrics'),
+    ('lighthouseResult', 'audits', 'metrics', 'details', 'items'),
+}
+AUDIT_FIELDS = ('title', 'description', 'score')
+# Top-level scalars kept; the analysis time dates the run in the metric history
+ROOT_FIELDS = ('analysisUTCTimestamp',)
+
+_SIGNIFICANT = re.compile(r'["{}\[\],:]')
+# Inside a skipped subtree only nesting matters: one match runs through everything up to
+# the next bracket, complete strings included
+_SKIP_RUN = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+# String body up to (not including) the closing quote, unrolled so long base64 strings are
+# matched in one C-level pass. It stops before a trailing lone backslash, so a string cut
+# by a chunk boundary can be resumed from where the match ended
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*')
+
+
+class PageSpeedExtractor:
+    """Pulls the parts of a PageSpeed response that PerformanceMetrics reads out of a byte stream.
+
+    Feed it the response in chunks; close() returns a pruned payload with the same layout
+    as the full one: loadingExperience.metrics, the metrics audit's details.items,
+    title/description/score of every audit and the analysis timestamp. Everything else (screenshots, filmstrip,
+    audit details, i18n) is scanned past without being decoded, so memory stays around
+    one chunk plus the largest single string.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._kinds = []  # '{' or '[' per open container
+        self._path = []  # key (or index) each open container sits under, root excluded
+        self._indexes = []  # current index per open container (arrays only use it)
+        self._key = None  # last key read in the innermost object
+        self._expect_key = False
+        self._value_start = None  # where a value that may be a bare scalar starts
+        self._skip = 0  # nesting depth inside a subtree being scanned past
+        self._capture = None  # (start, path) of the skipped subtree that is kept whole
+        self._string = None  # (start or None when not kept, resume position) of a string cut by a chunk boundary
+        self.result = {}
+
+    def feed(self, chunk: bytes):
+        self._buf += self._decoder.decode(chunk)
+        self._scan()
+        self._trim()
+
+    def close(self) -> dict:
+        self._buf += self._decoder.decode(b'', final=True)
+        self._scan()
+        if self._kinds:
+            raise ValueError("Truncated PageSpeed response")
+        return self.result
+
+    def _trim(self):
+        # Keep what a pending capture or scalar still needs, drop everything scanned before it
+        keep = self._pos
+        if self._string is not None and self._string[0] is not None:
+            keep = min(keep, self._string[0])
+        if self._capture is not None:
+            keep = min(keep, self._capture[0])
+        if self._value_start is not None:
+            keep = min(keep, self._value_start)
+        if keep:
+            self._buf = self._buf[keep:]
+            self._pos -= keep
+            if self._capture is not None:
+                self._capture = (self._capture[0] - keep,) + self._capture[1:]
+            if self._value_start is not None:
+                self._value_start -= keep
+            if self._string is not None:
+                start, resume = self._string
+                self._string = (start - keep if start is not None else None, resume - keep)
+
+    def _needs_string(self) -> bool:
+        # Keys and kept fields are decoded; other strings are only skipped
+        return self._expect_key or self._is_kept_field()
+
+    @staticmethod
+    def _leads_somewhere(path) -> bool:
+        """Whether a container at `path` can hold anything that is kept."""
+        depth = len(path)
+        if any(tuple(path) == captured[:depth] for captured in CAPTURED):
+            return True
+        return depth == 3 and path[0] == 'lighthouseResult' and path[1] == 'audits'
+
+    def _is_kept_field(self) -> bool:
+        if len(self._kinds) == 1:
+            return self._key in ROOT_FIELDS
+        return (self._key in AUDIT_FIELDS and len(self._path) == 3 and self._kinds[-1] == '{'
+                and self._path[0] == 'lighthouseResult' and self._path[1] == 'audits')
+
+    def _read_string(self, buf: str, start, resume: int) -> bool:
+        """Consume a string whose body continues at `resume`; False when it runs past the buffer."""
+        if not self._expect_key:
+            self._value_start = None  # a string value, not a bare scalar
+        end = _STRING_BODY.match(buf, resume).end()
+        if end == len(buf) or buf[end] != '"':  # or cut right after a backslash
+            # Strings nobody needs aren't kept in the buffer while they stream past
+            self._string = (start, end)
+            self._pos = end if start is None else start
+            return False
+        self._string = None
+        self._pos = end + 1
+        if start is not None and self._expect_key:
+            self._key = json.loads(buf[start:end + 1])
+            self._expect_key = False
+        elif start is not None:
+            self._on_scalar(buf[start:end + 1])
+        return True
+
+    def _scan(self):
+        buf = self._buf
+        if self._string is not None and not self._read_string(buf, *self._string):
+            return
+        while True:
+            if self._skip and not self._skip_scan(buf):
+                return
+            match = _SIGNIFICANT.search(buf, self._pos)
+            if match is None:
+                return
+            char, at = match.group(), match.start()
+            if char == '"':
+                if not self._read_string(buf, at if self._needs_string() else None, at + 1):
+                    return
+                continue
+            self._pos = at + 1
+            if char == ':':
+                self._value_start = self._pos
+            elif char == ',':
+                self._end_scalar(at)
+                if self._kinds[-1] == '{':
+                    self._expect_key = True
+                else:
+                    self._indexes[-1] += 1
+                    self._value_start = self._pos
+            elif char in '{[':
+                self._value_start = None
+                if self._kinds:
+                    path = self._path + [self._key if self._kinds[-1] == '{' else self._indexes[-1]]
+                    if tuple(path) in CAPTURED:
+                        self._capture = (at, tuple(path))
+                    if self._capture is not None or not self._leads_somewhere(path):
+                        self._skip = 1
+                        continue
+                    self._path = path
+                self._kinds.append(char)
+                self._indexes.append(0)
+                self._key = None
+                self._expect_key = char == '{'
+                if char == '[':
+                    self._value_start = self._pos
+            else:
+                if not self._kinds:
+                    raise ValueError("Unbalanced PageSpeed response")
+                self._end_scalar(at)
+                self._kinds.pop()
+                self._indexes.pop()
+                if self._kinds:
+                    last = self._path.pop()
+                    self._key = last if self._kinds[-1] == '{' else None
+                self._expect_key = False
+
+    def _skip_scan(self, buf: str) -> bool:
+        """Scan to the end of the skipped subtree; False when it runs past the buffer."""
+        while self._skip:
+            self._pos = _SKIP_RUN.match(buf, self._pos).end()
+            if self._pos == len(buf):
+                return False
+            char = buf[self._pos]
+            if char == '"':
+                # A string cut by the end of the buffer
+                if not self._read_string(buf, None, self._pos + 1):
+                    return False
+                continue
+            self._pos += 1
+            self._skip += 1 if char in '{[' else -1
+        if self._capture is not None:
+            self._store(self._capture[1], json.loads(buf[self._capture[0]:self._pos]))
+            self._capture = None
+        return True
+
+    def _end_scalar(self, at: int):
+        if self._value_start is not None:
+            scalar = self._buf[self._value_start:at].strip()
+            self._value_start = None
+            if scalar:
+                self._on_scalar(scalar)
+
+    def _on_scalar(self, text: str):
+        if self._is_kept_field():
+            self._store((*self._path, self._key), json.loads(text))
+
+    def _store(self, path, value):
+        node = self.result
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+
+
+def extract_pagespeed(data: bytes, chunk_size: int = 64 * 1024) -> dict:
+    """Run the extractor over an in-memory payload (recorded fixtures, benchmarks)."""
+    extractor = PageSpeedExtractor()
+    for offset in range(0, len(data), chunk_size):
+        extractor.feed(data[offset:offset + chunk_size])
+    return extractor.close()
@@ -4,6 +4,14 @@ load_dotenv()
 
 PROMPT = 'IF you find any problems or any grammer in ui, in image please give me in points wise'
 
+BATCH_PROMPT = (
+    'You get several screenshots, each one introduced by its "Image <n>" label. '
+    'For every image, IF you find any problems or any grammer in ui, give them in points wise '
+    'and put the image number in "image". Return one entry per image, also when it has no problems.'
+)
+
+MODEL_NAME = 'models/gemini-2.0-flash'
+
 
 SAFE_SETTINGS = [
     {
@@ -24,7 +32,7 @@ SAFE_SETTINGS = [
     },
 ]
 
+# Checked when the client is first used (core.llm.config.ApiClient), not at import
 genai_api_key = os.getenv('GEMINI_API_KEY')
-os.environ['GOOGLE_API_KEY'] = os.getenv('GEMINI_API_KEY')
-if genai_api_key is None:
-    raise ValueError("Missing GEMINI_API_KEY environment variable")
+if genai_api_key is not None:
+    os.environ['GOOGLE_API_KEY'] = genai_api_key
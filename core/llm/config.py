@@ -1,51 +1,132 @@
-import google.generativeai as genai
-from core.llm import genai_api_key, SAFE_SETTINGS, PROMPT
+from google import genai
+from google.genai import types as genai_types
+from core.llm import genai_api_key, SAFE_SETTINGS, PROMPT, BATCH_PROMPT, MODEL_NAME
+from core.llm.scheduler import get_llm_scheduler, estimate_tokens, LINK_RANKING, IMAGE_REVIEW
+from django.conf import settings
+import json
 import asyncio
+import threading
+import time
 from typing_extensions import TypedDict
 class LlmResponse(TypedDict):
     response : list[str]
+class LlmImageResponse(LlmResponse):
+    image : int
+
+def image_part(image):
+    """PIL images pass through; CapturedImage and raw encoded bytes (PNG assumed) become inline parts."""
+    if hasattr(image, 'as_blob'):
+        blob = image.as_blob()
+        return genai_types.Part.from_bytes(data=blob["data"], mime_type=blob["mime_type"])
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return genai_types.Part.from_bytes(data=bytes(image), mime_type="image/png")
+    return image
+
+
+def http_options():
+    # Retries are left to the scheduler; the SDK's own 503 retry would hide outages from its circuit breaker.
+    # One attempt, timeout in milliseconds
+    return genai_types.HttpOptions(
+        timeout=int(settings.LLM_REQUEST_TIMEOUT * 1000),
+        retry_options=genai_types.HttpRetryOptions(attempts=1),
+    )
+
+
+def generation_config(schema=None):
+    return genai_types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=schema or list[LlmResponse],
+        safety_settings=SAFE_SETTINGS,
+    )
+
+
+def parse_batch_review(text, count):
+    """Split a batched review (list[LlmImageResponse]) into one findings list per image.
+
+    Raises ValueError when the answer doesn't account for every image, so callers can
+    fall back to one request per image.
+    """
+    findings = [None] * count
+    for entry in json.loads(text):
+        index = entry.get('image')
+        if not isinstance(index, int) or not 0 <= index < count or not isinstance(entry.get('response'), list):
+            raise ValueError(f"Unexpected entry in batched review: {entry}")
+        findings[index] = (findings[index] or []) + entry['response']
+    missing = [index for index, value in enumerate(findings) if value is None]
+    if missing:
+        raise ValueError(f"Batched review has no answer for images {missing}")
+    return findings
+
+
 # Initialize the API client
 class ApiClient():
+    """Shared Gemini client.
+
+    One google.genai Client serves sync calls (client.models) and async ones
+    (client.aio). The SDK opens an aiohttp session per event loop and every job runs its
+    own asyncio.run(), so runs that call Gemini go through run_async() to close theirs.
+    """
 
     def __init__(self):
-        genai.configure(api_key=genai_api_key)
+        if genai_api_key is None:
+            raise ValueError("Missing GEMINI_API_KEY environment variable")
+        self.client = genai.Client(api_key=genai_api_key, http_options=http_options())
 
-    def configure_llm(self, schema=None):
-        try:
+    def generate_content(self, contents, schema=None, model_name=MODEL_NAME):
+        return self.client.models.generate_content(model=model_name, contents=contents, config=generation_config(schema))
 
-            llm = genai.GenerativeModel('models/gemini-2.0-flash',
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    response_schema=list[LlmResponse]
-                ))
+    def generate_content_async(self, contents, schema=None, model_name=MODEL_NAME):
+        """Coroutine for one generateContent call on the running loop."""
+        return self.client.aio.models.generate_content(
+            model=model_name, contents=contents, config=generation_config(schema)
+        )
 
-            if llm is None:
-                raise ValueError("LLM component is None")
-            return llm
-        except Exception as e:
-            print(f"Failed to configure LLM: {e}")
-            return None
+    async def close_loop_session(self):
+        """Close the HTTP session the SDK opened for the running loop, if any.
+
+        client.aio.aclose() would also close the sessions of other jobs' loops mid-request.
+        """
+        sessions = getattr(self.client._api_client, '_aiohttp_sessions', None) or {}
+        session = sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
 
     def generate_valdi_urls(self, contents, schema=None):
         try:
-            llm = self.configure_llm(schema=schema)
-            response = llm.generate_content(contents=contents,
-                safety_settings=SAFE_SETTINGS,
-                )
+            response = get_llm_scheduler().call_sync(
+                LINK_RANKING,
+                lambda: self.generate_content(contents, schema=schema),
+                tokens=estimate_tokens(contents),
+            )
             return response
         except Exception as e:
             print(f"Failed to generate content: {e}")
             return None
 
+    async def generate_valdi_urls_async(self, contents, schema=None):
+        try:
+            return await get_llm_scheduler().call(
+                LINK_RANKING,
+                lambda: self.generate_content_async(contents, schema=schema),
+                tokens=estimate_tokens(contents),
+            )
+        except Exception as e:
+            print(f"Failed to generate content: {e}")
+            return None
+
     async def generate_content_for_image(self, image):
-        """Async function to generate content from image."""
+        """Async function to generate content from image.
+
+        `image` is a PIL image, a CapturedImage, or raw encoded bytes/memoryview (PNG assumed);
+        encoded buffers go to the API as inline data without being decoded.
+        """
         try:
-            import time
             start = time.time()
-            llm = self.configure_llm()
-            response = await asyncio.to_thread(
-                llm.generate_content, [PROMPT, image],
-                safety_settings=SAFE_SETTINGS,
+            contents = [PROMPT, image_part(image)]
+            response = await get_llm_scheduler().call(
+                IMAGE_REVIEW,
+                lambda: self.generate_content_async(contents),
+                tokens=estimate_tokens(contents),
             )
             print(f"Time taken to generate content: {time.time() - start}")
             return response
@@ -53,10 +134,57 @@ class ApiClient():
             print(f"Failed to generate content: {e}")
             return None
 
+    async def generate_content_for_images(self, images, labels=None):
+        """Review several images in one multimodal request.
+
+        Each image is preceded by an "Image <n>" label (plus `labels[n]` when given); the
+        answer is a list[LlmImageResponse], see parse_batch_review().
+        """
+        try:
+            start = time.time()
+            contents = [BATCH_PROMPT]
+            for index, image in enumerate(images):
+                contents.append(f"Image {index}: {labels[index]}" if labels else f"Image {index}")
+                contents.append(image_part(image))
+            response = await get_llm_scheduler().call(
+                IMAGE_REVIEW,
+                lambda: self.generate_content_async(contents, schema=list[LlmImageResponse]),
+                tokens=estimate_tokens(contents),
+            )
+            print(f"Time taken to generate content for {len(images)} images: {time.time() - start}")
+            return response
+        except Exception as e:
+            print(f"Failed to generate content: {e}")
+            return None
+
+
+_api_client = None
+_api_client_lock = threading.Lock()
+
+
+def get_api_client() -> ApiClient:
+    """Process-wide ApiClient; use this instead of constructing ApiClient() per call."""
+    global _api_client
+    with _api_client_lock:
+        if _api_client is None:
+            _api_client = ApiClient()
+        return _api_client
+
+
+def run_async(coro):
+    """asyncio.run() for work that may call Gemini; closes the loop's Gemini session before the loop ends."""
+    async def run():
+        try:
+            return await coro
+        finally:
+            if _api_client is not None:
+                await _api_client.close_loop_session()
+    return asyncio.run(run())
+
 # if __name__ == '__main__':
 #     from PIL import Image
 #     import json
-#     api = ApiClient()
+#     api = get_api_client()
 #     image = Image.open('reports/capture_screenshots/desktop_drive.google.com.png')
 #     response = asyncio.run(api.generate_content_for_image(image))
-#     print(type(json.loads(response.text)[0]['response'][0]))
\ No newline at end of file
+#     print(type(json.loads(response.text)[0]['response'][0]))
@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from core import metrics
+from core.models import LinkRankingCache
+from core.utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+def target_key(target_url: str) -> str:
+    return hashlib.sha256(normalize_url(target_url).encode('utf-8')).hexdigest()
+
+
+def link_set_hash(links) -> str:
+    # Order and duplicates don't change the ranking input
+    joined = '\n'.join(sorted({normalize_url(link) for link in links}))
+    return hashlib.sha256(joined.encode('utf-8')).hexdigest()
+
+
+class LinkRankingStore:
+    """DB cache of LLM link rankings with a TTL and stale-while-revalidate.
+
+    A ranking younger than `ttl_seconds` is served as is. Up to `stale_seconds` past
+    that it is still served, but a background thread re-ranks the links and replaces
+    it; older rankings are treated as misses. Blocking, call it off the event loop.
+    """
+
+    def __init__(self, ttl_seconds: int, stale_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _store(self, key, target_url, links_hash, ranked):
+        LinkRankingCache.objects.update_or_create(
+            target_key=key, link_set_hash=links_hash,
+            defaults={"target_url": normalize_url(target_url), "ranked_links": ranked, "ranked_at": timezone.now()},
+        )
+
+    def _refresh(self, key, target_url, links_hash, links, rank):
+        try:
+            ranked = rank(target_url, links)
+            if ranked is not None:
+                self._store(key, target_url, links_hash, ranked)
+                metrics.increment('link_ranking_cache.refreshes')
+        except Exception as e:
+            logger.error(f"Error refreshing link ranking for {target_url}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard((key, links_hash))
+            close_old_connections()
+
+    def _refresh_in_background(self, key, target_url, links_hash, links, rank):
+        with self._lock:
+            if (key, links_hash) in self._refreshing:
+                return
+            self._refreshing.add((key, links_hash))
+        threading.Thread(
+            target=self._refresh, args=(key, target_url, links_hash, links, rank),
+            name='link-ranking-refresh', daemon=True,
+        ).start()
+
+    def get_or_rank(self, target_url: str, links, rank) -> Optional[list]:
+        """Cached ranking of `links` for `target_url`, or `rank(target_url, links)` on a miss.
+
+        `rank` returns the ranked list, or None when the LLM couldn't answer (not cached).
+        """
+        key, links_hash = target_key(target_url), link_set_hash(links)
+        try:
+            entry = LinkRankingCache.objects.filter(target_key=key, link_set_hash=links_hash).first()
+        except Exception as e:
+            logger.error(f"Link ranking cache lookup failed: {e}")
+            entry = None
+        if entry is not None:
+            age = timezone.now() - entry.ranked_at
+            if age < timedelta(seconds=self.ttl_seconds + self.stale_seconds):
+                LinkRankingCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1)
+                if age < timedelta(seconds=self.ttl_seconds):
+                    metrics.increment('link_ranking_cache.hits')
+                else:
+                    metrics.increment('link_ranking_cache.stale_hits')
+                    self._refresh_in_background(key, target_url, links_hash, list(links), rank)
+                return entry.ranked_links
+        metrics.increment('link_ranking_cache.misses')
+        ranked = rank(target_url, links)
+        if ranked is not None:
+            try:
+                self._store(key, target_url, links_hash, ranked)
+            except Exception as e:
+                logger.error(f"Error caching link ranking for {target_url}: {e}")
+        return ranked
+
+    def purge(self) -> int:
+        """Delete rankings too old to be served even stale."""
+        cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds + self.stale_seconds)
+        deleted, _ = LinkRankingCache.objects.filter(ranked_at__lt=cutoff).delete()
+        return deleted
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_link_ranking_store() -> Optional[LinkRankingStore]:
+    """Process-wide ranking cache, or None when LINK_RANKING_CACHE_ENABLED is off."""
+    global _store
+    if not settings.LINK_RANKING_CACHE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = LinkRankingStore(
+                ttl_seconds=settings.LINK_RANKING_CACHE_TTL_SECONDS,
+                stale_seconds=settings.LINK_RANKING_CACHE_STALE_SECONDS,
+            )
+        return _store
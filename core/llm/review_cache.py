@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image
+
+from core import metrics
+from core.models import LlmReviewCache
+from core.utils import closes_db_connection
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+
+def dhash(data: bytes):
+    """64-bit difference hash of an encoded image, plus its (width, height)."""
+    with Image.open(io.BytesIO(data)) as image:
+        size = image.size
+        image.draft('L', (64, 64))  # lets JPEG decode at reduced scale
+        small = image.convert('L').resize((9, 8), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value, size
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def hash_bands(phash: int):
+    return [(phash >> (16 * i)) & 0xFFFF for i in range(4)]
+
+
+def review_key(prompt: str, model: str, size) -> str:
+    # The viewport size is part of the key, so a phone shot never answers for a desktop one
+    return hashlib.sha256(f"{model}\n{size[0]}x{size[1]}\n{prompt}".encode('utf-8')).hexdigest()
+
+
+class ReviewCache:
+    """LLM review cache keyed by perceptual hash + prompt + model.
+
+    An in-process LRU sits in front of the LlmReviewCache table. A lookup matches any
+    stored screenshot within `max_distance` bits of Hamming distance that is younger
+    than `ttl_seconds`.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, max_distance: int, persistent: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.persistent = persistent
+        self._entries = OrderedDict()  # (review_key, phash) -> (response, stored_at)
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def _lookup_memory(self, key: str, phash: int):
+        now = time.time()
+        with self._lock:
+            exact = self._entries.get((key, phash))
+            if exact is not None and now - exact[1] < self.ttl_seconds:
+                self._entries.move_to_end((key, phash))
+                return exact[0]
+            best, best_distance = None, self.max_distance + 1
+            for (entry_key, entry_hash), (response, stored_at) in self._entries.items():
+                if entry_key != key or now - stored_at >= self.ttl_seconds:
+                    continue
+                distance = hamming(phash, entry_hash)
+                if distance < best_distance:
+                    best, best_distance = (entry_key, entry_hash), distance
+            if best is None:
+                return None
+            self._entries.move_to_end(best)
+            return self._entries[best][0]
+
+    def _remember(self, key: str, phash: int, response):
+        with self._lock:
+            self._entries[(key, phash)] = (response, time.time())
+            self._entries.move_to_end((key, phash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup_db(self, key: str, phash: int):
+        bands = hash_bands(phash)
+        candidates = LlmReviewCache.objects.filter(
+            Q(band0=bands[0]) | Q(band1=bands[1]) | Q(band2=bands[2]) | Q(band3=bands[3]),
+            review_key=key,
+            created_at__gte=timezone.now() - timedelta(seconds=self.ttl_seconds),
+        ).only('id', 'phash', 'response')
+        best, best_distance = None, self.max_distance + 1
+        for candidate in candidates:
+            distance = hamming(phash, int(candidate.phash, 16))
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        if best is None:
+            return None
+        LlmReviewCache.objects.filter(id=best.id).update(hits=F('hits') + 1)
+        return best.response
+
+    @closes_db_connection
+    def _store_db(self, key: str, phash: int, response):
+        bands = hash_bands(phash)
+        LlmReviewCache.objects.create(
+            review_key=key, phash=f"{phash:016x}",
+            band0=bands[0], band1=bands[1], band2=bands[2], band3=bands[3],
+            response=response,
+        )
+        if time.time() - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self._last_purge = time.time()
+            cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds)
+            LlmReviewCache.objects.filter(created_at__lt=cutoff).delete()
+
+    @closes_db_connection
+    def _lookup_sync(self, data: bytes, prompt: str, model: str):
+        phash, size = dhash(data)
+        key = review_key(prompt, model, size)
+        response = self._lookup_memory(key, phash)
+        if response is not None:
+            metrics.increment('llm_review_cache.memory_hits')
+            return (key, phash), response
+        if self.persistent:
+            response = self._lookup_db(key, phash)
+            if response is not None:
+                metrics.increment('llm_review_cache.db_hits')
+                self._remember(key, phash, response)
+                return (key, phash), response
+        metrics.increment('llm_review_cache.misses')
+        return (key, phash), None
+
+    async def lookup(self, data: bytes, prompt: str, model: str):
+        """Return (fingerprint, cached response or None); the fingerprint is handed back to store()."""
+        try:
+            return await asyncio.to_thread(self._lookup_sync, data, prompt, model)
+        except Exception as e:
+            logger.error(f"Review cache lookup failed: {e}")
+            return None, None
+
+    async def store(self, fingerprint, response):
+        if fingerprint is None or response is None:
+            return
+        key, phash = fingerprint
+        self._remember(key, phash, response)
+        if self.persistent:
+            try:
+                await asyncio.to_thread(self._store_db, key, phash, response)
+            except Exception as e:
+                logger.error(f"Review cache store failed: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_review_cache() -> Optional[ReviewCache]:
+    """Process-wide review cache, or None when LLM_REVIEW_CACHE_ENABLED is off."""
+    global _cache
+    if not settings.LLM_REVIEW_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReviewCache(
+                max_entries=settings.LLM_REVIEW_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.LLM_REVIEW_CACHE_TTL_SECONDS,
+                max_distance=settings.LLM_REVIEW_CACHE_MAX_DISTANCE,
+                persistent=settings.LLM_REVIEW_CACHE_PERSISTENT,
+            )
+        return _cache
+
+
+def review_cache_stats() -> dict:
+    """Hit/miss counters and an estimate of the Gemini time the cache saved."""
+    hits = metrics.get_counter('llm_review_cache.memory_hits') + metrics.get_counter('llm_review_cache.db_hits')
+    misses = metrics.get_counter('llm_review_cache.misses')
+    calls = metrics.get_counter('llm_review.calls')
+    mean_latency = metrics.get_counter('llm_review.latency_seconds') / calls if calls else None
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else None,
+        "mean_llm_latency_seconds": mean_latency,
+        "estimated_seconds_saved": hits * mean_latency if mean_latency is not None else None,
+        "llm_calls_saved": hits,
+    }
@@ -0,0 +1,342 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+import aiohttp
+import httpx
+from django.conf import settings
+from google.genai import errors as genai_errors
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower goes first: ranking links gates a whole job, a review only one screenshot
+LINK_RANKING = 0
+IMAGE_REVIEW = 1
+LANE_NAMES = {LINK_RANKING: 'link_ranking', IMAGE_REVIEW: 'image_review'}
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+# Rough prompt cost of one screenshot (Gemini bills 258 tokens per 768px tile) and of the answer;
+# the estimate is corrected with the real usage once the response is in
+IMAGE_TOKENS = 258 * 6
+RESPONSE_TOKENS = 512
+
+
+class LlmUnavailable(Exception):
+    """The circuit is open, or no request slot came up within LLM_QUEUE_TIMEOUT."""
+
+
+def estimate_tokens(contents) -> int:
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    total = RESPONSE_TOKENS
+    for part in parts:
+        total += len(part) // 4 if isinstance(part, str) else IMAGE_TOKENS
+    return total
+
+
+def classify_error(error) -> Optional[str]:
+    """'rate_limited' for 429s, 'failure' for retryable outages, None for errors a retry won't fix."""
+    if isinstance(error, genai_errors.APIError):
+        code = int(error.code) if error.code is not None else None
+        if code == 429:
+            return 'rate_limited'
+        return 'failure' if code in RETRYABLE_CODES else None
+    # httpx carries the SDK's sync calls, aiohttp its async ones
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, aiohttp.ClientConnectionError,
+                          httpx.TransportError)):
+        return 'failure'
+    return None
+
+
+def used_tokens(response) -> Optional[int]:
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'total_token_count', None) or None
+
+
+class TokenBucket:
+    """Refills `per_minute` tokens per minute and holds at most a minute's worth. Not thread-safe."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        # May go negative when a response used more than estimated; later requests pay it back
+        self.tokens -= amount
+
+
+class _Ticket:
+    def __init__(self, lane, tokens, loop=None):
+        self.lane = lane
+        self.tokens = tokens
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+        self.rejected = False  # turned away because the circuit opened
+        self.cancelled = False
+        self.probe = False
+        self.queued_at = time.monotonic()
+
+
+class LlmScheduler:
+    """Admits Gemini calls from every thread and event loop in the process.
+
+    Requests queue per lane and are let through when the RPM and TPM buckets allow it.
+    A 429 pauses admission for the backoff delay, retryable errors are retried with
+    jittered exponential backoff, and `failure_threshold` consecutive failures open a
+    circuit that admits a single probe request after `reset_seconds`. While the circuit
+    is open every other request fails at once with LlmUnavailable, queued ones included;
+    otherwise requests wait up to `queue_timeout`.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_retries=4, backoff_base=1.0,
+                 backoff_max=60.0, failure_threshold=5, reset_seconds=30.0, queue_timeout=300.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.queue_timeout = queue_timeout
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._queue = []  # heap of (lane, seq, ticket)
+        self._seq = itertools.count()
+        self._depth = {lane: 0 for lane in LANE_NAMES}
+        self._cond = threading.Condition()
+        self._paused_until = 0.0
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._thread = None
+
+    # -- admission --------------------------------------------------------
+
+    def _set_depth(self, lane, delta):
+        self._depth[lane] += delta
+        metrics.set_gauge(f'llm_scheduler.queue_depth.{LANE_NAMES[lane]}', self._depth[lane])
+
+    def _circuit_rejects(self, now) -> bool:
+        # Open and either still cooling down or already probing
+        return self._opened_at is not None and (now < self._opened_at + self.reset_seconds or self._probe_in_flight)
+
+    def _enqueue(self, ticket):
+        with self._cond:
+            if self._circuit_rejects(time.monotonic()):
+                metrics.increment('llm_scheduler.rejected')
+                raise LlmUnavailable("LLM circuit is open")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name='llm-scheduler', daemon=True)
+                self._thread.start()
+            heapq.heappush(self._queue, (ticket.lane, next(self._seq), ticket))
+            self._set_depth(ticket.lane, 1)
+            self._cond.notify()
+
+    def _admission_wait(self, ticket, now) -> float:
+        if self._paused_until > now:
+            return self._paused_until - now
+        return max(self._requests.wait_time(1, now), self._tokens.wait_time(ticket.tokens, now))
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                while self._queue and self._queue[0][2].cancelled:
+                    heapq.heappop(self._queue)
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                ticket = self._queue[0][2]
+                now = time.monotonic()
+                if self._circuit_rejects(now):
+                    heapq.heappop(self._queue)
+                    self._set_depth(ticket.lane, -1)
+                    ticket.rejected = True
+                    metrics.increment('llm_scheduler.rejected')
+                    self._wake(ticket)
+                    continue
+                wait = self._admission_wait(ticket, now)
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._queue)
+                self._set_depth(ticket.lane, -1)
+                self._requests.take(1)
+                self._tokens.take(ticket.tokens)
+                if self._opened_at is not None:
+                    ticket.probe = self._probe_in_flight = True
+                ticket.granted = True
+                metrics.increment('llm_scheduler.admitted')
+                metrics.increment('llm_scheduler.wait_seconds', now - ticket.queued_at)
+                if not self._wake(ticket):
+                    self._settle(ticket, None)
+
+    def _wake(self, ticket) -> bool:
+        """Tell the waiting caller its ticket was granted or rejected; False if its loop is gone."""
+        if ticket.loop is None:
+            ticket.event.set()
+            return True
+        try:
+            ticket.loop.call_soon_threadsafe(_resolve, ticket.future)
+            return True
+        except RuntimeError:
+            return False
+
+    def _withdraw(self, ticket) -> bool:
+        """Take a waiting ticket out of the queue; False if it was granted or rejected in the meantime."""
+        with self._cond:
+            if ticket.granted or ticket.rejected:
+                return False
+            ticket.cancelled = True
+            self._set_depth(ticket.lane, -1)
+            return True
+
+    async def acquire(self, lane: int, tokens: int) -> _Ticket:
+        ticket = _Ticket(lane, tokens, loop=asyncio.get_running_loop())
+        self._enqueue(ticket)
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if self._withdraw(ticket):
+                metrics.increment('llm_scheduler.queue_timeouts')
+                raise LlmUnavailable(f"No LLM request slot within {self.queue_timeout}s")
+        except asyncio.CancelledError:
+            if not self._withdraw(ticket) and ticket.granted:
+                self._settle(ticket, None)
+            raise
+        if ticket.rejected:
+            raise LlmUnavailable("LLM circuit is open")
+        return ticket
+
+    def acquire_sync(self, lane: int, tokens: int) -> _Ticket:
+        ticket = _Ticket(lane, tokens)
+        self._enqueue(ticket)
+        if not ticket.event.wait(self.queue_timeout) and self._withdraw(ticket):
+            metrics.increment('llm_scheduler.queue_timeouts')
+            raise LlmUnavailable(f"No LLM request slot within {self.queue_timeout}s")
+        if ticket.rejected:
+            raise LlmUnavailable("LLM circuit is open")
+        return ticket
+
+    # -- outcomes ---------------------------------------------------------
+
+    def backoff(self, attempt: int) -> float:
+        # Full jitter, so callers that failed together don't come back together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _settle(self, ticket, outcome: Optional[str], tokens_used: Optional[int] = None, pause: float = 0.0):
+        with self._cond:
+            if tokens_used is not None:
+                self._tokens.take(tokens_used - ticket.tokens)
+            if ticket.probe:
+                self._probe_in_flight = False
+            if outcome == 'ok':
+                self._failures = 0
+                if self._opened_at is not None:
+                    logger.info("LLM circuit closed")
+                    self._opened_at = None
+                    metrics.set_gauge('llm_scheduler.circuit_open', 0)
+            elif outcome == 'rate_limited':
+                metrics.increment('llm_scheduler.rate_limited')
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            elif outcome == 'failure':
+                self._failures += 1
+                metrics.increment('llm_scheduler.failures')
+                if ticket.probe or (self._opened_at is None and self._failures >= self.failure_threshold):
+                    logger.error(f"LLM circuit opened after {self._failures} consecutive failures")
+                    self._opened_at = time.monotonic()
+                    metrics.increment('llm_scheduler.circuit_opened')
+                    metrics.set_gauge('llm_scheduler.circuit_open', 1)
+            self._cond.notify()
+
+    def _after_error(self, ticket, error, attempt) -> Optional[float]:
+        """Settle a failed call; returns the delay before retrying, None if it shouldn't be retried."""
+        kind = classify_error(error)
+        if kind is None or attempt >= self.max_retries:
+            self._settle(ticket, kind)
+            return None
+        delay = self.backoff(attempt)
+        self._settle(ticket, kind, pause=delay)
+        metrics.increment('llm_scheduler.retries')
+        logger.info(f"Retrying LLM call in {delay:.1f}s after: {error}")
+        return delay
+
+    async def call(self, lane: int, make_call, tokens: int):
+        """Await `make_call()` (a coroutine factory) once admitted, retrying retryable errors."""
+        attempt = 0
+        while True:
+            ticket = await self.acquire(lane, tokens)
+            try:
+                response = await make_call()
+            except asyncio.CancelledError:
+                self._settle(ticket, None)
+                raise
+            except Exception as e:
+                delay = self._after_error(ticket, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._settle(ticket, 'ok', tokens_used=used_tokens(response))
+            return response
+
+    def call_sync(self, lane: int, make_call, tokens: int):
+        """Blocking variant of call() for sync callers."""
+        attempt = 0
+        while True:
+            ticket = self.acquire_sync(lane, tokens)
+            try:
+                response = make_call()
+            except Exception as e:
+                delay = self._after_error(ticket, e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._settle(ticket, 'ok', tokens_used=used_tokens(response))
+            return response
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LlmScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LlmScheduler(
+                requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+                tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+                max_retries=settings.LLM_MAX_RETRIES,
+                backoff_base=settings.LLM_BACKOFF_BASE_SECONDS,
+                backoff_max=settings.LLM_BACKOFF_MAX_SECONDS,
+                failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                reset_seconds=settings.LLM_CIRCUIT_RESET_SECONDS,
+                queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+            )
+        return _scheduler
@@ -4,6 +4,8 @@ from core.suss_file import generate_valid_links
 import logging
 from core.pydantic_model import URLModel
 from typing import Optional
+from core.jobs import report_progress
+from core.workspace import JobWorkspace
 
 # Configure logging
 logging.basicConfig(
@@ -13,21 +15,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def load_test_main(target_url: URLModel, load_test_source_path: Optional[str] = "reports/performance_tests"):
+async def load_test_main(target_url: URLModel, workspace: Optional[JobWorkspace] = None, raise_errors: bool = False):
+    """Break tests on the site's ranked links; errors are logged, or re-raised with `raise_errors`."""
     try:
         start_time = time.time()
+        workspace = workspace or JobWorkspace()
         tasks = []
         logger.info("Starting performance tests...")
-        target_urls = generate_valid_links(target_url.url)
+        report_progress('ranking links', 10)
+        target_urls = await asyncio.to_thread(generate_valid_links, target_url.url)
+        report_progress('running break tests', 30)
 
         from core.break_test import run_break_test
         tasks = [
-            run_break_test(urls=target_urls),
+            run_break_test(urls=target_urls, results_dir=workspace.subdir("break_check")),
         ]
         await asyncio.gather(*tasks)
         logger.info(f"Performance tests completed in {time.time() - start_time} seconds.")
     except Exception as e:
         logger.error(f"Error running performance tests: {e}")
+        if raise_errors:
+            raise
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,77 @@
+import random
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from django.core.management.base import BaseCommand
+from core.scrape.link_extractor import StreamingPage
+
+CHUNK_SIZE = 64 * 1024
+
+
+def build_fixture(target_bytes: int, seed: int = 0) -> bytes:
+    """A large, link-heavy page: nav, nested content blocks with inline scripts, footer."""
+    rng = random.Random(seed)
+    parts = [
+        '<!doctype html><html><head><meta charset="utf-8"><base href="/shop/">',
+        '<link rel="canonical" href="https://example.com/shop/"><link rel="sitemap" href="/sitemap.xml">',
+        '<style>.x{color:red}</style></head><body><header><nav>',
+        ''.join(f'<a href="/section-{n}">Section {n}</a>' for n in range(40)),
+        '</nav></header><main>',
+    ]
+    size = sum(map(len, parts))
+    n = 0
+    while size < target_bytes:
+        block = (
+            f'<div class="card" data-id="{n}"><div class="inner"><h3>Item {n}</h3>'
+            f'<p>Lorem ipsum dolor sit amet, {rng.random():.6f} consectetur &amp; adipiscing.</p>'
+            f'<a href="item/{n}?ref=list">View <img src="/i/{n}.png" alt="item {n}"></a>'
+            f'<a href="#reviews-{n}">Reviews</a><a href="mailto:sales+{n}@example.com">Mail</a>'
+            f'<script>window.__d{n} = {{"id": {n}, "tags": ["a", "b"]}};</script></div></div>'
+        )
+        parts.append(block)
+        size += len(block)
+        n += 1
+    parts.append('</main><footer><a href="/privacy">Privacy</a><a href="/terms">Terms</a></footer></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def soup_links(data: bytes):
+    # What the old BeautifulSoup scraper did: decode everything, build the tree, then query it
+    soup = BeautifulSoup(data.decode('utf-8'), 'html.parser')
+    return [a['href'] for a in soup.find_all('a', href=True)]
+
+
+def streaming_links(data: bytes):
+    page = StreamingPage('https://example.com/', 'utf-8', max_bytes=len(data))
+    for offset in range(0, len(data), CHUNK_SIZE):
+        page.feed(data[offset:offset + CHUNK_SIZE])
+    return page.close()
+
+
+class Command(BaseCommand):
+    help = "Compare BeautifulSoup link extraction with the streaming extractor on large HTML fixtures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=float, nargs='+', default=[0.5, 2, 8], help="Fixture sizes in MB")
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def _measure(self, fn, data, rounds):
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            result = fn(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        tracemalloc.start()
+        fn(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, best, peak
+
+    def handle(self, *args, **options):
+        for size_mb in options['sizes']:
+            data = build_fixture(int(size_mb * 1024 * 1024))
+            self.stdout.write(f"\nfixture {len(data) / 1e6:.1f} MB")
+            for name, fn in (('BeautifulSoup', soup_links), ('streaming', streaming_links)):
+                links, elapsed, peak = self._measure(fn, data, options['rounds'])
+                self.stdout.write(f"  {name:<14} {elapsed * 1000:9.1f} ms   peak {peak / 1e6:8.1f} MB   {len(links)} links")
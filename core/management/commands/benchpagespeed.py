@@ -0,0 +1,105 @@
+import base64
+import glob
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.lighthouse.lighthouse_metrics import extract_metrics
+from core.lighthouse.pagespeed_extract import extract_pagespeed
+
+
+def build_payload(target_bytes: int, seed: int = 0) -> bytes:
+    """A PageSpeed-like response: field data, ~150 audits with details, filmstrip and full-page screenshot."""
+    rng = random.Random(seed)
+
+    def blob(size):
+        return 'data:image/webp;base64,' + base64.b64encode(rng.randbytes(size * 3 // 4)).decode()
+
+    audits = {
+        "metrics": {"id": "metrics", "title": "Metrics", "description": "Collects all available metrics.", "score": None,
+                    "details": {"type": "debugdata", "items": [{
+                        "firstContentfulPaint": 1834, "largestContentfulPaint": 3912, "speedIndex": 4410,
+                        "totalBlockingTime": 288, "cumulativeLayoutShift": 0.04, "observedLoad": 2718,
+                    }, {"lcpInvalidated": False}]}},
+        "screenshot-thumbnails": {"id": "screenshot-thumbnails", "title": "Screenshot Thumbnails", "description": "Filmstrip",
+                                  "score": None, "details": {"type": "filmstrip", "items": [
+                                      {"timing": 375 * i, "data": blob(15000)} for i in range(10)]}},
+        "final-screenshot": {"id": "final-screenshot", "title": "Final Screenshot", "description": "The last screenshot",
+                             "score": None, "details": {"type": "screenshot", "data": blob(60000)}},
+    }
+    for n in range(150):
+        audits[f"audit-{n}"] = {
+            "id": f"audit-{n}", "title": f"Audit “{n}” title", "score": rng.choice([0, 0.5, 1, None]),
+            "description": f"Why audit {n} matters. [Learn more](https://developer.chrome.com/docs/{n}).",
+            "details": {"type": "table", "headings": [{"key": "url", "label": "URL"}], "items": [
+                {"url": f"https://example.com/static/{n}/{i}.js", "wastedMs": rng.random() * 900, "title": "nested, ignored"}
+                for i in range(rng.randint(5, 40))
+            ]},
+        }
+    payload = {
+        "captchaResult": "CAPTCHA_NOT_NEEDED", "kind": "pagespeedonline#result", "id": "https://example.com/",
+        "loadingExperience": {"id": "https://example.com/", "metrics": {
+            "CUMULATIVE_LAYOUT_SHIFT_SCORE": {"percentile": 4, "category": "FAST"},
+            "FIRST_CONTENTFUL_PAINT_MS": {"percentile": 1700, "category": "FAST"},
+            "LARGEST_CONTENTFUL_PAINT_MS": {"percentile": 2900, "category": "AVERAGE"},
+        }, "overall_category": "AVERAGE"},
+        "lighthouseResult": {"requestedUrl": "https://example.com/", "audits": audits,
+                             "fullPageScreenshot": {"screenshot": {"data": blob(0), "width": 412, "height": 9000}},
+                             "i18n": {"rendererFormattedStrings": {f"s{i}": f"string {i}" for i in range(300)}}},
+    }
+    base = len(json.dumps(payload))
+    payload["lighthouseResult"]["fullPageScreenshot"]["screenshot"]["data"] = blob(max(0, target_bytes - base))
+    return json.dumps(payload).encode('utf-8')
+
+
+def full_metrics(data: bytes):
+    # What fetch() did before: decode the whole response, then walk it
+    return extract_metrics(json.loads(data))
+
+
+def streaming_metrics(data: bytes):
+    return extract_metrics(extract_pagespeed(data))
+
+
+class Command(BaseCommand):
+    help = "Compare full json.loads with the streaming PageSpeed extractor on recorded or synthetic payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixtures', default=os.path.join(settings.BASE_DIR, 'pagespeed_fixtures'),
+                            help="Directory of recorded payloads (see the pagespeedstub command)")
+        parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4],
+                            help="Synthetic payload sizes in MB, used when there are no recordings")
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def _measure(self, fn, data, rounds):
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            result = fn(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        tracemalloc.start()
+        fn(data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, best, peak
+
+    def handle(self, *args, **options):
+        fixtures = sorted(glob.glob(os.path.join(options['fixtures'], '*.json')))
+        if fixtures:
+            payloads = [(os.path.basename(path), open(path, 'rb').read()) for path in fixtures]
+        else:
+            payloads = [("synthetic", build_payload(int(size * 1024 * 1024))) for size in options['sizes']]
+        for name, data in payloads:
+            self.stdout.write(f"\n{name}: {len(data) / 1e6:.1f} MB")
+            results = {}
+            for label, fn in (('json.loads', full_metrics), ('streaming', streaming_metrics)):
+                results[label], elapsed, peak = self._measure(fn, data, options['rounds'])
+                self.stdout.write(f"  {label:<11} {elapsed * 1000:9.1f} ms   peak {peak / 1e6:8.1f} MB")
+            if results['json.loads'] != results['streaming']:
+                self.stderr.write("  metrics differ between the two paths")
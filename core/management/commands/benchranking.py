@@ -0,0 +1,51 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.llm.scheduler import estimate_tokens, RESPONSE_TOKENS
+from core.scrape.prerank import prerank
+from core.scrape.scrape_website_links import crawl_website
+from core.suss_file import link_ranking_prompt, rank_links
+from core.utils import normalize_url
+
+
+def overlap(a, b):
+    a, b = {normalize_url(u) for u in a}, {normalize_url(u) for u in b}
+    return len(a & b) / max(len(b), 1)
+
+
+class Command(BaseCommand):
+    help = "Compare link ranking modes on real sites: prompt size, latency and agreement with the full LLM ranking"
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--candidates', type=int, default=settings.LINK_RANKING_CANDIDATES)
+        parser.add_argument('--no-llm', action='store_true', help="Only crawl and pre-rank, don't call Gemini")
+
+    def _timed(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        for url in options['urls']:
+            crawl, crawl_seconds = self._timed(crawl_website, url)
+            links = [status.url for status in crawl.links if status.is_alive]
+            self.stdout.write(f"\n{url}: {len(links)} live links, crawl {crawl_seconds:.1f}s")
+            if not links:
+                continue
+            candidates, prerank_seconds = self._timed(prerank, links, crawl.link_info, url, options['candidates'])
+            heuristic = prerank(links, crawl.link_info, url, 4)
+            self.stdout.write(f"  pre-rank {prerank_seconds * 1000:.1f} ms, heuristic top 4: {heuristic}")
+            for name, sent in (('llm', links), ('hybrid', candidates)):
+                prompt = link_ranking_prompt(sent)
+                self.stdout.write(f"  {name:<7} prompt {len(sent):4d} links  {len(prompt):7d} chars  ~{estimate_tokens(prompt) - RESPONSE_TOKENS:6d} prompt tokens")
+            if options['no_llm']:
+                continue
+            full, full_seconds = self._timed(rank_links, url, links)
+            hybrid, hybrid_seconds = self._timed(rank_links, url, candidates)
+            if full is None or hybrid is None:
+                self.stdout.write("  LLM ranking failed, no agreement numbers")
+                continue
+            self.stdout.write(f"  llm     {full_seconds:6.2f}s  {full}")
+            self.stdout.write(f"  hybrid  {hybrid_seconds:6.2f}s  {hybrid}  agreement with llm {overlap(hybrid, full):.0%}")
+            self.stdout.write(f"  heuristic agreement with llm {overlap(heuristic, full):.0%}")
@@ -0,0 +1,96 @@
+import asyncio
+import io
+import time
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw
+from core.automation.captured_image import CapturedImage
+from core.llm.config import get_api_client, parse_batch_review, run_async
+
+DEVICES = {
+    'normal_phone': (375, 667),
+    'tablet': (768, 1024),
+    'desktop': (1920, 1080),
+}
+
+
+def synthetic_screenshot(width, height, seed):
+    """A page-like PNG with a header, some text blocks and a deliberate typo to find."""
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, 60), fill=(30, 60, 120))
+    draw.text((16, 20), f"Acme store #{seed}", fill='white')
+    for row in range(8):
+        top = 90 + row * 70
+        draw.rectangle((16, top, width - 16, top + 50), outline=(200, 200, 200))
+        draw.text((24, top + 16), "Add to crat" if row == 3 else f"Product {row} - free shipping", fill='black')
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Compare one LLM review request per screenshot with batched multi-image requests (calls the real Gemini API)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--urls', type=int, default=3, help="Synthetic pages, each captured at every device size")
+        parser.add_argument('--images', nargs='*', default=[], help="Review these image files instead of synthetic pages")
+        parser.add_argument('--batch-size', type=int, default=3)
+        parser.add_argument('--rounds', type=int, default=1)
+
+    def _load(self, options):
+        if options['images']:
+            items = []
+            for path in options['images']:
+                with open(path, 'rb') as f:
+                    items.append((path, CapturedImage(f.read(), 'png')))
+            return items
+        return [
+            (f"{device} view of page {n}", CapturedImage(synthetic_screenshot(width, height, n), 'png'))
+            for n in range(options['urls']) for device, (width, height) in DEVICES.items()
+        ]
+
+    async def _per_image(self, items):
+        client = get_api_client()
+        responses = await asyncio.gather(*(client.generate_content_for_image(image) for _, image in items))
+        return len(items), responses
+
+    async def _batched(self, items, batch_size):
+        client = get_api_client()
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        responses = await asyncio.gather(*(
+            client.generate_content_for_images([image for _, image in batch], labels=[label for label, _ in batch])
+            for batch in batches
+        ))
+        failed = 0
+        for batch, response in zip(batches, responses):
+            try:
+                parse_batch_review(response.text, len(batch))
+            except Exception:
+                failed += 1
+        if failed:
+            self.stdout.write(f"  {failed} of {len(batches)} batches would fall back to per-image requests")
+        return len(batches), responses
+
+    def _tokens(self, responses):
+        return sum(r.usage_metadata.total_token_count for r in responses if r is not None and r.usage_metadata)
+
+    def handle(self, *args, **options):
+        try:
+            get_api_client()
+        except ValueError as e:
+            raise CommandError(str(e))
+        items = self._load(options)
+        cases = {
+            'one request per image': lambda: self._per_image(items),
+            f"batches of {options['batch_size']}": lambda: self._batched(items, options['batch_size']),
+        }
+        self.stdout.write(f"{len(items)} screenshots")
+        for name, case in cases.items():
+            for _ in range(options['rounds']):
+                start = time.perf_counter()
+                requests, responses = run_async(case())
+                elapsed = time.perf_counter() - start
+                errors = sum(1 for r in responses if r is None)
+                self.stdout.write(
+                    f"{name:<24} {elapsed:7.2f} s   requests {requests:4d}   errors {errors:3d}   tokens {self._tokens(responses):8d}"
+                )
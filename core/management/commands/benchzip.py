@@ -0,0 +1,74 @@
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from django.core.management.base import BaseCommand
+from core.utils import zip_file, stream_zip
+
+
+class Command(BaseCommand):
+    help = "Compare the on-disk zip_file() archive with the streaming stream_zip() path on a synthetic screenshot set"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--screenshots', type=int, default=300, help="Number of PNG screenshots")
+        parser.add_argument('--screenshot-size', type=int, default=400_000, help="Bytes per screenshot")
+        parser.add_argument('--json-files', type=int, default=30, help="Number of JSON reports")
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def _build_fixture(self, root, options):
+        reports_dir = os.path.join(root, 'reports')
+        screenshots_dir = os.path.join(reports_dir, 'capture_screenshots')
+        os.makedirs(screenshots_dir)
+        for n in range(options['screenshots']):
+            # PNG payloads are already deflated, random bytes model that well
+            with open(os.path.join(screenshots_dir, f"desktop_{n}.png"), 'wb') as f:
+                f.write(b'\x89PNG\r\n\x1a\n' + os.urandom(options['screenshot_size']))
+        for n in range(options['json_files']):
+            with open(os.path.join(reports_dir, f"metrics_{n}.json"), 'w') as f:
+                json.dump([{"file_path": f"desktop_{n}_{i}.png", "response": ["Button text overlaps"] * 20} for i in range(200)], f, indent=4)
+        return reports_dir
+
+    def _bench_zip_file(self, reports_dir, root):
+        output_zip = os.path.join(root, 'reports.zip')
+        start = time.perf_counter()
+        zip_file(main_dir=reports_dir, output_zip=output_zip)
+        # First byte can only be sent once the whole archive exists
+        with open(output_zip, 'rb') as f:
+            f.read(64 * 1024)
+            first_byte = time.perf_counter() - start
+            while f.read(64 * 1024):
+                pass
+        total = time.perf_counter() - start
+        size = os.path.getsize(output_zip)
+        os.remove(output_zip)
+        return first_byte, total, size
+
+    def _bench_stream_zip(self, reports_dir, parallel_deflate):
+        start = time.perf_counter()
+        first_byte = None
+        archive = io.BytesIO()
+        for chunk in stream_zip(main_dir=reports_dir, parallel_deflate=parallel_deflate):
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            archive.write(chunk)
+        total = time.perf_counter() - start
+        if zipfile.ZipFile(archive).testzip() is not None:
+            raise RuntimeError("stream_zip produced a corrupt archive")
+        return first_byte, total, archive.tell()
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as root:
+            reports_dir = self._build_fixture(root, options)
+            cases = {
+                'zip_file (deflate to disk)': lambda: self._bench_zip_file(reports_dir, root),
+                'stream_zip': lambda: self._bench_stream_zip(reports_dir, parallel_deflate=False),
+                'stream_zip (parallel JSON deflate)': lambda: self._bench_stream_zip(reports_dir, parallel_deflate=True),
+            }
+            self.stdout.write(f"{options['screenshots']} screenshots x {options['screenshot_size']} bytes, {options['json_files']} JSON files")
+            for name, case in cases.items():
+                runs = [case() for _ in range(options['rounds'])]
+                first_byte = min(run[0] for run in runs)
+                total = min(run[1] for run in runs)
+                self.stdout.write(f"{name:<38} first byte {first_byte * 1000:8.1f} ms   total {total * 1000:8.1f} ms   size {runs[0][2] / 1e6:8.1f} MB")
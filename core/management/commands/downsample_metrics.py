@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.metric_history import downsample
+
+
+class Command(BaseCommand):
+    help = "Fold old performance metric samples into daily means and drop those past retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-days', type=float, default=settings.METRIC_HISTORY_RAW_DAYS,
+                            help="Keep raw samples this many days")
+        parser.add_argument('--retention-days', type=float, default=settings.METRIC_HISTORY_RETENTION_DAYS,
+                            help="Drop samples and daily means older than this")
+
+    def handle(self, *args, **options):
+        result = downsample(raw_days=options['raw_days'], retention_days=options['retention_days'])
+        self.stdout.write(
+            f"Folded {result['folded']} samples into {result['daily_rows']} daily means, "
+            f"dropped {result['expired']} expired rows"
+        )
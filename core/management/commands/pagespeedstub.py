@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import random
+from datetime import datetime, timezone
+
+import aiohttp
+from aiohttp import web
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.utils import url_artifact_name
+
+GOOGLE_PAGESPEED_URL = 'https://www.googleapis.com/pagespeedonline/v5/runPagespeed'
+
+
+def fixture_name(url: str, strategy: str) -> str:
+    return url_artifact_name(url, prefix=strategy, extension='json')
+
+
+def synthetic_payload(url: str, strategy: str) -> dict:
+    """Smallest payload with every field PerformanceMetrics reads, for URLs nobody recorded."""
+    rng = random.Random(f"{strategy}:{url}")
+    fcp, lcp = rng.randint(800, 2500), rng.randint(1500, 4500)
+    return {
+        "id": url,
+        "analysisUTCTimestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+        "loadingExperience": {"metrics": {
+            "CUMULATIVE_LAYOUT_SHIFT_SCORE": {"percentile": rng.randint(0, 30), "category": "FAST"},
+            "FIRST_CONTENTFUL_PAINT_MS": {"percentile": fcp, "category": "AVERAGE"},
+            "LARGEST_CONTENTFUL_PAINT_MS": {"percentile": lcp, "category": "AVERAGE"},
+        }},
+        "lighthouseResult": {
+            "requestedUrl": url,
+            "configSettings": {"emulatedFormFactor": strategy},
+            "audits": {
+                "metrics": {"id": "metrics", "title": "Metrics", "description": "", "score": None, "details": {"items": [{
+                    "firstContentfulPaint": fcp,
+                    "largestContentfulPaint": lcp,
+                    "speedIndex": rng.randint(1000, 5000),
+                    "totalBlockingTime": rng.randint(0, 600),
+                }]}},
+                "render-blocking-resources": {
+                    "id": "render-blocking-resources", "title": "Eliminate render-blocking resources",
+                    "description": "Resources are blocking the first paint of your page.", "score": 0.5,
+                },
+            },
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve recorded PageSpeed payloads on a local port; set PAGESPEED_API_URL to "
+        "http://127.0.0.1:<port>/pagespeedonline/v5/runPagespeed to use it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8088)
+        parser.add_argument('--fixtures', default=os.path.join(settings.BASE_DIR, 'pagespeed_fixtures'),
+                            help="Directory of <strategy>_<url name>.json payloads (default.json answers the rest)")
+        parser.add_argument('--record', action='store_true',
+                            help="Fetch missing payloads from Google and save them as fixtures")
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before each answer")
+        parser.add_argument('--fail-rate', type=float, default=0.0, help="Share of requests answered with a 503")
+
+    def build_app(self, options) -> web.Application:
+        """The stub as an aiohttp app; tests run it on a port of their own."""
+        os.makedirs(options['fixtures'], exist_ok=True)
+        app = web.Application()
+        app['options'] = options
+        app.router.add_get('/pagespeedonline/v5/runPagespeed', self.run_pagespeed)
+        return app
+
+    def handle(self, *args, **options):
+        app = self.build_app(options)
+        self.stdout.write(f"Serving PageSpeed fixtures from {options['fixtures']} on http://{options['host']}:{options['port']}")
+        web.run_app(app, host=options['host'], port=options['port'], print=None)
+
+    async def run_pagespeed(self, request):
+        options = request.app['options']
+        url, strategy = request.query.get('url'), request.query.get('strategy', 'desktop').lower()
+        if not url:
+            return web.json_response({"error": {"code": 400, "message": "Missing url"}}, status=400)
+        if options['latency']:
+            await asyncio.sleep(options['latency'])
+        if random.random() < options['fail_rate']:
+            return web.json_response({"error": {"code": 503, "message": "Stub failure"}}, status=503)
+
+        path = os.path.join(options['fixtures'], fixture_name(url, strategy))
+        if not os.path.exists(path) and options['record']:
+            payload = await self.record(request, path)
+            if payload is not None:
+                return web.json_response(payload)
+        if not os.path.exists(path):
+            path = os.path.join(options['fixtures'], 'default.json')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return web.Response(body=f.read(), content_type='application/json')
+        return web.json_response(synthetic_payload(url, strategy))
+
+    async def record(self, request, path):
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=settings.PAGESPEED_TIMEOUT)) as session:
+                async with session.get(GOOGLE_PAGESPEED_URL, params=request.query) as response:
+                    if response.status != 200:
+                        self.stderr.write(f"Not recording {request.query.get('url')}: HTTP {response.status}")
+                        return None
+                    payload = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stderr.write(f"Not recording {request.query.get('url')}: {e}")
+            return None
+        with open(path, 'w') as f:
+            json.dump(payload, f)
+        self.stdout.write(f"Recorded {path}")
+        return payload
@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from core.jobs import JobWorkerPool
+
+
+class Command(BaseCommand):
+    help = "Run a pool of background analysis job workers against the shared job table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Number of worker threads (default: JOB_WORKER_COUNT)")
+
+    def handle(self, *args, **options):
+        pool = JobWorkerPool(size=options['workers'])
+        pool.start()
+        self.stdout.write(self.style.SUCCESS(f"Running {pool.size} job workers, press CTRL+C to stop"))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping job workers...")
+            pool.stop()
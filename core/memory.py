@@ -0,0 +1,70 @@
+import contextvars
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_current_tracker = contextvars.ContextVar('memory_tracker', default=None)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far, None where getrusage is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryTracker:
+    """Accounts the image buffers one job holds, plus the process peak RSS while it runs.
+
+    Buffer bytes are attributed to the job exactly; RSS is process-wide, so with several
+    jobs in one worker process it is an upper bound.
+    """
+
+    def __init__(self):
+        self.current_bytes = 0
+        self.peak_bytes = 0
+        self.buffers = 0
+        self._lock = threading.Lock()
+        self._start_rss = peak_rss_bytes()
+
+    def add(self, nbytes: int):
+        with self._lock:
+            self.current_bytes += nbytes
+            self.buffers += 1
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+
+    def discard(self, nbytes: int):
+        with self._lock:
+            self.current_bytes -= nbytes
+
+    def report(self) -> dict:
+        end_rss = peak_rss_bytes()
+        return {
+            "peak_image_buffer_bytes": self.peak_bytes,
+            "image_buffers": self.buffers,
+            "process_peak_rss_bytes": end_rss,
+            "process_peak_rss_growth_bytes": end_rss - self._start_rss if end_rss is not None else None,
+        }
+
+
+def current_memory_tracker() -> Optional[MemoryTracker]:
+    return _current_tracker.get()
+
+
+@contextmanager
+def track_memory():
+    """Install a MemoryTracker for everything run in this context (asyncio tasks inherit it)."""
+    tracker = MemoryTracker()
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
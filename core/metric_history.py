@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Max, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from core.lighthouse.pagespeed import STRATEGIES
+from core.models import PerformanceMetricSample
+from core.utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 24 * 60 * 60
+
+# metrics_results section -> {report key: (metric name, scale)}; field data comes as {"percentile": ...}
+# and PageSpeed reports CLS percentiles x100
+METRIC_NAMES = {
+    "loading_metrics": {
+        "First Contentful Paint (ms)": ("field_fcp", 1),
+        "Largest Contentful Paint (ms)": ("field_lcp", 1),
+        "Cumulative Layout Shift Score": ("field_cls", 0.01),
+    },
+    "lighthouse_metrics": {
+        "Lighthouse First Contentful Paint (ms)": ("fcp", 1),
+        "Lighthouse Largest Contentful Paint (ms)": ("lcp", 1),
+        "Lighthouse Speed Index": ("speed_index", 1),
+        "Lighthouse Total Blocking Time (ms)": ("tbt", 1),
+    },
+}
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()[:16]
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """PageSpeed's analysisUTCTimestamp ("2024-05-01T10:20:30.123Z"), None if missing or malformed."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def samples_from_metrics(url: str, strategy: str, metrics_results: dict, source: str, measured_at: datetime):
+    key = url_key(url)
+    samples = []
+    for section, names in METRIC_NAMES.items():
+        for label, value in (metrics_results.get(section) or {}).items():
+            if label not in names:
+                continue
+            metric, scale = names[label]
+            if isinstance(value, dict):
+                value = value.get("percentile")
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            samples.append(PerformanceMetricSample(
+                url_key=key, strategy=strategy, metric=metric, value=value * scale,
+                source=source, measured_at=measured_at,
+            ))
+    return samples
+
+
+def record_report(report: dict, source: str, measured_at: Optional[dict] = None) -> int:
+    """Store every metric of a performance report ({url: {strategy: metrics_results}}); blocking.
+
+    `measured_at` maps (url, strategy) to when the run happened; runs without one are
+    stamped now. A run that is already stored (a cached PageSpeed result) is skipped.
+    """
+    now = timezone.now()
+    measured_at = measured_at or {}
+    samples = []
+    for url, by_strategy in report.items():
+        for strategy, metrics_results in by_strategy.items():
+            if metrics_results:
+                samples += samples_from_metrics(url, strategy, metrics_results, source, measured_at.get((url, strategy)) or now)
+    PerformanceMetricSample.objects.bulk_create(samples, batch_size=500, ignore_conflicts=True)
+    return len(samples)
+
+
+# Queries default to the source this deployment measures with; PageSpeed and local runs aren't mixed
+def run_times(key: str, strategy: str, limit: int = 2, source: Optional[str] = None):
+    """The latest `limit` raw run timestamps of a URL, strategy and source, newest first."""
+    return list(
+        PerformanceMetricSample.objects.filter(
+            url_key=key, strategy=strategy, source=source or settings.PERFORMANCE_METRICS_SOURCE, bucket_seconds=0,
+        ).order_by('-measured_at').values_list('measured_at', flat=True).distinct()[:limit]
+    )
+
+
+def run_values(key: str, strategy: str, measured_at, source: Optional[str] = None) -> dict:
+    """{metric: value} of one run."""
+    return dict(
+        PerformanceMetricSample.objects.filter(
+            url_key=key, strategy=strategy, source=source or settings.PERFORMANCE_METRICS_SOURCE,
+            measured_at=measured_at, bucket_seconds=0,
+        ).values_list('metric', 'value')
+    )
+
+
+def latest(url: str, strategy: Optional[str] = None, source: Optional[str] = None) -> dict:
+    """{strategy: {"measured_at", "metrics"}} of the newest run per strategy."""
+    key = url_key(url)
+    runs = {}
+    for run_strategy in ([strategy] if strategy else STRATEGIES):
+        times = run_times(key, run_strategy, 1, source)
+        if times:
+            runs[run_strategy] = {"measured_at": times[0], "metrics": run_values(key, run_strategy, times[0], source)}
+    return runs
+
+
+def delta(url: str, strategy: Optional[str] = None, source: Optional[str] = None) -> dict:
+    """Newest run against the one before it, per strategy and metric."""
+    key = url_key(url)
+    runs = {}
+    for run_strategy in ([strategy] if strategy else STRATEGIES):
+        times = run_times(key, run_strategy, 2, source)
+        if len(times) < 2:
+            continue
+        current = run_values(key, run_strategy, times[0], source)
+        previous = run_values(key, run_strategy, times[1], source)
+        runs[run_strategy] = {
+            "latest_at": times[0],
+            "previous_at": times[1],
+            "metrics": {
+                metric: {
+                    "latest": value,
+                    "previous": previous.get(metric),
+                    "delta": value - previous[metric] if metric in previous else None,
+                }
+                for metric, value in current.items()
+            },
+        }
+    return runs
+
+
+def percentile_75(url: str, metric: str, strategy: str, window_days: float, source: Optional[str] = None) -> Optional[dict]:
+    """Nearest-rank p75 of a metric over the last `window_days`.
+
+    Reads only the window's slice of the (url, strategy, metric, source, time) index: one
+    count, then one row at the p75 offset. Daily means past the raw window count as one sample each.
+    """
+    window = PerformanceMetricSample.objects.filter(
+        url_key=url_key(url), strategy=strategy, metric=metric, source=source or settings.PERFORMANCE_METRICS_SOURCE,
+        measured_at__gte=timezone.now() - timedelta(days=window_days),
+    )
+    count = window.count()
+    if not count:
+        return None
+    rank = math.ceil(0.75 * count) - 1
+    value = window.order_by('value').values_list('value', flat=True)[rank]
+    return {"p75": value, "samples": count}
+
+
+def downsample(raw_days: Optional[float] = None, retention_days: Optional[float] = None) -> dict:
+    """Fold raw samples older than `raw_days` into daily means and drop rows older than `retention_days`."""
+    raw_days = settings.METRIC_HISTORY_RAW_DAYS if raw_days is None else raw_days
+    retention_days = settings.METRIC_HISTORY_RETENTION_DAYS if retention_days is None else retention_days
+    now = timezone.now()
+    # Whole days only, so a day is never split between raw rows and its mean
+    cutoff = (now - timedelta(days=raw_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    expired, _ = PerformanceMetricSample.objects.filter(measured_at__lt=now - timedelta(days=retention_days)).delete()
+    old = PerformanceMetricSample.objects.filter(bucket_seconds=0, measured_at__lt=cutoff)
+    with transaction.atomic():
+        # Only rows seen here are folded and deleted; a replayed old run recorded meanwhile waits for the next pass
+        last_id = old.aggregate(last=Max('id'))['last']
+        if last_id is None:
+            return {"folded": 0, "daily_rows": 0, "expired": expired}
+        old = old.filter(id__lte=last_id)
+        groups = list(
+            old.annotate(day=TruncDay('measured_at'))
+            .values('url_key', 'strategy', 'metric', 'source', 'day')
+            .annotate(mean=Avg('value'), weight=Sum('samples'))
+        )
+        # A day folded before (a late replay, a shorter raw window) already has a mean: merge into it
+        existing = {
+            (row.url_key, row.strategy, row.metric, row.source, row.measured_at): row
+            for row in PerformanceMetricSample.objects.filter(
+                bucket_seconds=DAY_SECONDS,
+                measured_at__gte=min(group['day'] for group in groups),
+                measured_at__lte=max(group['day'] for group in groups),
+            )
+        }
+        daily = []
+        for group in groups:
+            value, weight = group['mean'], group['weight']
+            previous = existing.get((group['url_key'], group['strategy'], group['metric'], group['source'], group['day']))
+            if previous is not None:
+                value = (value * weight + previous.value * previous.samples) / (weight + previous.samples)
+                weight += previous.samples
+            daily.append(PerformanceMetricSample(
+                url_key=group['url_key'], strategy=group['strategy'], metric=group['metric'],
+                source=group['source'], value=value, measured_at=group['day'],
+                bucket_seconds=DAY_SECONDS, samples=weight,
+            ))
+        PerformanceMetricSample.objects.bulk_create(
+            daily, batch_size=500, update_conflicts=True,
+            unique_fields=['url_key', 'strategy', 'metric', 'source', 'measured_at', 'bucket_seconds'],
+            update_fields=['value', 'samples'],
+        )
+        folded, _ = old.delete()
+    if folded or expired:
+        logger.info(f"Metric history: folded {folded} samples into {len(daily)} daily means, dropped {expired}")
+    return {"folded": folded, "daily_rows": len(daily), "expired": expired}
@@ -0,0 +1,27 @@
+import threading
+from collections import defaultdict
+
+# Process-wide counters and gauges, exposed by the stats/ endpoint
+_counters = defaultdict(float)
+_gauges = {}
+_lock = threading.Lock()
+
+
+def increment(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+def get_counter(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
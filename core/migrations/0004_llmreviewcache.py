@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_analysisjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LlmReviewCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('review_key', models.CharField(max_length=64)),
+                ('phash', models.CharField(max_length=16)),
+                ('band0', models.IntegerField()),
+                ('band1', models.IntegerField()),
+                ('band2', models.IntegerField()),
+                ('band3', models.IntegerField()),
+                ('response', models.JSONField(default=list)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'llm_review_cache',
+                'indexes': [models.Index(fields=['review_key', 'band0'], name='llm_review_band0_idx'), models.Index(fields=['review_key', 'band1'], name='llm_review_band1_idx'), models.Index(fields=['review_key', 'band2'], name='llm_review_band2_idx'), models.Index(fields=['review_key', 'band3'], name='llm_review_band3_idx'), models.Index(fields=['created_at'], name='llm_review_created_idx')],
+            },
+        ),
+    ]
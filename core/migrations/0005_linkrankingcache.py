@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_llmreviewcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkRankingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_key', models.CharField(max_length=64)),
+                ('target_url', models.TextField()),
+                ('link_set_hash', models.CharField(max_length=64)),
+                ('ranked_links', models.JSONField(default=list)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('ranked_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'link_ranking_cache',
+                'indexes': [models.Index(fields=['ranked_at'], name='link_ranking_ranked_idx')],
+                'constraints': [models.UniqueConstraint(fields=('target_key', 'link_set_hash'), name='link_ranking_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_linkrankingcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkHealthCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_key', models.CharField(max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('status_code', models.IntegerField()),
+                ('etag', models.CharField(blank=True, default='', max_length=255)),
+                ('last_modified', models.CharField(blank=True, default='', max_length=64)),
+                ('response_time', models.FloatField()),
+                ('checked_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'link_health_cache',
+                'indexes': [models.Index(fields=['checked_at'], name='link_health_checked_idx')],
+            },
+        ),
+    ]
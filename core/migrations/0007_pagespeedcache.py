@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_linkhealthcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageSpeedCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('strategy', models.CharField(max_length=16)),
+                ('categories', models.CharField(max_length=255)),
+                ('payload', models.TextField()),
+                ('size_bytes', models.PositiveIntegerField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField()),
+                ('last_used_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'pagespeed_cache',
+                'indexes': [models.Index(fields=['fetched_at'], name='pagespeed_fetched_idx'), models.Index(fields=['last_used_at'], name='pagespeed_last_used_idx')],
+            },
+        ),
+    ]
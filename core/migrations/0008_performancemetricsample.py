@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_pagespeedcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformanceMetricSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_key', models.CharField(max_length=16)),
+                ('strategy', models.CharField(max_length=8)),
+                ('metric', models.CharField(max_length=16)),
+                ('value', models.FloatField()),
+                ('source', models.CharField(max_length=10)),
+                ('measured_at', models.DateTimeField()),
+                ('bucket_seconds', models.PositiveIntegerField(default=0)),
+                ('samples', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'db_table': 'performance_metric_sample',
+                'indexes': [models.Index(fields=['url_key', 'strategy', 'measured_at'], name='metric_sample_runs_idx'), models.Index(fields=['bucket_seconds', 'measured_at'], name='metric_sample_age_idx')],
+                'constraints': [models.UniqueConstraint(fields=('url_key', 'strategy', 'metric', 'measured_at', 'bucket_seconds'), name='metric_sample_unique')],
+            },
+        ),
+    ]
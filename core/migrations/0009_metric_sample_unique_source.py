@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_performancemetricsample'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='performancemetricsample',
+            name='metric_sample_unique',
+        ),
+        migrations.AddConstraint(
+            model_name='performancemetricsample',
+            constraint=models.UniqueConstraint(fields=('url_key', 'strategy', 'metric', 'measured_at', 'bucket_seconds', 'source'), name='metric_sample_unique'),
+        ),
+    ]
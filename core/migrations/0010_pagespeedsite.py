@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_metric_sample_unique_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageSpeedSite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('urls', models.TextField()),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'pagespeed_site',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_pagespeedsite'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='performancemetricsample',
+            name='metric_sample_unique',
+        ),
+        migrations.RemoveIndex(
+            model_name='performancemetricsample',
+            name='metric_sample_runs_idx',
+        ),
+        migrations.AddIndex(
+            model_name='performancemetricsample',
+            index=models.Index(fields=['url_key', 'strategy', 'source', 'measured_at'], name='metric_sample_runs_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='performancemetricsample',
+            constraint=models.UniqueConstraint(fields=('url_key', 'strategy', 'metric', 'source', 'measured_at', 'bucket_seconds'), name='metric_sample_unique'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from authapp.models import User
 
@@ -22,6 +23,111 @@ class ExtraURLTable(models.Model):
     class Meta:
         db_table = 'extra_url_table'
 
+class LinkRankingCache(models.Model):
+    """LLM ranking of a site's links, keyed by the normalized site URL and a hash of the link set."""
+    target_key = models.CharField(max_length=64)  # sha256 of the normalized URL, index-friendly
+    target_url = models.TextField()
+    link_set_hash = models.CharField(max_length=64)
+    ranked_links = models.JSONField(default=list)
+    hits = models.PositiveIntegerField(default=0)
+    ranked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"<LinkRankingCache(target_url={self.target_url}, ranked_at={self.ranked_at})>"
+
+    class Meta:
+        db_table = 'link_ranking_cache'
+        constraints = [
+            models.UniqueConstraint(fields=['target_key', 'link_set_hash'], name='link_ranking_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['ranked_at'], name='link_ranking_ranked_idx'),
+        ]
+
+class LinkHealthCache(models.Model):
+    """Last health check of a link, with the validators needed to re-check it conditionally."""
+    url_key = models.CharField(max_length=64, unique=True)  # sha256 of the canonical URL
+    url = models.TextField()
+    status_code = models.IntegerField()
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
+    response_time = models.FloatField()
+    checked_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"<LinkHealthCache(url={self.url}, status_code={self.status_code}, checked_at={self.checked_at})>"
+
+    class Meta:
+        db_table = 'link_health_cache'
+        indexes = [
+            models.Index(fields=['checked_at'], name='link_health_checked_idx'),
+        ]
+
+class PageSpeedCache(models.Model):
+    """Raw PageSpeed payload for a normalized URL, strategy and set of categories."""
+    cache_key = models.CharField(max_length=64, unique=True)  # sha256 of url, strategy and categories
+    url = models.TextField()
+    strategy = models.CharField(max_length=16)
+    categories = models.CharField(max_length=255)
+    payload = models.TextField()
+    size_bytes = models.PositiveIntegerField()
+    hits = models.PositiveIntegerField(default=0)
+    fetched_at = models.DateTimeField()
+    last_used_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"<PageSpeedCache(url={self.url}, strategy={self.strategy}, fetched_at={self.fetched_at})>"
+
+    class Meta:
+        db_table = 'pagespeed_cache'
+        indexes = [
+            models.Index(fields=['fetched_at'], name='pagespeed_fetched_idx'),
+            models.Index(fields=['last_used_at'], name='pagespeed_last_used_idx'),
+        ]
+
+class PageSpeedSite(models.Model):
+    """URLs a Lighthouse report covered for a normalized target URL, so a cached report skips the crawl."""
+    cache_key = models.CharField(max_length=64, unique=True)  # sha256 of the normalized URL
+    url = models.TextField()
+    urls = models.TextField()  # JSON list
+    fetched_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"<PageSpeedSite(url={self.url}, fetched_at={self.fetched_at})>"
+
+    class Meta:
+        db_table = 'pagespeed_site'
+
+class PerformanceMetricSample(models.Model):
+    """One metric of one performance run; rows older than the raw window are folded into daily means."""
+    url_key = models.CharField(max_length=16)  # truncated sha256 of the normalized URL
+    strategy = models.CharField(max_length=8)
+    metric = models.CharField(max_length=16)
+    value = models.FloatField()
+    source = models.CharField(max_length=10)
+    measured_at = models.DateTimeField()
+    bucket_seconds = models.PositiveIntegerField(default=0)  # 0 for a raw sample, 86400 for a daily mean
+    samples = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"<PerformanceMetricSample(url_key={self.url_key}, {self.strategy} {self.metric}={self.value}, measured_at={self.measured_at})>"
+
+    class Meta:
+        db_table = 'performance_metric_sample'
+        constraints = [
+            # Re-recording a cached run is a no-op; its index also serves per-metric series queries,
+            # which filter on source and scan a measured_at range
+            models.UniqueConstraint(
+                fields=['url_key', 'strategy', 'metric', 'source', 'measured_at', 'bucket_seconds'],
+                name='metric_sample_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['url_key', 'strategy', 'source', 'measured_at'], name='metric_sample_runs_idx'),
+            models.Index(fields=['bucket_seconds', 'measured_at'], name='metric_sample_age_idx'),
+        ]
+
 class StressTable(models.Model):
     extra_url = models.OneToOneField(
         ExtraURLTable,
@@ -87,4 +193,83 @@ class TestBreakTable(models.Model):
         return f"<TestBreakTable(extra_url_link={self.extra_url_id}, test_to_break={self.test_to_break})>"
     
     class Meta:
-        db_table = 'test_break_table'
\ No newline at end of file
+        db_table = 'test_break_table'
+
+class AnalysisJob(models.Model):
+    KIND_WEBSITES_PERFORMANCE = 'websites_performance'
+    KIND_CAPTURE_SCREENSHOTS = 'capture_screenshots'
+    KIND_LOAD_TESTS = 'load_tests'
+    KIND_CHOICES = [
+        (KIND_WEBSITES_PERFORMANCE, 'Websites performance'),
+        (KIND_CAPTURE_SCREENSHOTS, 'Capture screenshots'),
+        (KIND_LOAD_TESTS, 'Load tests'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_email = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    stage = models.CharField(max_length=64, blank=True, default='')
+    progress = models.PositiveSmallIntegerField(default=0)
+    result_path = models.CharField(max_length=512, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    metrics = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Lease held by the worker running the job; an expired lease makes the job claimable again
+    lease_owner = models.CharField(max_length=128, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"<AnalysisJob(job_id={self.job_id}, kind={self.kind}, status={self.status})>"
+
+    class Meta:
+        db_table = 'analysis_job'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='analysis_job_status_idx'),
+        ]
+
+
+class LlmReviewCache(models.Model):
+    """LLM screenshot reviews keyed by a perceptual hash of the screenshot.
+
+    The 64-bit dHash is also split into four 16-bit bands: two hashes within Hamming
+    distance 3 always share at least one band, so near matches are found through the
+    band indexes instead of a table scan.
+    """
+    review_key = models.CharField(max_length=64)
+    phash = models.CharField(max_length=16)
+    band0 = models.IntegerField()
+    band1 = models.IntegerField()
+    band2 = models.IntegerField()
+    band3 = models.IntegerField()
+    response = models.JSONField(default=list)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"<LlmReviewCache(phash={self.phash}, hits={self.hits})>"
+
+    class Meta:
+        db_table = 'llm_review_cache'
+        indexes = [
+            models.Index(fields=['review_key', 'band0'], name='llm_review_band0_idx'),
+            models.Index(fields=['review_key', 'band1'], name='llm_review_band1_idx'),
+            models.Index(fields=['review_key', 'band2'], name='llm_review_band2_idx'),
+            models.Index(fields=['review_key', 'band3'], name='llm_review_band3_idx'),
+            models.Index(fields=['created_at'], name='llm_review_created_idx'),
+        ]
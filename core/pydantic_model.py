@@ -3,4 +3,6 @@ from typing import Optional
 class URLModel(BaseModel):
     flowId: Optional[int] = 1
     name: Optional[str] = "Website Performance"
-    url: Optional[str] = "https://www.tryfix.ai/"
\ No newline at end of file
+    url: Optional[str] = "https://www.tryfix.ai/"
+    # Skip cached PageSpeed results and run it again
+    force_fresh: Optional[bool] = False
\ No newline at end of file
@@ -0,0 +1,142 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_current_sink = contextvars.ContextVar('result_sink', default=None)
+_CLOSE = object()
+
+
+class ResultSink:
+    """Append-only JSONL writer for the records of one job, compacted to JSON at the end.
+
+    One writer task owns the file, so concurrent capture tasks only put records on a
+    queue; each record costs one appended line, and unsynced lines are fsynced within
+    `fsync_interval` seconds, also when no more records arrive. close() drains the queue
+    and writes `<name>.json`; writes after that are rejected.
+    """
+
+    def __init__(self, save_dir: str, name: str = 'all_responses', fsync_interval: Optional[float] = None, max_queue: int = 1000):
+        self.save_dir = save_dir
+        self.jsonl_path = os.path.join(save_dir, f"{name}.jsonl")
+        self.json_path = os.path.join(save_dir, f"{name}.json")
+        self.fsync_interval = settings.RESULT_SINK_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self.records = 0
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._closed = False
+
+    async def start(self):
+        os.makedirs(self.save_dir, exist_ok=True)
+        self._task = asyncio.create_task(self._writer())
+
+    async def write(self, record: dict):
+        if self._closed:
+            raise RuntimeError("Result sink is closed")
+        if self._task is None or self._task.done():
+            raise RuntimeError("Result sink is not running")
+        await self._queue.put(record)
+
+    async def _writer(self):
+        last_sync = time.monotonic()
+        unsynced = False
+        with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+            closing = False
+            while not closing:
+                # With lines waiting for an fsync, wake up when it is due even if nothing arrives
+                timeout = max(0, self.fsync_interval - (time.monotonic() - last_sync)) if unsynced else None
+                try:
+                    batch = [await asyncio.wait_for(self._queue.get(), timeout)]
+                except asyncio.TimeoutError:
+                    batch = []
+                # Whatever else is queued goes out in the same write
+                while not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                closing = any(record is _CLOSE for record in batch)
+                batch = [record for record in batch if record is not _CLOSE]
+                if batch:
+                    f.write(''.join(json.dumps(record) + '\n' for record in batch))
+                    f.flush()
+                    self.records += len(batch)
+                    unsynced = True
+                if unsynced and (closing or time.monotonic() - last_sync >= self.fsync_interval):
+                    await asyncio.to_thread(os.fsync, f.fileno())
+                    last_sync = time.monotonic()
+                    unsynced = False
+
+    def compact(self):
+        """Fold the JSONL file into `<name>.json` (keeping records already there) and remove it."""
+        records = []
+        if os.path.exists(self.json_path):
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        if os.path.exists(self.jsonl_path):
+            with open(self.jsonl_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash; everything before it is intact
+                        logger.error(f"Skipping unreadable record in {self.jsonl_path}")
+        tmp_path = f"{self.json_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.json_path)
+        if os.path.exists(self.jsonl_path):
+            os.remove(self.jsonl_path)
+
+    async def close(self):
+        self._closed = True
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(_CLOSE)
+        try:
+            await self._task
+        finally:
+            self._task = None
+            await asyncio.to_thread(self.compact)
+        logger.info(f"Result sink wrote {self.records} records to {self.json_path}")
+
+
+def current_result_sink(save_dir: Optional[str] = None) -> Optional[ResultSink]:
+    """The sink installed by result_sink() for this context, if it writes to `save_dir`."""
+    sink = _current_sink.get()
+    if sink is None or (save_dir is not None and os.path.abspath(sink.save_dir) != os.path.abspath(save_dir)):
+        return None
+    return sink
+
+
+@asynccontextmanager
+async def result_sink(save_dir: str, name: str = 'all_responses'):
+    """Run a ResultSink for everything in this context (asyncio tasks started inside inherit it)."""
+    sink = ResultSink(save_dir, name)
+    await sink.start()
+    token = _current_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        _current_sink.reset(token)
+        await sink.close()
+
+
+async def write_results(save_dir: str, records, name: str = 'all_responses'):
+    """Hand records to the running sink for `save_dir`, or to a short-lived one outside a job."""
+    sink = current_result_sink(save_dir)
+    if sink is not None:
+        for record in records:
+            await sink.write(record)
+        return
+    async with result_sink(save_dir, name) as sink:
+        for record in records:
+            await sink.write(record)
@@ -0,0 +1,468 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+from django.conf import settings
+from django.utils import timezone
+
+from core import metrics
+from core.scrape.scrape_website_links import LinkStatus
+from core.scrape.health_cache import as_status, get_link_health_store
+from core.scrape.link_extractor import Anchor, StreamingPage
+from core.utils import canonicalize, closes_db_connection, normalize_url
+
+logger = logging.getLogger(__name__)
+
+SKIPPED_SCHEMES = ('mailto:', 'tel:', 'javascript:', 'data:', 'sms:', 'ftp:')
+# Statuses some servers return for HEAD although GET works
+HEAD_FALLBACK_STATUSES = {400, 403, 405, 501}
+
+
+def site_host(url: str) -> str:
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def filter_anchors(base_url: str, anchors, site_url: Optional[str] = None):
+    """(absolute URL, Anchor) for each same-site, de-duplicated http(s) link, in page order.
+
+    Fragments are dropped (`/a#x` is `/a`), as are mailto:/tel:/javascript: links and
+    anything on another host (`www.` is ignored when comparing).
+    """
+    host = site_host(site_url or base_url)
+    seen, links = set(), []
+    for anchor in anchors:
+        href = (anchor.href or '').strip()
+        if not href or href.startswith('#') or href.lower().startswith(SKIPPED_SCHEMES):
+            continue
+        url = urljoin(base_url, href).split('#', 1)[0]
+        if urlsplit(url).scheme not in ('http', 'https') or site_host(url) != host:
+            continue
+        key = normalize_url(url)
+        if key not in seen:
+            seen.add(key)
+            links.append((url, anchor))
+    return links
+
+
+def filter_links(base_url: str, hrefs, site_url: Optional[str] = None) -> List[str]:
+    """Like filter_anchors() for plain href strings; returns the URLs."""
+    return [url for url, _ in filter_anchors(base_url, (Anchor(href) for href in hrefs), site_url)]
+
+
+def new_session() -> aiohttp.ClientSession:
+    """Pooled keep-alive session with a per-host connection cap and cached DNS."""
+    connector = aiohttp.TCPConnector(
+        limit=settings.LINK_CHECK_CONCURRENCY,
+        limit_per_host=settings.LINK_CHECK_PER_HOST,
+        ttl_dns_cache=settings.LINK_CHECK_DNS_CACHE_SECONDS,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=settings.LINK_CHECK_TIMEOUT),
+        headers={"User-Agent": settings.CRAWLER_USER_AGENT},
+    )
+
+
+async def fetch_page_links(session: aiohttp.ClientSession, url: str, max_bytes: Optional[int] = None):
+    """GET a page and extract its links while it downloads.
+
+    Returns (final URL, status, StreamingPage); the page is None for non-HTML or non-200
+    responses, the status None on errors, and `page.failed` is set when the HTML can't be
+    parsed to the end. Pages over `max_bytes` (CRAWL_MAX_PAGE_BYTES)
+    are cut off there and the connection is dropped.
+    """
+    try:
+        async with session.get(url) as response:
+            if response.status != 200 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+                return str(response.url), response.status, None
+            page = StreamingPage(str(response.url), response.charset, max_bytes or settings.CRAWL_MAX_PAGE_BYTES)
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                if not page.feed(chunk):
+                    break
+            page.close()
+            if page.failed:
+                logger.error(f"Unparseable HTML on {url}, keeping the {len(page.anchors)} links found before it")
+            return str(response.url), response.status, page
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Error fetching links from {url}: {e}")
+        return url, None, None
+
+
+def conditional_headers(cached) -> dict:
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+    return headers
+
+
+async def check_link(session: aiohttp.ClientSession, url: str, cached=None) -> LinkStatus:
+    """HEAD the URL; when HEAD is refused or fails, fall back to a GET that stops after the headers.
+
+    With a `cached` LinkHealthCache entry the request is conditional, and a 304 answer
+    keeps the cached status.
+    """
+    start_time = time.time()
+    headers = conditional_headers(cached)
+    status_code, error, validators = None, None, None
+    try:
+        async with session.head(url, allow_redirects=True, headers=headers) as response:
+            status_code, validators = response.status, response.headers
+        metrics.increment('link_check.head')
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        error = str(e) or type(e).__name__
+    if status_code is None or status_code in HEAD_FALLBACK_STATUSES:
+        try:
+            # Leaving the block without reading the body closes the connection instead of downloading it
+            async with session.get(url, allow_redirects=True, headers=headers) as response:
+                status_code, error, validators = response.status, None, response.headers
+            metrics.increment('link_check.get_fallback')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or type(e).__name__
+    if status_code is None:
+        return LinkStatus(url=url, status_code=-1, is_alive=False, response_time=-1, error=error)
+    etag, last_modified = validators.get('ETag', ''), validators.get('Last-Modified', '')
+    not_modified = status_code == 304 and bool(headers)
+    if not_modified:
+        metrics.increment('link_check.not_modified')
+        status_code = cached.status_code
+        etag, last_modified = etag or cached.etag, last_modified or cached.last_modified
+    return LinkStatus(
+        url=url,
+        status_code=status_code,
+        is_alive=status_code == 200,
+        response_time=time.time() - start_time,
+        etag=etag,
+        last_modified=last_modified,
+        cached=not_modified,
+    )
+
+
+async def check_links(session: aiohttp.ClientSession, links: List[str], max_links: Optional[int] = None,
+                      time_budget: Optional[float] = None, cached: Optional[dict] = None) -> List[LinkStatus]:
+    """Check links concurrently within the global budget: at most `max_links` checks, and
+    whatever hasn't finished after `time_budget` seconds is reported as not checked.
+
+    `cached` maps URLs to expired LinkHealthCache entries to re-check conditionally."""
+    cached = cached or {}
+    max_links = settings.LINK_CHECK_MAX_LINKS if max_links is None else max_links
+    time_budget = settings.LINK_CHECK_TIME_BUDGET if time_budget is None else time_budget
+    if len(links) > max_links:
+        logger.info(f"Checking {max_links} of {len(links)} links (LINK_CHECK_MAX_LINKS)")
+        metrics.increment('link_check.over_budget', len(links) - max_links)
+    checked = links[:max_links]
+    tasks = [asyncio.ensure_future(check_link(session, url, cached.get(url))) for url in checked]
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait(tasks, timeout=time_budget)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.info(f"Time budget of {time_budget}s ran out with {len(pending)} links unchecked")
+        metrics.increment('link_check.over_budget', len(pending))
+    results = []
+    for url, task in zip(checked, tasks):
+        if task in done and task.exception() is None:
+            results.append(task.result())
+        else:
+            results.append(LinkStatus(url=url, status_code=-1, is_alive=False, response_time=-1, error="not checked"))
+    metrics.increment('link_check.checked', len(done))
+    return results
+
+
+class VisitedSet:
+    """Seen-URL index holding an 8-byte hash per canonical URL instead of the URL string.
+
+    A collision (about 1 in 10^19 per pair) would only make the crawler skip one page.
+    """
+
+    def __init__(self):
+        self._hashes = set()
+
+    @staticmethod
+    def _hash(url: str) -> int:
+        return int.from_bytes(hashlib.blake2b(canonicalize(url).encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, url: str) -> bool:
+        """Mark `url` seen; False if it already was."""
+        digest = self._hash(url)
+        if digest in self._hashes:
+            return False
+        self._hashes.add(digest)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return self._hash(url) in self._hashes
+
+    def __len__(self):
+        return len(self._hashes)
+
+
+@dataclass
+class CrawlStats:
+    pages_fetched: int = 0
+    pages_failed: int = 0
+    pages_truncated: int = 0
+    links_discovered: int = 0
+    duplicates_skipped: int = 0
+    canonical_duplicates: int = 0  # discovered links another page named as its canonical, not fetched
+    robots_blocked: int = 0
+    links_checked: int = 0
+    # Of the links checked: served by the link health cache, re-checked with a 304 answer, and
+    # requests actually sent (304s included)
+    health_cache_hits: int = 0
+    revalidated_304: int = 0
+    network_checks: int = 0
+    max_depth_reached: int = 0
+    frontier_left: int = 0
+    stopped_by: str = ''  # '', 'max_pages' or 'time_budget'
+    elapsed_seconds: float = 0.0
+
+
+@dataclass
+class LinkInfo:
+    """What the crawl saw of a link, input for the heuristic pre-ranker (core/scrape/prerank.py)."""
+    url: str
+    depth: int  # crawl depth of the first page linking here, plus one
+    anchor_text: str = ''
+    regions: Set[str] = field(default_factory=set)
+    inbound: int = 0  # pages linking here; site-wide nav links score high
+
+
+@dataclass
+class CrawlResult:
+    links: List[LinkStatus] = field(default_factory=list)
+    stats: CrawlStats = field(default_factory=CrawlStats)
+    link_info: Dict[str, LinkInfo] = field(default_factory=dict)  # keyed by URL as reported in `links`
+    sitemaps: List[str] = field(default_factory=list)  # from robots.txt and <link rel="sitemap">
+
+
+async def load_robots(session: aiohttp.ClientSession, start_url: str) -> RobotFileParser:
+    """robots.txt of the site, read like RobotFileParser.read(): 401/403 disallow all, other errors allow all."""
+    parts = urlsplit(start_url)
+    robots = RobotFileParser(f"{parts.scheme}://{parts.netloc}/robots.txt")
+    try:
+        async with session.get(robots.url) as response:
+            if response.status in (401, 403):
+                robots.disallow_all = True
+            elif 200 <= response.status < 300:
+                robots.parse((await response.text(errors='replace')).splitlines())
+            else:
+                robots.allow_all = True
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        robots.allow_all = True
+    return robots
+
+
+def frontier_priority(depth: int, url: str):
+    # Shallow pages first, then short paths: /pricing before /blog/2019/05/some-post
+    path = urlsplit(url).path
+    return depth, path.count('/'), len(path)
+
+
+class Crawler:
+    """Breadth-first crawl of one site from `start_url`.
+
+    Pages come off a priority frontier (see frontier_priority) and are fetched
+    `concurrency` at a time until the frontier is empty or the depth, page or time
+    budget runs out. Every same-site link found on the fetched pages is reported;
+    fetched pages count as checked, the rest get a HEAD check afterwards.
+    """
+
+    def __init__(self, session, start_url, max_depth=None, max_pages=None, time_budget=None, concurrency=None):
+        self.session = session
+        self.start_url = start_url
+        self.max_depth = settings.CRAWL_MAX_DEPTH if max_depth is None else max_depth
+        self.max_pages = settings.CRAWL_MAX_PAGES if max_pages is None else max_pages
+        self.time_budget = settings.CRAWL_TIME_BUDGET if time_budget is None else time_budget
+        self.concurrency = concurrency or settings.CRAWL_CONCURRENCY
+        self.stats = CrawlStats()
+        self.visited = VisitedSet()
+        self.aliases = VisitedSet()  # canonicals declared by fetched pages, never fetched again
+        self.discovered = []  # same-site links in discovery order
+        self.fetched = {}  # url -> LinkStatus of pages the crawl itself loaded
+        self._frontier = []
+        self._seq = itertools.count()
+        self._in_progress = 0
+        self._started = 0
+        self._robots = None
+        self._robots_verdicts = {}
+        self._link_info = {}  # canonical URL -> LinkInfo
+        self.sitemaps = set()
+
+    def _allowed(self, url):
+        allowed = self._robots_verdicts.get(url)
+        if allowed is None:
+            allowed = self._robots_verdicts[url] = self._robots.can_fetch(settings.CRAWLER_USER_AGENT, url)
+            if not allowed:
+                self.stats.robots_blocked += 1
+        return allowed
+
+    def _note(self, url, anchor, depth):
+        key = canonicalize(url)
+        info = self._link_info.get(key)
+        if info is None:
+            info = self._link_info[key] = LinkInfo(url=url, depth=depth, anchor_text=anchor.text)
+        elif not info.anchor_text:
+            info.anchor_text = anchor.text
+        if anchor.region:
+            info.regions.add(anchor.region)
+        info.inbound += 1
+
+    def _push(self, url, depth):
+        heapq.heappush(self._frontier, (frontier_priority(depth, url), next(self._seq), url, depth))
+
+    def _out_of_budget(self, deadline):
+        if self._started >= self.max_pages:
+            self.stats.stopped_by = self.stats.stopped_by or 'max_pages'
+            return True
+        if time.monotonic() >= deadline:
+            self.stats.stopped_by = self.stats.stopped_by or 'time_budget'
+            return True
+        return False
+
+    async def _visit(self, url, depth):
+        start_time = time.time()
+        page_url, status_code, page = await fetch_page_links(self.session, url)
+        if status_code is None or page is not None and page.failed:
+            self.stats.pages_failed += 1
+        if status_code is None:
+            return []
+        self.stats.pages_fetched += 1
+        self.stats.max_depth_reached = max(self.stats.max_depth_reached, depth)
+        if depth > 0:
+            self.fetched[url] = LinkStatus(
+                url=url, status_code=status_code, is_alive=status_code == 200,
+                response_time=time.time() - start_time,
+            )
+        if page is None:
+            return []
+        if page.truncated:
+            self.stats.pages_truncated += 1
+        if page.canonical and site_host(page.canonical) == site_host(self.start_url):
+            # This page's content was crawled already, so its canonical needn't be fetched;
+            # it is still reported and checked when a page links to it
+            self.aliases.add(page.canonical)
+        self.sitemaps.update(page.sitemaps)
+        return filter_anchors(page_url, page.anchors, site_url=self.start_url)
+
+    async def _worker(self, cond, deadline):
+        while True:
+            async with cond:
+                while not self._frontier and self._in_progress:
+                    await cond.wait()
+                if not self._frontier or self._out_of_budget(deadline):
+                    cond.notify_all()
+                    return
+                _, _, url, depth = heapq.heappop(self._frontier)
+                self._in_progress += 1
+                self._started += 1
+            links = []
+            try:
+                links = await asyncio.wait_for(self._visit(url, depth), max(deadline - time.monotonic(), 0.01))
+            except asyncio.TimeoutError:
+                pass
+            except Exception as e:
+                # One bad page must not take the other workers' crawl down with it
+                logger.error(f"Error crawling {url}: {e}")
+                self.stats.pages_failed += 1
+            finally:
+                async with cond:
+                    try:
+                        for link, anchor in links:
+                            self._note(link, anchor, depth + 1)
+                            if not self.visited.add(link):
+                                self.stats.duplicates_skipped += 1
+                                continue
+                            self.discovered.append(link)
+                            if link in self.aliases:
+                                self.stats.canonical_duplicates += 1
+                            elif depth + 1 <= self.max_depth and self._allowed(link):
+                                self._push(link, depth + 1)
+                    finally:
+                        # Always, or the other workers wait on this page forever
+                        self._in_progress -= 1
+                        cond.notify_all()
+
+    async def _load_health(self, urls: List[str]):
+        """Split the link health cache's entries for `urls` into fresh LinkStatuses and expired entries."""
+        store = get_link_health_store()
+        if store is None or not urls:
+            return {}, {}
+        try:
+            entries = await asyncio.to_thread(closes_db_connection(store.load), urls)
+        except Exception as e:
+            logger.error(f"Link health cache lookup failed: {e}")
+            return {}, {}
+        now = timezone.now()
+        fresh = {url: as_status(entry, url) for url, entry in entries.items() if entry.expires_at > now}
+        expired = {url: entry for url, entry in entries.items() if url not in fresh}
+        return fresh, expired
+
+    async def _save_health(self, statuses: List[LinkStatus]):
+        store = get_link_health_store()
+        if store is None or not statuses:
+            return
+        try:
+            await asyncio.to_thread(closes_db_connection(store.save), statuses)
+        except Exception as e:
+            logger.error(f"Error saving link health checks: {e}")
+
+    async def crawl(self) -> CrawlResult:
+        started_at = time.monotonic()
+        deadline = started_at + self.time_budget
+        self._robots = await load_robots(self.session, self.start_url)
+        self.sitemaps.update(self._robots.site_maps() or [])
+        self.visited.add(self.start_url)
+        if self._allowed(self.start_url):
+            self._push(self.start_url, 0)
+        cond = asyncio.Condition()
+        await asyncio.gather(*(self._worker(cond, deadline) for _ in range(self.concurrency)))
+        self.stats.frontier_left = len(self._frontier)
+        self.stats.links_discovered = len(self.discovered)
+
+        # Pages the crawl loaded are known good or bad already; only the rest need a check
+        unchecked = [url for url in self.discovered if url not in self.fetched and self._allowed(url)]
+        fresh, expired = await self._load_health(unchecked)
+        results = await check_links(self.session, [url for url in unchecked if url not in fresh], cached=expired)
+        checked = {status.url: status for status in results}
+        checked.update(fresh)
+        await self._save_health([status for status in results if status.error != "not checked"])
+        self.stats.links_checked = len(checked)
+        self.stats.health_cache_hits = len(fresh)
+        self.stats.revalidated_304 = sum(status.cached for status in results)
+        self.stats.network_checks = sum(status.error != "not checked" for status in results)
+        links = [self.fetched.get(url) or checked[url] for url in self.discovered if url in self.fetched or url in checked]
+        self.stats.elapsed_seconds = time.monotonic() - started_at
+        link_info = {status.url: self._link_info[canonicalize(status.url)] for status in links}
+        return CrawlResult(links=links, stats=self.stats, link_info=link_info, sitemaps=sorted(self.sitemaps))
+
+
+async def crawl_site(start_url: str, **budget) -> CrawlResult:
+    """Crawl `start_url` breadth-first on one pooled session; `budget` overrides the CRAWL_* settings."""
+    async with new_session() as session:
+        result = await Crawler(session, start_url, **budget).crawl()
+    stats = result.stats
+    logger.info(
+        f"Crawled {start_url}: {stats.pages_fetched} pages, {stats.links_discovered} links, "
+        f"depth {stats.max_depth_reached}, {stats.elapsed_seconds:.1f}s, "
+        f"{stats.health_cache_hits} link checks from cache, {stats.revalidated_304} not modified"
+        + (f", stopped by {stats.stopped_by}" if stats.stopped_by else "")
+    )
+    metrics.increment('crawler.pages_fetched', stats.pages_fetched)
+    metrics.increment('crawler.robots_blocked', stats.robots_blocked)
+    metrics.increment('link_health_cache.hits', stats.health_cache_hits)
+    metrics.increment('link_health_cache.revalidated', stats.revalidated_304)
+    metrics.increment('link_health_cache.network_checks', stats.network_checks)
+    return result
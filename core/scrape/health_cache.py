@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import LinkHealthCache
+from core.scrape.scrape_website_links import LinkStatus
+from core.utils import canonicalize
+
+logger = logging.getLogger(__name__)
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(canonicalize(url).encode('utf-8')).hexdigest()
+
+
+def ttl_for(status_code: int) -> int:
+    """Seconds a check with this status is trusted: long for 200s, short for errors and throttling."""
+    if status_code == 200:
+        return settings.LINK_HEALTH_TTL_OK_SECONDS
+    # 404/410 and friends rarely flip back within the hour; 429, 5xx and network errors might
+    if 300 <= status_code < 500 and status_code != 429:
+        return settings.LINK_HEALTH_TTL_CLIENT_ERROR_SECONDS
+    return settings.LINK_HEALTH_TTL_ERROR_SECONDS
+
+
+def as_status(entry: LinkHealthCache, url: str) -> LinkStatus:
+    return LinkStatus(
+        url=url,
+        status_code=entry.status_code,
+        is_alive=entry.status_code == 200,
+        response_time=entry.response_time,
+        error=None if entry.status_code > 0 else "cached failure",
+        etag=entry.etag,
+        last_modified=entry.last_modified,
+        cached=True,
+    )
+
+
+class LinkHealthStore:
+    """DB cache of link health checks. Blocking, call it off the event loop.
+
+    Keys hash the canonicalized URL (core.utils.canonicalize), so `/a/?utm_source=x`
+    and `/a` share one entry. An entry is fresh until its
+    status's TTL (see ttl_for) runs out; after that its ETag/Last-Modified still let
+    the crawler re-check with a conditional request.
+    """
+
+    def load(self, urls: List[str]) -> Dict[str, LinkHealthCache]:
+        """Cached entries for `urls`, fresh or not, keyed by URL as given."""
+        keys = {}
+        for url in urls:
+            keys.setdefault(url_key(url), []).append(url)
+        entries = {}
+        # Stay under SQLite's bound-parameter limit
+        key_list = list(keys)
+        for start in range(0, len(key_list), 500):
+            for entry in LinkHealthCache.objects.filter(url_key__in=key_list[start:start + 500]):
+                for url in keys[entry.url_key]:
+                    entries[url] = entry
+        return entries
+
+    def save(self, statuses: List[LinkStatus]):
+        now = timezone.now()
+        # One row per key: variants of a URL in one batch would hit the same row twice in the upsert
+        rows = {
+            url_key(status.url): LinkHealthCache(
+                url_key=url_key(status.url),
+                url=status.url,
+                status_code=status.status_code,
+                etag=(status.etag or '')[:255],
+                last_modified=(status.last_modified or '')[:64],
+                response_time=status.response_time,
+                checked_at=now,
+                expires_at=now + timedelta(seconds=ttl_for(status.status_code)),
+            )
+            for status in statuses
+        }
+        if rows:
+            LinkHealthCache.objects.bulk_create(
+                list(rows.values()), update_conflicts=True, unique_fields=['url_key'],
+                update_fields=['url', 'status_code', 'etag', 'last_modified', 'response_time', 'checked_at', 'expires_at'],
+            )
+
+    def purge(self) -> int:
+        """Delete entries nobody has re-checked for LINK_HEALTH_CACHE_RETENTION_SECONDS."""
+        cutoff = timezone.now() - timedelta(seconds=settings.LINK_HEALTH_CACHE_RETENTION_SECONDS)
+        deleted, _ = LinkHealthCache.objects.filter(checked_at__lt=cutoff).delete()
+        return deleted
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_link_health_store() -> Optional[LinkHealthStore]:
+    """Process-wide link health cache, or None when LINK_HEALTH_CACHE_ENABLED is off."""
+    global _store
+    if not settings.LINK_HEALTH_CACHE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = LinkHealthStore()
+        return _store
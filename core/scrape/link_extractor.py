@@ -0,0 +1,155 @@
+import codecs
+from html.parser import HTMLParser
+from typing import List, NamedTuple, Optional
+from urllib.parse import urljoin
+
+REGION_TAGS = {'nav': 'nav', 'header': 'header', 'footer': 'footer', 'aside': 'aside', 'main': 'main'}
+REGION_ROLES = {'navigation': 'nav', 'banner': 'header', 'contentinfo': 'footer', 'complementary': 'aside', 'main': 'main'}
+MAX_ANCHOR_TEXT = 100
+
+
+class Anchor(NamedTuple):
+    href: str
+    text: str = ''
+    region: str = ''  # nearest nav/header/footer/aside/main ancestor, '' if none
+
+
+class LinkExtractor(HTMLParser):
+    """Event-based link extractor, fed the page in chunks instead of building a DOM.
+
+    Collects every <a href> as an Anchor with its text and page region, resolved
+    against `<base href>` when the page has one, plus the canonical URL and
+    sitemap hints. drain() hands out the anchors found since the last call.
+    """
+
+    def __init__(self, page_url: str):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.base_url = page_url
+        self.canonical = None
+        self.sitemaps = []
+        self.anchors_seen = 0
+        self._pending = []
+        self._regions = []  # stack of (tag, region)
+        self._anchor = None  # [href, text parts, label, region]
+        self._has_base = False
+
+    def _region(self) -> str:
+        return self._regions[-1][1] if self._regions else ''
+
+    def _finish_anchor(self):
+        href, parts, label, region = self._anchor
+        self._anchor = None
+        text = ' '.join(' '.join(parts).split())[:MAX_ANCHOR_TEXT] or label
+        self._pending.append(Anchor(urljoin(self.base_url, href.strip()), text, region))
+        self.anchors_seen += 1
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'a':
+            if self._anchor is not None:  # unclosed <a>
+                self._finish_anchor()
+            if attrs.get('href') is not None:
+                label = (attrs.get('aria-label') or attrs.get('title') or '')[:MAX_ANCHOR_TEXT]
+                self._anchor = [attrs['href'], [], label, self._region()]
+        elif tag == 'img' and self._anchor is not None and attrs.get('alt'):
+            self._anchor[1].append(attrs['alt'])
+        elif tag == 'base' and not self._has_base and attrs.get('href'):
+            # Only the first <base> counts
+            self.base_url = urljoin(self.page_url, attrs['href'])
+            self._has_base = True
+        elif tag == 'link' and attrs.get('href'):
+            rel = (attrs.get('rel') or '').lower().split()
+            if 'canonical' in rel and self.canonical is None:
+                self.canonical = urljoin(self.base_url, attrs['href'])
+            elif 'sitemap' in rel:
+                self.sitemaps.append(urljoin(self.base_url, attrs['href']))
+        region = REGION_TAGS.get(tag) or REGION_ROLES.get((attrs.get('role') or '').lower())
+        if region:
+            self._regions.append((tag, region))
+
+    def handle_startendtag(self, tag, attrs):
+        # <a/> and friends never open a region
+        self.handle_starttag(tag, attrs)
+        if self._regions and self._regions[-1][0] == tag:
+            self._regions.pop()
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._anchor is not None:
+            self._finish_anchor()
+        for index in range(len(self._regions) - 1, -1, -1):
+            if self._regions[index][0] == tag:
+                del self._regions[index:]
+                break
+
+    def handle_data(self, data):
+        if self._anchor is not None and sum(map(len, self._anchor[1])) < MAX_ANCHOR_TEXT:
+            self._anchor[1].append(data)
+
+    def drain(self) -> List[Anchor]:
+        pending, self._pending = self._pending, []
+        return pending
+
+    def close(self):
+        super().close()
+        if self._anchor is not None:
+            self._finish_anchor()
+
+
+def extract_anchors(html: str, page_url: str = '') -> List[Anchor]:
+    """All anchors of an HTML string, hrefs resolved against `page_url` and <base href>."""
+    extractor = LinkExtractor(page_url)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.drain()
+
+
+class StreamingPage:
+    """Feeds raw response bytes to a LinkExtractor, decoding incrementally, up to `max_bytes`.
+
+    Markup HTMLParser gives up on (it raises AssertionError on `<![foo bar]>`) marks the
+    page `failed`; the anchors found before it are kept.
+    """
+
+    def __init__(self, page_url: str, encoding: Optional[str] = None, max_bytes: int = 5 * 1024 * 1024):
+        self.extractor = LinkExtractor(page_url)
+        self.anchors = []
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.truncated = False
+        self.failed = False
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def feed(self, chunk: bytes) -> bool:
+        """Parse one chunk; False once the size limit is reached and reading should stop."""
+        room = self.max_bytes - self.bytes_read
+        if len(chunk) > room:
+            chunk, self.truncated = chunk[:room], True
+        self.bytes_read += len(chunk)
+        self._parse(self.extractor.feed, self._decoder.decode(chunk))
+        return not self.truncated and not self.failed
+
+    def close(self) -> List[Anchor]:
+        if not self.failed:
+            self._parse(self.extractor.feed, self._decoder.decode(b'', final=True))
+        if not self.failed:
+            self._parse(self.extractor.close)
+        return self.anchors
+
+    def _parse(self, step, *args):
+        try:
+            step(*args)
+        except AssertionError:
+            self.failed = True
+        self.anchors.extend(self.extractor.drain())
+
+    @property
+    def canonical(self) -> Optional[str]:
+        return self.extractor.canonical
+
+    @property
+    def sitemaps(self) -> List[str]:
+        return self.extractor.sitemaps
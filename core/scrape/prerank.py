@@ -0,0 +1,83 @@
+import math
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from core.scrape.crawler import LinkInfo
+
+# Words in a path or anchor text that usually mark pages worth testing, and pages that aren't
+IMPORTANT_WORDS = {
+    'pricing': 3.0, 'plans': 2.5, 'product': 2.5, 'products': 2.5, 'features': 2.5, 'solutions': 2.0,
+    'shop': 2.0, 'store': 2.0, 'checkout': 1.5, 'cart': 1.0, 'signup': 1.5, 'register': 1.0,
+    'demo': 2.0, 'docs': 2.0, 'documentation': 2.0, 'about': 1.5, 'contact': 1.5, 'services': 2.0,
+    'customers': 1.0, 'blog': 1.0, 'careers': 0.5, 'faq': 1.0, 'support': 1.0, 'dashboard': 1.0,
+}
+LOW_VALUE_WORDS = {
+    'privacy', 'terms', 'cookie', 'cookies', 'legal', 'imprint', 'impressum', 'gdpr', 'sitemap',
+    'login', 'logout', 'signin', 'tag', 'tags', 'category', 'author', 'feed', 'rss', 'print',
+    'wp-admin', 'wp-login', 'share', 'attachment',
+}
+REGION_SCORES = {'nav': 2.0, 'header': 1.5, 'main': 1.0, 'aside': 0.0, 'footer': -1.0}
+
+WORD = re.compile(r'[a-z0-9]+(?:-[a-z0-9]+)*')
+HEX_ID = re.compile(r'^[0-9a-f]{8,}$|^[0-9a-f]{8}-[0-9a-f]{4}-')
+
+
+def path_template(url: str) -> str:
+    """Path with its variable segments replaced, e.g. /blog/my-first-post -> /blog/<slug>."""
+    segments = []
+    for segment in urlsplit(url).path.lower().strip('/').split('/'):
+        if not segment:
+            continue
+        if segment.isdigit():
+            segments.append('<n>')
+        elif HEX_ID.match(segment):
+            segments.append('<id>')
+        elif segment.count('-') >= 2 or len(segment) > 24:
+            segments.append('<slug>')
+        else:
+            segments.append(segment)
+    return '/' + '/'.join(segments)
+
+
+def score_link(info: LinkInfo, start_url: Optional[str] = None) -> float:
+    parts = urlsplit(info.url)
+    segments = [s for s in parts.path.lower().split('/') if s]
+    words = set(WORD.findall(' '.join(segments))) | set(WORD.findall(info.anchor_text.lower()))
+    words |= {piece for word in list(words) for piece in word.split('-')}
+
+    score = -0.8 * len(segments) - 0.5 * max(info.depth - 1, 0)
+    score += max((REGION_SCORES.get(region, 0.0) for region in info.regions), default=0.0)
+    # Linked from many pages = site-wide navigation
+    score += 0.5 * math.log1p(info.inbound)
+    score += max((IMPORTANT_WORDS.get(word, 0.0) for word in words), default=0.0)
+    if words & LOW_VALUE_WORDS:
+        score -= 3.0
+    if parts.query:
+        score -= 1.0
+    if start_url is not None:
+        start = urlsplit(start_url)
+        if (parts.scheme, parts.netloc) == (start.scheme, start.netloc):
+            score += 0.5
+        if parts.path.rstrip('/') == start.path.rstrip('/'):
+            score -= 2.0  # the start page itself is analysed anyway
+    return score
+
+
+def prerank(links: List[str], link_info: Dict[str, LinkInfo], start_url: Optional[str] = None, top_n: int = 25) -> List[str]:
+    """Best `top_n` links by score_link(), one per path template (one blog post stands for all)."""
+    scored = []
+    for position, url in enumerate(links):
+        info = link_info.get(url) or LinkInfo(url=url, depth=1)
+        scored.append((-score_link(info, start_url), position, url))
+    scored.sort()
+    seen_templates, ranked = set(), []
+    for _, _, url in scored:
+        template = path_template(url)
+        if template in seen_templates:
+            continue
+        seen_templates.add(template)
+        ranked.append(url)
+        if len(ranked) >= top_n:
+            break
+    return ranked
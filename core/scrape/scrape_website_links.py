@@ -1,10 +1,6 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
 from dataclasses import dataclass
 from typing import List
-import time
 
 @dataclass
 class LinkStatus:
@@ -13,59 +9,29 @@ class LinkStatus:
     is_alive: bool
     response_time: float
     error: str = None
+    # Validators for a conditional re-check, and whether this result came from the link health cache
+    etag: str = ''
+    last_modified: str = ''
+    cached: bool = False
 
-def check_link_health(url: str) -> LinkStatus:
-    """Check health of a single URL and return its status."""
-    try:
-        start_time = time.time()
-        response = requests.get(url, timeout=10.0, allow_redirects=True)
-        response_time = time.time() - start_time
-        
-        return LinkStatus(
-            url=url,
-            status_code=response.status_code,
-            is_alive=response.status_code == 200,
-            response_time=response_time
-        )
-    except Exception as e:
-        return LinkStatus(
-            url=url,
-            status_code=-1,
-            is_alive=False,
-            response_time=-1,
-            error=str(e)
-        )
+def crawl_website(start_url: str, **budget):
+    """Crawl the site breadth-first and check every link found; returns a CrawlResult (links + stats).
 
-def get_links_from_url(url: str) -> List[str]:
-    """Scrape all links from a single URL."""
-    try:
-        response = requests.get(url, timeout=10.0)
-        html = response.text
-        soup = BeautifulSoup(html, 'html.parser')
-        links = [urljoin(url, a['href']) for a in soup.find_all('a', href=True)]
-        print(f"Found {len(links)} links on {url}")
-        return links
-    except Exception as e:
-        print(f"Error fetching links from {url}: {e}")
-        return []
+    Runs the asyncio crawler (core/scrape/crawler.py) on its own event loop, so call it
+    from a thread without one (async code uses asyncio.to_thread). `budget` takes
+    max_depth / max_pages / time_budget / concurrency, defaulting to the CRAWL_* settings.
+    """
+    from core.scrape.crawler import crawl_site
+    print(f"Fetching links from {start_url}")
+    return asyncio.run(crawl_site(start_url, **budget))
 
-def check_links_health(links: List[str], max_workers: int = 20) -> List[LinkStatus]:
-    """Check health of multiple links concurrently."""
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        results = list(executor.map(check_link_health, links))
-    return results
+def fetch_and_check_links(start_url: str, max_workers: int = 20, **budget) -> List[str]:
+    """Main function to fetch links and check their health; returns the live ones.
 
-def fetch_and_check_links(start_url: str, max_workers: int = 20) -> List[LinkStatus]:
-    """Main function to fetch links and check their health."""
-    # Step 1: Get all links from the starting URL
-    print(f"Fetching links from {start_url}")
-    links = get_links_from_url(start_url)
-    
-    # Step 2: Check health of all links concurrently
-    print(f"Checking health of {len(links)} links...")
-    results = check_links_health(links, max_workers)
-    
-    return [r.url for r in results if r.is_alive]
+    `max_workers` is unused, concurrency is set by LINK_CHECK_CONCURRENCY / LINK_CHECK_PER_HOST.
+    """
+    result = crawl_website(start_url, **budget)
+    return [r.url for r in result.links if r.is_alive]
 
 # if __name__ == "__main__":
 #     start_url = "https://aigrant.com/"
@@ -0,0 +1,17 @@
+from rest_framework import serializers
+from core.models import AnalysisJob
+
+
+class AnalysisJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.UUIDField(read_only=True)
+    has_result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AnalysisJob
+        fields = [
+            'job_id', 'kind', 'status', 'stage', 'progress', 'error', 'metrics',
+            'attempts', 'created_at', 'started_at', 'finished_at', 'has_result',
+        ]
+
+    def get_has_result(self, obj):
+        return obj.status == AnalysisJob.STATUS_SUCCEEDED and bool(obj.result_path)
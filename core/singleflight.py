@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from django.conf import settings
+
+from core import metrics
+from core.utils import normalize_url
+
+
+class _LeaderCancelled(Exception):
+    """The caller doing the work was cancelled; whoever waited on it retries."""
+
+
+def flight_key(stage: str, url: str, **params):
+    """(stage, normalized URL, parameters); equal keys share one in-flight call."""
+    return (stage, normalize_url(url), tuple(sorted((name, repr(value)) for name, value in params.items())))
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls, across threads and event loops.
+
+    The first caller for a key runs the work, everyone arriving while it runs waits
+    for the same result (or exception). Successful results are remembered for
+    `memo_seconds` so callers right behind the flight get them too. Results are shared,
+    callers must not mutate them.
+    """
+
+    def __init__(self, memo_seconds: float):
+        self.memo_seconds = memo_seconds
+        self._flights = {}  # key -> concurrent.futures.Future
+        self._memo = {}  # key -> (result, expires_at)
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        """Return (future, is_leader); a memo hit comes back as an already completed future."""
+        now = time.monotonic()
+        with self._lock:
+            memo = self._memo.get(key)
+            if memo is not None:
+                if memo[1] > now:
+                    metrics.increment('singleflight.memo_hits')
+                    future = Future()
+                    future.set_result(memo[0])
+                    return future, False
+                del self._memo[key]
+            future = self._flights.get(key)
+            if future is not None:
+                metrics.increment('singleflight.coalesced')
+                metrics.increment(f'singleflight.coalesced.{key[0]}')
+                return future, False
+            future = self._flights[key] = Future()
+            return future, True
+
+    def _land(self, key, future, result=None, error=None, memo_seconds=None, remember=bool):
+        memo_seconds = self.memo_seconds if memo_seconds is None else memo_seconds
+        now = time.monotonic()
+        with self._lock:
+            self._flights.pop(key, None)
+            if error is None and memo_seconds > 0 and remember(result):
+                self._memo[key] = (result, now + memo_seconds)
+            if len(self._memo) > 256:
+                self._memo = {k: v for k, v in self._memo.items() if v[1] > now}
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def do(self, key, fn, *args, memo_seconds: Optional[float] = None, remember=bool, **kwargs):
+        """Run `fn(*args, **kwargs)` unless the same key is in flight; blocking.
+
+        `remember(result)` decides whether a result is memoized (by default: if truthy,
+        so the empty results of swallowed errors aren't handed out).
+        """
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return future.result()
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                self._land(key, future, error=e)
+                raise
+            self._land(key, future, result, memo_seconds=memo_seconds, remember=remember)
+            return result
+
+    async def do_async(self, key, make_call, memo_seconds: Optional[float] = None, remember=bool):
+        """Await `make_call()` (a coroutine factory) unless the same key is in flight."""
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    # shield: a cancelled waiter must not cancel the shared future
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = await make_call()
+            except asyncio.CancelledError:
+                self._land(key, future, error=_LeaderCancelled())
+                raise
+            except BaseException as e:
+                self._land(key, future, error=e)
+                raise
+            self._land(key, future, result, memo_seconds=memo_seconds, remember=remember)
+            return result
+
+
+_singleflight = None
+_singleflight_lock = threading.Lock()
+
+
+def get_singleflight() -> SingleFlight:
+    global _singleflight
+    with _singleflight_lock:
+        if _singleflight is None:
+            _singleflight = SingleFlight(memo_seconds=settings.SINGLEFLIGHT_MEMO_SECONDS)
+        return _singleflight
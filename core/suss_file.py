@@ -6,13 +6,20 @@ import sys
 import logging
 import json
 from typing import Optional, List
-from core.scrape.scrape_website_links import fetch_and_check_links
-from core.llm.config import ApiClient
-from core.automation import device_dimensions, create_stealth_driver
+from core.scrape.scrape_website_links import crawl_website
+from core.scrape.prerank import prerank
+from core.llm.config import get_api_client
+from core.llm.ranking_cache import get_link_ranking_store
+from django.conf import settings
+from core.automation import device_dimensions, create_stealth_driver, capture_url_matrix
 from core.automation.take_screenshot import TakeScreenshot
 from core.lighthouse.lighthouse_metrics import performance_metrics
-from core.utils import zip_file
+from core.utils import closes_db_connection, zip_file
 from core.pydantic_model import URLModel
+from core.jobs import report_progress
+from core.workspace import JobWorkspace
+from core.singleflight import get_singleflight, flight_key
+from core.result_sink import result_sink
 
 # Configure logging
 logging.basicConfig(
@@ -36,16 +43,57 @@ def create_dummy_file(file_path: Optional[str] = 'valid_urls.txt'):
     else:
         print(f"File already exists: {file_path}")
 
-def generate_valid_links(target_url, file_path: Optional[str] = 'valid_urls.txt'):
-    """Scrape and validate links, then generate a summary report using LLM."""
+def link_ranking_prompt(links):
+    # One URL per line, no Python list quoting
+    joined = '\n'.join(links)
+    return f'Give me links that are important website :-\n{joined}\nthat are very important'
+
+def rank_links(target_url, links):
+    """Ask the LLM for the most important links; None when it couldn't answer."""
+    content = link_ranking_prompt(links)
+    llm = get_api_client().generate_valdi_urls(content)
+    if llm is None:
+        return None
+    return json.loads(llm.text)[0]['response'][:4]
+
+def generate_valid_links(target_url, file_path: Optional[str] = 'valid_urls.txt', force_fresh: bool = False):
+    """Scrape and validate links, then generate a summary report using LLM.
+
+    Blocking (scraping, Gemini, DB); async callers run it with asyncio.to_thread.
+    Concurrent calls for the same site share one scrape and ranking; forced calls only
+    share with each other and aren't memoized.
+    """
+    return get_singleflight().do(
+        flight_key('valid_links', target_url, fresh=force_fresh), _generate_valid_links, target_url, file_path,
+        memo_seconds=0 if force_fresh else None,
+    )
+
+def _generate_valid_links(target_url, file_path: Optional[str] = 'valid_urls.txt'):
     try:
         start_time = time.time()
         create_dummy_file(file_path)
-        links = fetch_and_check_links(target_url)
+        crawl = crawl_website(target_url)
+        links = [status.url for status in crawl.links if status.is_alive]
+        live_count = len(links)
         if links:
-            content = f'Give me links that are important website :- {links} that are very important'
-            llm = ApiClient().generate_valdi_urls(content)
-            valid_links = json.loads(llm.text)[0]['response'][:4]
+            mode = settings.LINK_RANKING_MODE
+            if mode in ('hybrid', 'heuristic'):
+                # Local scoring first, so only the best candidates reach the prompt
+                top_n = 4 if mode == 'heuristic' else settings.LINK_RANKING_CANDIDATES
+                links = prerank(links, crawl.link_info, start_url=target_url, top_n=top_n)
+                logger.info('Pre-ranked %d of %d live links', len(links), live_count)
+            if mode == 'heuristic':
+                return links
+            # The same site with the same links reuses its ranking (see core/llm/ranking_cache.py)
+            ranking_store = get_link_ranking_store()
+            if ranking_store:
+                valid_links = ranking_store.get_or_rank(target_url, links, rank_links)
+            else:
+                valid_links = rank_links(target_url, links)
+            if valid_links is None:
+                # Rate limited or Gemini is down; carry on with the first scraped links
+                logger.error('LLM link ranking failed, using the first scraped links')
+                return links[:4]
             logger.info('Total valid links generate: %d', len(valid_links))
 
             return valid_links
@@ -55,48 +103,80 @@ def generate_valid_links(target_url, file_path: Optional[str] = 'valid_urls.txt'
         logger.error(f"Error generating valid links: {e}")
         return []
 
-async def capture_screenshots_for_urls(target_url:URLModel, screenshot_save_path: Optional[str] = "reports/capture_screenshots"):
+async def capture_screenshots_for_urls(target_url:URLModel, workspace: Optional[JobWorkspace] = None,
+                                      raise_errors: bool = False):
     """
     Capture screenshots for multiple URLs and devices asynchronously.
+
+    Errors are logged, or re-raised with `raise_errors` so a job run fails.
     """
     try:
         start_time = time.time()
-        urls = generate_valid_links(target_url.url)
+        workspace = workspace or JobWorkspace()
+        screenshot_save_path = workspace.subdir("capture_screenshots")
+        report_progress('ranking links', 10)
+        urls = await asyncio.to_thread(
+            closes_db_connection(generate_valid_links), target_url.url, force_fresh=bool(target_url.force_fresh)
+        )
+        report_progress('capturing screenshots', 30)
 
-        # Create tasks for each URL and device
-        tasks = [
-            create_stealth_driver(url=url, save_dir=screenshot_save_path)
-            for url in urls
-        ]
+        # One writer appends every review of this job, all_responses.json is built at the end
+        async with result_sink(screenshot_save_path):
+            if settings.SCREENSHOT_CAPTURE_MODE == 'parallel':
+                # One task per URL and device, each on its own driver
+                await capture_url_matrix(urls, save_dir=screenshot_save_path)
+            else:
+                # Create tasks for each URL, devices are captured one after another
+                tasks = [
+                    create_stealth_driver(url=url, save_dir=screenshot_save_path)
+                    for url in urls
+                ]
 
-        # Execute tasks concurrently
-        await asyncio.gather(*tasks)
+                # Execute tasks concurrently
+                await asyncio.gather(*tasks)
+        report_progress('screenshots captured', 90)
 
         logger.info(f"Screenshot capturing completed in {time.time() - start_time:.2f} seconds.")
     except Exception as e:
         logger.error(f"Error capturing screenshots: {e}")
+        if raise_errors:
+            raise
 
 
-async def run_performance_metrics(target_url:URLModel):
-    """Run Lighthouse performance metrics."""
+async def run_performance_metrics(target_url:URLModel, workspace: Optional[JobWorkspace] = None,
+                                  raise_errors: bool = False):
+    """Run Lighthouse performance metrics; errors are logged, or re-raised with `raise_errors`."""
     try:
         start_time = time.time()
-        await performance_metrics(target_url=target_url)
+        # Same ranked links as the screenshots; the two coalesce into one ranking
+        urls = await asyncio.to_thread(
+            closes_db_connection(generate_valid_links), target_url.url, force_fresh=bool(target_url.force_fresh)
+        )
+        report_progress('running lighthouse metrics')
+        await performance_metrics(target_url=target_url, workspace=workspace, urls=urls)
         logger.info(f"Lighthouse performance metrics completed in {time.time() - start_time} seconds.")
     except Exception as e:
         logger.error(f"Error running Lighthouse performance metrics: {e}")
+        if raise_errors:
+            raise
 
-async def main(target_url:URLModel, save_dir: Optional[str] = "Z:/trryfix.ai/capture_screenshots"):
+async def main(target_url:URLModel, workspace: Optional[JobWorkspace] = None, raise_errors: bool = False):
+    """Screenshots and performance metrics side by side; with `raise_errors` the first failure is re-raised."""
     try:
+        workspace = workspace or JobWorkspace()
 
-        # Step 2: Run all tasks asynchronously
+        # Step 2: Run all tasks asynchronously; both finish even when one fails
         tasks = [
-            capture_screenshots_for_urls(target_url=target_url),
-            run_performance_metrics(target_url=target_url),
+            capture_screenshots_for_urls(target_url=target_url, workspace=workspace, raise_errors=raise_errors),
+            run_performance_metrics(target_url=target_url, workspace=workspace, raise_errors=raise_errors),
         ]
-        await asyncio.gather(*tasks)
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
     except Exception as e:
         logger.error(f"Error occurred: {e}")
+        if raise_errors:
+            raise
 
 
 # if __name__ == "__main__":
@@ -1,3 +1,879 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from aiohttp import web
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from google.genai import errors as genai_errors
+from rest_framework.test import APIClient
+
+from core.automation.driver_pool import DriverPool, PooledDriver
+from core.jobs import claim_next_job, run_job
+from core.lighthouse.lighthouse_metrics import performance_metrics
+from core.lighthouse.pagespeed import fetch_all
+from core.lighthouse.pagespeed_cache import PageSpeedStore
+from core.lighthouse.pagespeed_extract import AUDIT_FIELDS, ROOT_FIELDS, extract_pagespeed
+from core.llm.scheduler import (
+    IMAGE_REVIEW, LINK_RANKING, LlmScheduler, LlmUnavailable, TokenBucket, classify_error,
+)
+from core.management.commands.benchpagespeed import build_payload
+from core.management.commands.pagespeedstub import Command as PageSpeedStub, fixture_name, synthetic_payload
+from core.metric_history import DAY_SECONDS, downsample, url_key
+from core.models import AnalysisJob, LinkHealthCache, PageSpeedSite, PerformanceMetricSample
+from core.pydantic_model import URLModel
+from core.scrape.crawler import (
+    LinkInfo, VisitedSet, check_link, check_links, crawl_site, filter_anchors, filter_links, frontier_priority, new_session,
+)
+from core.scrape.health_cache import LinkHealthStore, ttl_for
+from core.scrape.scrape_website_links import LinkStatus
+from core.scrape.link_extractor import Anchor, StreamingPage
+from core.scrape.prerank import path_template, prerank
+from core.utils import canonicalize
+from core.workspace import JobWorkspace
+
+RECORDED = {
+    "analysisUTCTimestamp": "2026-01-02T03:04:05.678Z",
+    "loadingExperience": {"metrics": {
+        "FIRST_CONTENTFUL_PAINT_MS": {"percentile": 1234, "category": "AVERAGE"},
+        "LARGEST_CONTENTFUL_PAINT_MS": {"percentile": 2345, "category": "AVERAGE"},
+        "CUMULATIVE_LAYOUT_SHIFT_SCORE": {"percentile": 5, "category": "FAST"},
+    }},
+    "lighthouseResult": {
+        "audits": {
+            "metrics": {"title": "Metrics", "details": {"items": [{"firstContentfulPaint": 1234}]}},
+            "final-screenshot": {"title": "Final Screenshot", "details": {"data": "data:image/jpeg;base64,AAAA"}},
+        },
+        "fullPageScreenshot": {"screenshot": {"data": "data:image/webp;base64,AAAA"}},
+    },
+}
+
+
+@asynccontextmanager
+async def serve(app: web.Application, path: str = '/pagespeedonline/v5/runPagespeed'):
+    """Run `app` on a free local port and yield the URL of `path` on it, the PageSpeed endpoint by default."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    port = runner.addresses[0][1]
+    try:
+        yield f"http://127.0.0.1:{port}{path}"
+    finally:
+        await runner.cleanup()
+
+
+def scripted_app(statuses, calls):
+    """PageSpeed stand-in answering with `statuses` in turn (then 200), counting calls per strategy."""
+    async def run_pagespeed(request):
+        strategy = request.query['strategy']
+        calls.append(strategy)
+        status = statuses.pop(0) if statuses else 200
+        if status != 200:
+            return web.json_response({"error": {"code": status, "message": "scripted"}}, status=status)
+        return web.json_response(RECORDED)
+    app = web.Application()
+    app.router.add_get('/pagespeedonline/v5/runPagespeed', run_pagespeed)
+    return app
+
+
+def site_app(pages, requests=None):
+    """Website stand-in: `pages` maps a path to an HTML string or (status, body, headers); others 404.
+
+    Every request is appended to `requests` as (method, path).
+    """
+    async def page(request):
+        if requests is not None:
+            requests.append((request.method, request.path))
+        entry = pages.get(request.path)
+        if entry is None:
+            return web.Response(status=404, text='not found')
+        status, body, headers = (200, entry, {}) if isinstance(entry, str) else entry
+        headers = {'Content-Type': 'text/html; charset=utf-8', **headers}
+        return web.Response(status=status, body=body.encode('utf-8'), headers=headers)
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', page)
+    return app
+
+
+def links_to(*paths):
+    return ''.join(f'<a href="{path}">{path}</a>' for path in paths)
+
+
+class PageSpeedClientTests(SimpleTestCase):
+    """fetch_all() against a local PageSpeed stand-in; the cache is off so every call reaches it."""
+
+    def pagespeed_settings(self, api_url):
+        return self.settings(
+            PAGESPEED_API_URL=api_url, PAGESPEED_CACHE_ENABLED=False, PAGESPEED_MAX_RETRIES=2,
+            PAGESPEED_BACKOFF_BASE_SECONDS=0.01, PAGESPEED_BACKOFF_MAX_SECONDS=0.01,
+        )
+
+    async def test_fetch_all_returns_recorded_payloads(self):
+        url = 'https://stub.example/recorded'
+        with tempfile.TemporaryDirectory() as fixtures:
+            with open(os.path.join(fixtures, fixture_name(url, 'mobile')), 'w') as f:
+                json.dump(RECORDED, f)
+            app = PageSpeedStub().build_app({'fixtures': fixtures, 'record': False, 'latency': 0, 'fail_rate': 0})
+            async with serve(app) as api_url:
+                with self.pagespeed_settings(api_url):
+                    results = await fetch_all([url], force_fresh=True)
+
+        self.assertEqual(list(results), [url])
+        self.assertEqual(set(results[url]), {'mobile', 'desktop'})
+        mobile = results[url]['mobile']
+        self.assertEqual(mobile['loadingExperience'], RECORDED['loadingExperience'])
+        self.assertEqual(mobile['analysisUTCTimestamp'], RECORDED['analysisUTCTimestamp'])
+        self.assertEqual(mobile['lighthouseResult']['audits']['metrics']['details']['items'], [{"firstContentfulPaint": 1234}])
+        # Screenshots are dropped while streaming
+        self.assertNotIn('fullPageScreenshot', mobile['lighthouseResult'])
+        self.assertNotIn('details', mobile['lighthouseResult']['audits']['final-screenshot'])
+        # No recording for desktop, the stub answers with a synthetic payload
+        self.assertIn('metrics', results[url]['desktop']['loadingExperience'])
+
+    async def test_retries_503_and_429(self):
+        calls = []
+        async with serve(scripted_app([503, 429], calls)) as api_url:
+            with self.pagespeed_settings(api_url):
+                results = await fetch_all(['https://stub.example/flaky'], strategies=('mobile',), force_fresh=True)
+        self.assertEqual(calls, ['mobile'] * 3)
+        self.assertEqual(results['https://stub.example/flaky']['mobile']['loadingExperience'], RECORDED['loadingExperience'])
+
+    async def test_gives_up_after_max_retries(self):
+        calls = []
+        async with serve(scripted_app([503] * 5, calls)) as api_url:
+            with self.pagespeed_settings(api_url):
+                results = await fetch_all(['https://stub.example/down'], strategies=('mobile',), force_fresh=True)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(results, {'https://stub.example/down': {'mobile': {}}})
+
+    async def test_400_is_not_retried(self):
+        calls = []
+        async with serve(scripted_app([400], calls)) as api_url:
+            with self.pagespeed_settings(api_url):
+                results = await fetch_all(['https://stub.example/bad'], strategies=('mobile',), force_fresh=True)
+        self.assertEqual(calls, ['mobile'])
+        self.assertEqual(results, {'https://stub.example/bad': {'mobile': {}}})
+
+
+def pruned(payload: dict) -> dict:
+    """What PageSpeedExtractor should keep of a decoded payload, computed the slow way."""
+    expected = {}
+    for key in ROOT_FIELDS:
+        if key in payload and not isinstance(payload[key], (dict, list)):
+            expected[key] = payload[key]
+    loading = payload.get('loadingExperience')
+    if isinstance(loading, dict) and isinstance(loading.get('metrics'), (dict, list)):
+        expected['loadingExperience'] = {'metrics': loading['metrics']}
+    result = payload.get('lighthouseResult')
+    audits = result.get('audits') if isinstance(result, dict) else None
+    if isinstance(audits, dict):
+        kept = {}
+        for name, audit in audits.items():
+            if not isinstance(audit, dict):
+                continue
+            fields = {field: audit[field] for field in AUDIT_FIELDS
+                      if field in audit and not isinstance(audit[field], (dict, list))}
+            details = audit.get('details')
+            if name == 'metrics' and isinstance(details, dict) and isinstance(details.get('items'), (dict, list)):
+                fields['details'] = {'items': details['items']}
+            if fields:
+                kept[name] = fields
+        if kept:
+            expected['lighthouseResult'] = {'audits': kept}
+    return expected
+
+
+# Characters that upset a hand-written scanner: JSON syntax inside strings, escapes,
+# a BMP character and one outside it (a surrogate pair once escaped)
+TRICKY = ['"', '\\', '/', '{', '}', '[', ']', ':', ',', '\n', '\t', '\u00e9', '\u2028', '\U0001F600', 'a', ' ']
+
+
+def random_text(rng, length=None):
+    return ''.join(rng.choice(TRICKY) for _ in range(rng.randint(0, 12) if length is None else length))
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(7 if depth < 3 else 5)
+    if kind == 0:
+        return random_text(rng)
+    if kind == 1:
+        return rng.choice([0, -1, 3.5, 1e-7, -2.5e21, 12345678901234567890])
+    if kind == 2:
+        return rng.choice([True, False, None])
+    if kind == 3:
+        return 'data:image/jpeg;base64,' + 'QUJD' * rng.randint(1, 200)
+    if kind == 4:
+        return rng.random()
+    if kind == 5:
+        return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    return {random_text(rng): random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+
+
+def random_payload(rng) -> dict:
+    audits = {}
+    for n in range(rng.randint(0, 6)):
+        audit = {field: random_value(rng) for field in AUDIT_FIELDS if rng.random() < 0.8}
+        audit['details'] = random_value(rng)
+        audits[random_text(rng) or f"audit-{n}"] = audit
+    audits['metrics'] = {
+        'title': random_text(rng), 'score': None,
+        'details': {'type': 'debugdata', 'items': [{'firstContentfulPaint': rng.randint(0, 9000), 'note': random_text(rng)}]},
+    }
+    return {
+        'id': random_text(rng),
+        'analysisUTCTimestamp': random_value(rng),
+        'loadingExperience': {'id': random_text(rng), 'metrics': random_value(rng, 1)},
+        'lighthouseResult': {
+            'audits': audits,
+            'fullPageScreenshot': {'screenshot': {'data': random_value(rng)}},
+            'i18n': random_value(rng, 1),
+        },
+    }
+
+
+class PageSpeedExtractorTests(SimpleTestCase):
+    """The streaming extractor against json.loads plus a plain-Python pruning."""
+
+    CHUNK_SIZES = (1, 2, 3, 5, 7, 64, 1000, 64 * 1024)
+
+    def assertExtracts(self, data: bytes, chunk_sizes=CHUNK_SIZES):
+        expected = pruned(json.loads(data))
+        for chunk_size in chunk_sizes:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(extract_pagespeed(data, chunk_size), expected)
+
+    def test_recorded_shapes(self):
+        for payload in (RECORDED, synthetic_payload('https://stub.example/', 'mobile')):
+            self.assertExtracts(json.dumps(payload).encode())
+            self.assertExtracts(json.dumps(payload, indent=2).encode())
+        self.assertExtracts(build_payload(200 * 1024), chunk_sizes=(1, 4096, 64 * 1024))
+
+    def test_escapes_at_every_chunk_boundary(self):
+        tricky = 'quote " backslash \\ tail\\\\ slash / brace } bracket ] colon : comma , newline \n'
+        payload = {
+            tricky: tricky,
+            'analysisUTCTimestamp': tricky + '\\',
+            'lighthouseResult': {'audits': {
+                tricky: {'title': tricky, 'description': '\\', 'score': 1, 'details': {tricky: [tricky, '\\"']}},
+                'metrics': {'details': {'items': [{tricky: tricky}], tricky: '\\'}},
+            }},
+        }
+        self.assertExtracts(json.dumps(payload).encode(), chunk_sizes=range(1, 12))
+
+    def test_surrogate_pairs_and_multibyte_utf8(self):
+        text = 'emoji \U0001F600 accent \u00e9 cjk \u4e2d line sep \u2028'
+        payload = {
+            'analysisUTCTimestamp': text,
+            'loadingExperience': {'metrics': {text: text}},
+            'lighthouseResult': {'audits': {text: {'title': text, 'details': {'skipped': text}}}},
+        }
+        # Escaped as \ud83d\ude00 ...
+        self.assertExtracts(json.dumps(payload).encode(), chunk_sizes=range(1, 14))
+        # ... and as raw UTF-8, so chunks split multi-byte characters
+        self.assertExtracts(json.dumps(payload, ensure_ascii=False).encode('utf-8'), chunk_sizes=range(1, 14))
+
+    def test_random_payloads(self):
+        rng = random.Random(24)
+        for n in range(150):
+            payload = random_payload(rng)
+            data = json.dumps(payload, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1])).encode('utf-8')
+            with self.subTest(payload=n):
+                self.assertExtracts(data, chunk_sizes=(rng.randint(1, 9), rng.randint(10, 300), 64 * 1024))
+
+    def test_truncated_input_raises(self):
+        data = json.dumps(
+            {'analysisUTCTimestamp': 'x\U0001F600', 'loadingExperience': {'metrics': {'A': [1, 2]}},
+             'lighthouseResult': {'audits': {'a': {'title': 'T\\"', 'score': 0.5, 'details': {'d': 'z'}}}}},
+            ensure_ascii=False,
+        ).encode('utf-8')
+        for cut in range(1, len(data)):
+            for chunk_size in (1, 5, 64 * 1024):
+                with self.subTest(cut=cut, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        extract_pagespeed(data[:cut], chunk_size)
+
+
+class MetricHistoryDownsampleTests(TestCase):
+    """downsample() must not lose samples when daily means meet."""
+
+    def sample(self, value, days_ago, source='pagespeed', bucket_seconds=0, samples=1, hour=12):
+        day = (timezone.now() - timedelta(days=days_ago)).replace(hour=hour, minute=0, second=0, microsecond=0)
+        if bucket_seconds:
+            day = day.replace(hour=0)
+        return PerformanceMetricSample.objects.create(
+            url_key='k', strategy='mobile', metric='lcp', value=value, source=source,
+            measured_at=day, bucket_seconds=bucket_seconds, samples=samples,
+        )
+
+    def daily(self):
+        return sorted(
+            PerformanceMetricSample.objects.filter(bucket_seconds=DAY_SECONDS).values_list('source', 'value', 'samples')
+        )
+
+    def test_sources_of_one_day_keep_their_own_means(self):
+        self.sample(1000, 40, 'pagespeed', hour=9)
+        self.sample(3000, 40, 'pagespeed', hour=15)
+        self.sample(5000, 40, 'local')
+        result = downsample(raw_days=30, retention_days=365)
+        self.assertEqual(result, {"folded": 3, "daily_rows": 2, "expired": 0})
+        self.assertEqual(self.daily(), [('local', 5000.0, 1), ('pagespeed', 2000.0, 2)])
+        self.assertFalse(PerformanceMetricSample.objects.filter(bucket_seconds=0).exists())
+
+    def test_late_samples_merge_into_an_existing_daily_mean(self):
+        self.sample(1000, 40, bucket_seconds=DAY_SECONDS, samples=3)
+        self.sample(2000, 40)
+        downsample(raw_days=30, retention_days=365)
+        self.assertEqual(self.daily(), [('pagespeed', 1250.0, 4)])
+        # Nothing left to fold
+        self.assertEqual(downsample(raw_days=30, retention_days=365), {"folded": 0, "daily_rows": 0, "expired": 0})
+        self.assertEqual(self.daily(), [('pagespeed', 1250.0, 4)])
+
+    def test_recent_samples_stay_raw_and_expired_rows_go(self):
+        recent = self.sample(1000, 2)
+        self.sample(2000, 400)
+        self.sample(3000, 400, bucket_seconds=DAY_SECONDS, samples=5)
+        result = downsample(raw_days=30, retention_days=365)
+        self.assertEqual(result, {"folded": 0, "daily_rows": 0, "expired": 2})
+        self.assertEqual(list(PerformanceMetricSample.objects.values_list('id', flat=True)), [recent.id])
+
+
+class PageSpeedSiteTests(TestCase):
+    """The URLs a Lighthouse report covered are reused for the PageSpeed TTL only."""
+
+    def setUp(self):
+        self.store = PageSpeedStore(ttl_seconds=600, stale_seconds=3600, max_bytes=1 << 20)
+
+    def test_urls_are_reused_within_the_ttl(self):
+        self.assertIsNone(self.store.site_urls('https://example.com/'))
+        self.store.put_site_urls('https://example.com/', ['https://example.com/a'])
+        self.store.put_site_urls('https://example.com', ['https://example.com/b'])
+        self.assertEqual(self.store.site_urls('https://EXAMPLE.com/'), ['https://example.com/b'])
+
+    def test_expired_urls_are_not_served_and_purged(self):
+        self.store.put_site_urls('https://example.com/', ['https://example.com/a'])
+        PageSpeedSite.objects.update(fetched_at=timezone.now() - timedelta(seconds=601))
+        self.assertIsNone(self.store.site_urls('https://example.com/'))
+        self.assertEqual(self.store.purge(), 1)
+        self.assertFalse(PageSpeedSite.objects.exists())
+
+
+MALFORMED = '<a href="/kept">kept</a><![foo bar]><a href="/lost">lost</a>'
+
+
+@override_settings(LINK_HEALTH_CACHE_ENABLED=False)
+class MalformedHtmlTests(SimpleTestCase):
+    """HTML that HTMLParser gives up on fails its page only, not the crawl."""
+
+    def test_streaming_page_keeps_the_anchors_before_the_error(self):
+        page = StreamingPage('https://example.com/')
+        self.assertFalse(page.feed(MALFORMED.encode('utf-8')))
+        anchors = page.close()
+        self.assertTrue(page.failed)
+        self.assertEqual([anchor.href for anchor in anchors], ['https://example.com/kept'])
+
+    async def test_crawl_survives_a_malformed_page(self):
+        pages = {'/': links_to('/bad', '/good'), '/bad': MALFORMED, '/good': links_to('/deep'), '/deep': 'ok', '/kept': 'ok'}
+        async with serve(site_app(pages), path='/') as start_url:
+            result = await crawl_site(start_url, max_depth=2, concurrency=2, time_budget=10)
+        found = sorted(link.url.rsplit('/', 1)[1] for link in result.links)
+        self.assertEqual(found, ['bad', 'deep', 'good', 'kept'])
+        self.assertEqual(result.stats.pages_failed, 1)
+        self.assertEqual(result.stats.pages_fetched, 5)
+
+
+@override_settings(JOB_LEASE_SECONDS=60, JOB_MAX_ATTEMPTS=2)
+class JobLeaseTests(TestCase):
+    """Claiming, lease expiry and the outcome of queued jobs."""
+
+    def setUp(self):
+        self.job = AnalysisJob.objects.create(kind=AnalysisJob.KIND_LOAD_TESTS, payload={'url': 'https://example.com/'})
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def expire_lease(self):
+        AnalysisJob.objects.filter(pk=self.job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def run_with(self, runner, job):
+        with override_settings(WORKSPACE_ROOT=self.root), \
+                mock.patch('core.jobs._job_runners', return_value={job.kind: runner}):
+            run_job(job, job.lease_owner)
+        return AnalysisJob.objects.get(pk=job.pk)
+
+    def test_a_leased_job_is_claimed_once(self):
+        job = claim_next_job('a')
+        self.assertEqual((job.job_id, job.lease_owner, job.attempts), (self.job.job_id, 'a', 1))
+        self.assertIsNone(claim_next_job('b'))
+
+    def test_an_expired_lease_is_reclaimed_and_the_old_owner_cannot_finish(self):
+        claim_next_job('a')
+        self.expire_lease()
+        job = claim_next_job('b')
+        self.assertEqual((job.lease_owner, job.attempts), ('b', 2))
+        stale = AnalysisJob.objects.get(pk=job.pk)
+        stale.lease_owner = 'a'
+        self.run_with(lambda **kwargs: asyncio.sleep(0), stale)
+        self.assertEqual(AnalysisJob.objects.get(pk=job.pk).status, AnalysisJob.STATUS_RUNNING)
+
+    def test_too_many_expired_leases_fail_the_job(self):
+        claim_next_job('a')
+        self.expire_lease()
+        claim_next_job('b')
+        self.expire_lease()
+        self.assertIsNone(claim_next_job('c'))
+        job = AnalysisJob.objects.get(pk=self.job.pk)
+        self.assertEqual((job.status, job.attempts), (AnalysisJob.STATUS_FAILED, 3))
+        self.assertIn('expired', job.error)
+
+    def test_a_runner_error_fails_the_job(self):
+        async def runner(target_url, workspace, raise_errors):
+            self.assertTrue(raise_errors)
+            raise RuntimeError('capture failed')
+        job = self.run_with(runner, claim_next_job('a'))
+        self.assertEqual((job.status, job.error), (AnalysisJob.STATUS_FAILED, 'capture failed'))
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_each_attempt_has_its_own_workspace(self):
+        claim_next_job('a')
+        os.makedirs(os.path.join(self.root, f"{self.job.job_id}-1", 'reports'))
+        self.expire_lease()
+        job = claim_next_job('b')
+        job = self.run_with(lambda **kwargs: asyncio.sleep(0), job)
+        self.assertEqual(job.status, AnalysisJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.result_path, os.path.join(self.root, f"{self.job.job_id}-2", 'reports'))
+        self.assertEqual(os.listdir(self.root), [f"{self.job.job_id}-2"])
+
+
+class FakeDriver:
+    """Just enough WebDriver for PooledDriver.reset(); the JS heap depends on the loaded page."""
+
+    def __init__(self, heap_mb):
+        self.heap_mb = heap_mb
+        self.current_url = 'about:blank'
+        self.window_handles = ['main']
+        self.switch_to = mock.Mock()
+        self.quit = mock.Mock()
+
+    def get(self, url):
+        self.current_url = url
+
+    def execute_cdp_cmd(self, cmd, params):
+        if cmd != 'Performance.getMetrics':
+            return {}
+        used = 1 if self.current_url == 'about:blank' else self.heap_mb
+        return {'metrics': [{'name': 'JSHeapUsedSize', 'value': used * 1024 * 1024}]}
+
+    def execute_script(self, script):
+        return None
+
+    def delete_all_cookies(self):
+        pass
+
+
+class DriverPoolHeapTests(SimpleTestCase):
+    def release_after_visit(self, heap_mb):
+        pool = DriverPool(size=1, max_uses=10, max_heap_growth_mb=100, lease_timeout=1)
+        pooled = PooledDriver(FakeDriver(heap_mb))
+        pooled.baseline_heap_mb = pooled.js_heap_mb()
+        pool._total = 1
+        pooled.driver.get('https://example.com/')
+        pool.release(pooled)
+        return pool, pooled
+
+    def test_heap_is_measured_before_reset(self):
+        pool, pooled = self.release_after_visit(500)
+        pooled.driver.quit.assert_called_once()
+        self.assertEqual((pool._total, len(pool._idle)), (0, 0))
+
+    def test_small_heap_goes_back_to_the_pool(self):
+        pool, pooled = self.release_after_visit(50)
+        self.assertEqual(pooled.driver.current_url, 'about:blank')
+        self.assertEqual((pool._total, len(pool._idle)), (1, 1))
+
+
+@override_settings(PERFORMANCE_METRICS_SOURCE='pagespeed', METRIC_HISTORY_RETENTION_DAYS=365)
+class MetricQueryViewTests(TestCase):
+    """The metric views read one source at a time and reject unusable windows."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(mock.Mock(is_authenticated=True))
+        for hours_ago, pagespeed, local in [(1, 2000, 9000), (2, 1000, 8000)]:
+            for source, value in [('pagespeed', pagespeed), ('local', local)]:
+                PerformanceMetricSample.objects.create(
+                    url_key=url_key('https://example.com/'), strategy='mobile', metric='lcp', value=value,
+                    source=source, measured_at=timezone.now() - timedelta(hours=hours_ago),
+                )
+
+    def get(self, path, **params):
+        return self.client.get(path, {'url': 'https://example.com/', 'metric': 'lcp', **params})
+
+    def test_bad_windows_are_rejected(self):
+        for days in ['nan', 'inf', '-inf', '1e9', '-1', '0', 'soon']:
+            with self.subTest(days=days):
+                self.assertEqual(self.get('/metrics/p75/', days=days).status_code, 400)
+        self.assertEqual(self.get('/metrics/p75/', days='365').status_code, 200)
+
+    def test_queries_default_to_the_configured_source(self):
+        self.assertEqual(self.get('/metrics/p75/').data['p75'], 2000)
+        self.assertEqual(self.get('/metrics/p75/', source='local').data['p75'], 9000)
+        self.assertEqual(self.get('/metrics/latest/').data['runs']['mobile']['metrics'], {'lcp': 2000})
+        delta = self.get('/metrics/delta/', source='local').data['runs']['mobile']['metrics']['lcp']
+        self.assertEqual((delta['latest'], delta['previous'], delta['delta']), (9000, 8000, 1000))
+        self.assertEqual(self.get('/metrics/latest/', source='other').status_code, 404)
+
+
+def api_error(code):
+    return genai_errors.APIError(code, {"error": {"code": code, "message": "scripted"}})
+
+
+class LlmSchedulerTests(SimpleTestCase):
+    """Buckets, lanes, retries and the circuit breaker of the Gemini scheduler."""
+
+    def scheduler(self, **options):
+        options = {'requests_per_minute': 6000, 'tokens_per_minute': 10 ** 9, 'max_retries': 0,
+                   'failure_threshold': 2, 'reset_seconds': 0.2, 'queue_timeout': 5, **options}
+        return LlmScheduler(**options)
+
+    def test_bucket_refills_up_to_its_capacity(self):
+        bucket = TokenBucket(per_minute=60)
+        now = bucket.updated
+        bucket.take(60)
+        self.assertAlmostEqual(bucket.wait_time(1, now), 1.0)
+        self.assertAlmostEqual(bucket.wait_time(1, now + 0.5), 0.5)
+        self.assertEqual(bucket.wait_time(1, now + 120), 0.0)
+        self.assertEqual(bucket.tokens, 60)
+        # Asking for more than a minute's worth waits for a full bucket, not forever
+        self.assertEqual(bucket.wait_time(1000, now + 120), 0.0)
+
+    def test_classify_error(self):
+        self.assertEqual(classify_error(api_error(429)), 'rate_limited')
+        for error in [api_error(503), api_error(500), TimeoutError(), ConnectionError(),
+                      httpx.ConnectError('refused')]:
+            self.assertEqual(classify_error(error), 'failure', error)
+        for error in [api_error(400), api_error(403), ValueError('bad schema')]:
+            self.assertIsNone(classify_error(error), error)
+
+    def test_backoff_is_jittered_and_capped(self):
+        scheduler = self.scheduler(backoff_base=1.0, backoff_max=4.0)
+        random.seed(7)
+        delays = [scheduler.backoff(attempt) for attempt in range(10) for _ in range(20)]
+        self.assertTrue(all(0 <= delay <= 4.0 for delay in delays))
+        self.assertTrue(all(scheduler.backoff(0) <= 1.0 for _ in range(20)))
+        self.assertGreater(len(set(delays)), 100)
+
+    async def test_link_ranking_goes_before_queued_reviews(self):
+        scheduler = self.scheduler(requests_per_minute=600)
+        scheduler._requests.tokens = 0
+        order = []
+
+        async def call(lane, name):
+            async def make_call():
+                order.append(name)
+            await scheduler.call(lane, make_call, tokens=1)
+
+        reviews = [asyncio.create_task(call(IMAGE_REVIEW, f'review {n}')) for n in range(2)]
+        await asyncio.sleep(0)
+        await asyncio.gather(call(LINK_RANKING, 'ranking'), *reviews)
+        self.assertEqual(order, ['ranking', 'review 0', 'review 1'])
+
+    async def test_open_circuit_fails_fast_then_probes_and_closes(self):
+        scheduler = self.scheduler()
+        calls = []
+
+        async def failing():
+            calls.append('failing')
+            raise api_error(503)
+
+        for _ in range(2):
+            with self.assertRaises(genai_errors.APIError):
+                await scheduler.call(LINK_RANKING, failing, tokens=1)
+        # Open: rejected at once, the call is never made
+        with self.assertRaises(LlmUnavailable):
+            await asyncio.wait_for(scheduler.call(LINK_RANKING, failing, tokens=1), 0.1)
+        self.assertEqual(len(calls), 2)
+
+        await asyncio.sleep(0.25)
+        release = asyncio.Event()
+
+        async def probe():
+            calls.append('probe')
+            await release.wait()
+            return None
+
+        probing = asyncio.create_task(scheduler.call(LINK_RANKING, probe, tokens=1))
+        while 'probe' not in calls:
+            await asyncio.sleep(0.01)
+        # Only the probe goes through while it is in flight
+        with self.assertRaises(LlmUnavailable):
+            await asyncio.wait_for(scheduler.call(IMAGE_REVIEW, probe, tokens=1), 0.1)
+        release.set()
+        await probing
+
+        async def ok():
+            calls.append('ok')
+        await scheduler.call(IMAGE_REVIEW, ok, tokens=1)
+        self.assertEqual(calls, ['failing', 'failing', 'probe', 'ok'])
+
+    def test_failed_probe_reopens_the_circuit(self):
+        scheduler = self.scheduler(failure_threshold=1, reset_seconds=0.1)
+
+        def failing():
+            raise api_error(503)
+
+        with self.assertRaises(genai_errors.APIError):
+            scheduler.call_sync(LINK_RANKING, failing, tokens=1)
+        with self.assertRaises(LlmUnavailable):
+            scheduler.call_sync(LINK_RANKING, failing, tokens=1)
+        time.sleep(0.15)
+        with self.assertRaises(genai_errors.APIError):
+            scheduler.call_sync(LINK_RANKING, failing, tokens=1)
+        with self.assertRaises(LlmUnavailable):
+            scheduler.call_sync(LINK_RANKING, failing, tokens=1)
+
+
+class PerformanceReportTests(SimpleTestCase):
+    async def test_download_keeps_the_single_url_layout(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        target = URLModel(url='https://stub.example/recorded')
+        async with serve(scripted_app([], [])) as api_url:
+            with self.settings(PAGESPEED_API_URL=api_url, PAGESPEED_CACHE_ENABLED=False, PERFORMANCE_METRICS_SOURCE='pagespeed'), \
+                    mock.patch('core.lighthouse.lighthouse_metrics.record_report'):
+                path = await performance_metrics(target, JobWorkspace(root=root), urls=['https://stub.example/other'])
+        with open(path) as report_file:
+            report = json.load(report_file)
+        pages = report.pop('pages')
+        self.assertIn('loading_metrics', report)
+        self.assertEqual(report, pages[target.url]['desktop'])
+        self.assertEqual(sorted(pages), ['https://stub.example/other', target.url])
+        self.assertEqual(sorted(pages[target.url]), ['desktop', 'mobile'])
+
+
+def link_app(requests):
+    """Links that behave like real servers: /no-head refuses HEAD, /etag honours If-None-Match."""
+    async def handle(request):
+        requests.append((request.method, request.path))
+        if request.path == '/no-head' and request.method == 'HEAD':
+            return web.Response(status=405)
+        if request.path == '/etag':
+            if request.headers.get('If-None-Match') == '"v1"':
+                return web.Response(status=304, headers={'ETag': '"v1"'})
+            return web.Response(text='page', headers={'ETag': '"v1"'})
+        if request.path == '/gone':
+            return web.Response(status=404)
+        return web.Response(text='page')
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handle)
+    return app
+
+
+@override_settings(LINK_HEALTH_TTL_OK_SECONDS=1000, LINK_HEALTH_TTL_CLIENT_ERROR_SECONDS=100,
+                   LINK_HEALTH_TTL_ERROR_SECONDS=10)
+class LinkHealthTests(TestCase):
+    """Link checks, their cache keys and TTLs."""
+
+    def test_ttl_for(self):
+        for status_code, ttl in [(200, 1000), (301, 100), (404, 100), (410, 100), (429, 10), (500, 10), (503, 10), (-1, 10)]:
+            self.assertEqual(ttl_for(status_code), ttl, status_code)
+
+    def test_entries_are_keyed_by_canonical_url(self):
+        store = LinkHealthStore()
+        store.save([
+            LinkStatus(url='https://Example.com/a/?utm_source=x', status_code=200, is_alive=True, response_time=0.1),
+            LinkStatus(url='https://example.com/a', status_code=404, is_alive=False, response_time=0.1),
+        ])
+        self.assertEqual(LinkHealthCache.objects.count(), 1)
+        entries = store.load(['https://example.com/a?gclid=1', 'https://example.com/a/'])
+        self.assertEqual({url: entry.status_code for url, entry in entries.items()},
+                         {'https://example.com/a?gclid=1': 404, 'https://example.com/a/': 404})
+
+    async def test_refused_head_falls_back_to_get(self):
+        requests = []
+        async with serve(link_app(requests), path='/') as base, new_session() as session:
+            refused = await check_link(session, base + 'no-head')
+            fine = await check_link(session, base + 'fine')
+            gone = await check_link(session, base + 'gone')
+        self.assertEqual((refused.status_code, refused.is_alive), (200, True))
+        self.assertEqual((fine.status_code, gone.status_code, gone.is_alive), (200, 404, False))
+        self.assertEqual(requests, [('HEAD', '/no-head'), ('GET', '/no-head'), ('HEAD', '/fine'), ('HEAD', '/gone')])
+
+    async def test_304_keeps_the_cached_status(self):
+        requests = []
+        async with serve(link_app(requests), path='/') as base, new_session() as session:
+            first = await check_link(session, base + 'etag')
+            cached = LinkHealthCache(status_code=first.status_code, etag=first.etag, last_modified='', response_time=0.1)
+            again = await check_link(session, base + 'etag', cached)
+        self.assertEqual((first.etag, first.cached), ('"v1"', False))
+        self.assertEqual((again.status_code, again.is_alive, again.cached, again.etag), (200, True, True, '"v1"'))
+
+
+@override_settings(LINK_HEALTH_CACHE_ENABLED=False)
+class LinkFilterAndCheckTests(SimpleTestCase):
+    """What reaches a link check, and how checks are spent."""
+
+    def test_filter_anchors_drops_what_needs_no_check(self):
+        hrefs = [
+            '/pricing', '/pricing#plans', '#top', 'mailto:hi@example.com', 'tel:+100', 'JavaScript:void(0)',
+            'https://other.com/x', '//cdn.example.net/app.js', 'ftp://example.com/file',
+            'https://www.example.com/about', 'https://EXAMPLE.com/pricing/', 'docs/start', '  /contact  ', '',
+        ]
+        links = filter_anchors('https://example.com/guide/', [Anchor(href, str(n)) for n, href in enumerate(hrefs)])
+        self.assertEqual([url for url, _ in links], [
+            'https://example.com/pricing', 'https://www.example.com/about',
+            'https://example.com/guide/docs/start', 'https://example.com/contact',
+        ])
+        # The first anchor of a duplicate wins
+        self.assertEqual(links[0][1].text, '0')
+
+    def test_filter_links_uses_the_site_not_the_page_host(self):
+        links = filter_links('https://www.example.com/a', ['/b', 'https://example.com/c', 'https://blog.example.com/d'],
+                             site_url='https://example.com/')
+        self.assertEqual(links, ['https://www.example.com/b', 'https://example.com/c'])
+
+    async def test_check_links_keeps_to_its_budget(self):
+        requests = []
+
+        async def slow(request):
+            requests.append(request.path)
+            if request.path == '/slow':
+                await asyncio.sleep(1)
+            return web.Response(text='page')
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', slow)
+        async with serve(app, path='/') as base, new_session() as session:
+            capped = await check_links(session, [base + 'a', base + 'b', base + 'c'], max_links=2, time_budget=5)
+            timed = await check_links(session, [base + 'fast', base + 'slow'], max_links=10, time_budget=0.3)
+        self.assertEqual([status.url for status in capped], [base + 'a', base + 'b'])
+        self.assertNotIn('/c', requests)
+        self.assertEqual([(status.status_code, status.error) for status in timed], [(200, None), (-1, 'not checked')])
+
+    async def test_crawl_checks_unfetched_links_with_head_only(self):
+        requests = []
+        pages = {'/': links_to('/a', '/big-file', 'mailto:x@example.com', 'https://other.com/'), '/a': 'leaf', '/big-file': 'x' * 10000}
+        async with serve(site_app(pages, requests), path='/') as start_url:
+            result = await crawl_site(start_url, max_depth=0, time_budget=10)
+        self.assertEqual(sorted((method, path) for method, path in requests if path != '/robots.txt'),
+                         [('GET', '/'), ('HEAD', '/a'), ('HEAD', '/big-file')])
+        self.assertEqual(sorted(link.url for link in result.links), [start_url + 'a', start_url + 'big-file'])
+        self.assertTrue(all(link.is_alive for link in result.links))
+
+
+@override_settings(LINK_HEALTH_CACHE_ENABLED=False)
+class CrawlEngineTests(SimpleTestCase):
+    """Canonical URLs, robots.txt and the depth, page and time budgets of crawl_site."""
+
+    def test_canonicalize(self):
+        self.assertEqual(canonicalize('HTTPS://Example.com:443/a/?utm_source=x&b=2&a=1&gclid=z#top'),
+                         'https://example.com/a?a=1&b=2')
+        self.assertEqual(canonicalize('http://example.com:8080'), 'http://example.com:8080/')
+        self.assertNotEqual(canonicalize('https://example.com/a?page=2'), canonicalize('https://example.com/a'))
+
+    def test_visited_set_matches_canonical_variants(self):
+        visited = VisitedSet()
+        self.assertTrue(visited.add('https://example.com/a'))
+        self.assertFalse(visited.add('https://EXAMPLE.com/a/?utm_medium=mail#x'))
+        self.assertIn('https://example.com/a/', visited)
+        self.assertNotIn('https://example.com/b', visited)
+        self.assertEqual(len(visited), 1)
+
+    def test_frontier_prefers_shallow_short_paths(self):
+        urls = ['https://e.com/blog/2019/05/post', 'https://e.com/pricing', 'https://e.com/docs/start']
+        self.assertEqual(sorted(urls, key=lambda url: frontier_priority(1, url))[0], 'https://e.com/pricing')
+        self.assertLess(frontier_priority(1, urls[0]), frontier_priority(2, urls[1]))
+
+    async def crawl(self, pages, requests=None, **budget):
+        async with serve(site_app(pages, requests), path='/') as start_url:
+            result = await crawl_site(start_url, **budget)
+        return start_url, result
+
+    async def test_depth_budget_and_stats(self):
+        pages = {'/': links_to('/a', '/b', '/a#x', '/a?utm_source=feed'), '/a': links_to('/a/deep', '/b'),
+                 '/b': 'leaf', '/a/deep': links_to('/a/deeper'), '/a/deeper': 'leaf'}
+        start_url, result = await self.crawl(pages, max_depth=1, time_budget=10)
+        stats = result.stats
+        self.assertEqual((stats.pages_fetched, stats.max_depth_reached, stats.stopped_by), (3, 1, ''))
+        # /a/deep is reported and checked, but not fetched: it is past max_depth
+        self.assertEqual(sorted(link.url[len(start_url) - 1:] for link in result.links), ['/a', '/a/deep', '/b'])
+        self.assertEqual((stats.links_discovered, stats.links_checked, stats.frontier_left), (3, 1, 0))
+        # /a?utm_source=feed and /a's link back to /b; /a#x is dropped by filter_anchors itself
+        self.assertEqual(stats.duplicates_skipped, 2)
+
+    async def test_page_and_time_budgets_stop_the_crawl(self):
+        pages = {'/': links_to(*(f'/p{n}' for n in range(10)))}
+        pages.update({f'/p{n}': 'leaf' for n in range(10)})
+        _, result = await self.crawl(pages, max_depth=2, max_pages=4, concurrency=1, time_budget=10)
+        self.assertEqual((result.stats.pages_fetched, result.stats.stopped_by, result.stats.frontier_left), (4, 'max_pages', 7))
+        _, result = await self.crawl(pages, max_depth=2, time_budget=0)
+        self.assertEqual((result.stats.pages_fetched, result.stats.stopped_by), (0, 'time_budget'))
+
+    async def test_robots_txt_is_respected(self):
+        pages = {'/': links_to('/public', '/private/a'), '/public': 'ok', '/private/a': 'secret',
+                 '/robots.txt': (200, 'User-agent: *\nDisallow: /private/\nSitemap: https://example.com/sitemap.xml', {'Content-Type': 'text/plain'})}
+        requests = []
+        _, result = await self.crawl(pages, requests, max_depth=2, time_budget=10)
+        self.assertNotIn('/private/a', [path for _, path in requests])
+        self.assertEqual(result.stats.robots_blocked, 1)
+        self.assertEqual(result.sitemaps, ['https://example.com/sitemap.xml'])
+        # 401/403 on robots.txt disallow everything, other errors allow everything
+        pages['/robots.txt'] = (403, 'no', {})
+        _, result = await self.crawl(pages, max_depth=2, time_budget=10)
+        self.assertEqual((result.stats.pages_fetched, result.links), (0, []))
+        pages['/robots.txt'] = (500, 'oops', {})
+        _, result = await self.crawl(pages, max_depth=2, time_budget=10)
+        self.assertEqual(result.stats.pages_fetched, 3)
+
+    async def test_declared_canonical_is_not_fetched_again(self):
+        pages = {'/': links_to('/a'),
+                 '/a': '<link rel="canonical" href="/a-copy">' + links_to('/a-copy'), '/a-copy': 'same page'}
+        requests = []
+        _, result = await self.crawl(pages, requests, max_depth=2, time_budget=10)
+        self.assertEqual(result.stats.canonical_duplicates, 1)
+        self.assertNotIn(('GET', '/a-copy'), requests)
+        self.assertIn(('HEAD', '/a-copy'), requests)
+
+
+class PrerankTests(SimpleTestCase):
+    """Heuristic ordering of crawled links before the LLM sees them."""
+
+    START = 'https://example.com/'
+
+    def rank(self, infos, top_n=25):
+        return prerank([info.url for info in infos], {info.url: info for info in infos}, self.START, top_n=top_n)
+
+    def test_path_template(self):
+        self.assertEqual(path_template('https://example.com/blog/2024/my-first-post'), '/blog/<n>/<slug>')
+        self.assertEqual(path_template('https://example.com/items/deadbeef01/'), '/items/<id>')
+        self.assertEqual(path_template('https://example.com/u/123e4567-e89b-12d3-a456-426614174000'), '/u/<id>')
+        self.assertEqual(path_template('https://example.com/Pricing?plan=pro'), '/pricing')
+        self.assertEqual(path_template('https://example.com/'), '/')
+
+    def test_one_link_per_template_and_top_n(self):
+        infos = [LinkInfo(url=f'https://example.com/blog/post-number-{n}', depth=1) for n in range(5)]
+        infos += [LinkInfo(url='https://example.com/pricing', depth=1), LinkInfo(url='https://example.com/docs', depth=1)]
+        ranked = self.rank(infos)
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(ranked[0], 'https://example.com/pricing')
+        # Ties keep crawl order, so the first post stands for the rest
+        self.assertIn('https://example.com/blog/post-number-0', ranked)
+        self.assertEqual(self.rank(infos, top_n=2), ranked[:2])
+
+    def test_scores(self):
+        infos = [
+            LinkInfo(url='https://example.com/privacy', depth=1, anchor_text='Privacy'),
+            LinkInfo(url='https://example.com/team', depth=1, regions={'footer'}),
+            LinkInfo(url='https://example.com/story', depth=1, regions={'nav'}, inbound=3),
+            LinkInfo(url='https://example.com/', depth=1),
+        ]
+        self.assertEqual(self.rank(infos), ['https://example.com/story', 'https://example.com/team',
+                                            'https://example.com/', 'https://example.com/privacy'])
+        # The start page is analysed anyway, so it ranks below an otherwise equal link
+        self.assertEqual(self.rank([LinkInfo(url=self.START, depth=1), LinkInfo(url='https://example.com/x', depth=1)])[0],
+                         'https://example.com/x')
@@ -1,17 +1,25 @@
 from django.urls import path
 from .views import (
     HealthCheckView, 
+    StatsView,
     GreetingView,
     WebsitesPerformanceView,
     CaptureScreenshotsView,
     LighthouseTestView,
     LoadTestsView,
     GenerateValidLinksView,
-    ImageReview
+    ImageReview,
+    JobSubmitView,
+    JobStatusView,
+    JobResultView,
+    MetricLatestView,
+    MetricP75View,
+    MetricDeltaView,
 )
 
 urlpatterns = [
     path('health/', HealthCheckView.as_view(), name='health-check'),
+    path('stats/', StatsView.as_view(), name='stats'),
     path('', GreetingView.as_view(), name='greeting'),
     path('websites_performance/', WebsitesPerformanceView.as_view(), name='test-websites-performance'),
     path('capture_screenshots_websites/', CaptureScreenshotsView.as_view(), name='capture-screenshots'),
@@ -19,4 +27,10 @@ urlpatterns = [
     path('load_tests/', LoadTestsView.as_view(), name='load-tests'),
     path('generate_valid_links/', GenerateValidLinksView.as_view(), name='generate-valid-links'),
     path('image_review/', ImageReview.as_view(), name='image_review'),
+    path('metrics/latest/', MetricLatestView.as_view(), name='metric-latest'),
+    path('metrics/p75/', MetricP75View.as_view(), name='metric-p75'),
+    path('metrics/delta/', MetricDeltaView.as_view(), name='metric-delta'),
+    path('jobs/<uuid:job_id>/', JobStatusView.as_view(), name='job-status'),
+    path('jobs/<uuid:job_id>/result/', JobResultView.as_view(), name='job-result'),
+    path('jobs/<str:kind>/', JobSubmitView.as_view(), name='job-submit'),
 ]
\ No newline at end of file
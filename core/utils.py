@@ -1,10 +1,19 @@
 import re
+import functools
+import hashlib
+import struct
+import time
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Iterator
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 import os
 
+from django.db import close_old_connections
+
 # Create a valid filename from a URL
 def sanitize_filename(url):
     """Sanitize URL into a valid filename."""
@@ -13,6 +22,67 @@ def sanitize_filename(url):
     return filename.strip('_')  # Remove trailing underscores
 
 
+# Canonical form of a URL for cache keys
+def normalize_url(url: str) -> str:
+    """Lowercase scheme and host, drop default ports, fragments and the trailing slash, sort the query.
+
+    `HTTPS://Example.com:443/a/?b=2&a=1#top` and `https://example.com/a?a=1&b=2` normalize alike.
+    """
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower() or 'http'
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid', 'mc_eid', 'ref_src')
+
+
+def canonicalize(url: str) -> str:
+    """normalize_url() minus tracking parameters, so `?utm_source=x` variants are one page."""
+    parts = urlsplit(normalize_url(url))
+    query = urlencode([
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMS)
+    ])
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+
+# Close the thread's DB connection after an ORM helper run with asyncio.to_thread
+def closes_db_connection(fn):
+    """Wrap `fn` so the calling thread's DB connection is closed once it returns.
+
+    Executor threads never see request_finished, so without this every job's threads
+    keep their connections open until they are garbage collected.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return wrapper
+
+
+# Create a collision-free artifact filename for a URL
+def url_artifact_name(url: str, prefix: Optional[str] = None, extension: Optional[str] = None, max_length: int = 80):
+    """Build a filename from the URL host and path plus a short hash of the full URL.
+
+    Two pages of the same site (or the same path with a different query) get different names.
+    """
+    readable = sanitize_filename(str(url).split('//', 1)[-1])[:max_length]
+    digest = hashlib.sha1(str(url).encode('utf-8')).hexdigest()[:10]
+    name = f"{readable}_{digest}"
+    if prefix:
+        name = f"{prefix}_{name}"
+    if extension:
+        name = f"{name}.{extension.lstrip('.')}"
+    return name
+
+
 # Create zipfile
 def zip_file(main_dir: Optional[str] = 'reports', output_zip:Optional[str] = 'reports.zip'):
     try:
@@ -35,3 +105,151 @@ def zip_file(main_dir: Optional[str] = 'reports', output_zip:Optional[str] = 're
                 pass
         return None
 
+
+
+# Already-compressed artifacts gain nothing from deflate, so they are stored as-is
+STORED_EXTENSIONS = {'.png', '.webp', '.jpg', '.jpeg', '.gif', '.zip', '.gz'}
+# Small text artifacts are deflated ahead of time on a thread pool (zlib releases the GIL)
+PARALLEL_DEFLATE_EXTENSIONS = {'.json', '.jsonl'}
+ZIP_CHUNK_SIZE = 64 * 1024
+_ZIP_VERSION = 20
+_ZIP_FLAG_DATA_DESCRIPTOR = 0x08
+_ZIP_FLAG_UTF8 = 0x800
+_ZIP_MAX_OFFSET = 0xFFFFFFFF
+
+
+def _dos_datetime(timestamp: float):
+    t = time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def _read_chunks(file_path: str, chunk_size: int = ZIP_CHUNK_SIZE) -> Iterator[bytes]:
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _crc_file(file_path: str):
+    crc, size = 0, 0
+    for chunk in _read_chunks(file_path):
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+    return crc, size
+
+
+def _deflate_file(file_path: str):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    crc, size, parts = 0, 0, []
+    for chunk in _read_chunks(file_path):
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    return crc, size, b''.join(parts)
+
+
+def stream_zip(main_dir: Optional[str] = 'reports', parallel_deflate: bool = True, max_workers: int = 4) -> Iterator[bytes]:
+    """Yield a ZIP archive of `main_dir` chunk by chunk, without building it on disk.
+
+    PNG/WebP/JPEG are STORED (CRC computed in a first pass, so their headers carry real
+    sizes). JSON is deflated on a thread pool ahead of time when `parallel_deflate` is set;
+    anything else is deflated while streaming, with a trailing data descriptor.
+    Archive paths match zip_file(): relative to the parent of `main_dir`.
+    Archives above 4 GiB or 65535 entries (ZIP64) are not supported.
+    """
+    entries = []
+    for root, dirs, files in os.walk(main_dir):
+        dirs.sort()
+        for file in sorted(files):
+            file_path = os.path.join(root, file)
+            arcname = os.path.relpath(file_path, start=os.path.dirname(main_dir)).replace(os.sep, '/')
+            entries.append((file_path, arcname, os.path.splitext(file)[1].lower()))
+
+    executor = None
+    precompressed = {}
+    if parallel_deflate:
+        jobs = [entry for entry in entries if entry[2] in PARALLEL_DEFLATE_EXTENSIONS]
+        if jobs:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            precompressed = {file_path: executor.submit(_deflate_file, file_path) for file_path, _, _ in jobs}
+
+    central_directory = []
+    offset = 0
+    try:
+        for file_path, arcname, extension in entries:
+            stat = os.stat(file_path)
+            dos_time, dos_date = _dos_datetime(stat.st_mtime)
+            name = arcname.encode('utf-8')
+            flags = 0 if name.isascii() else _ZIP_FLAG_UTF8
+
+            if extension in STORED_EXTENSIONS:
+                method = zipfile.ZIP_STORED
+                crc, size = _crc_file(file_path)
+                compressed_size = size
+                body = _read_chunks(file_path)
+            elif file_path in precompressed:
+                method = zipfile.ZIP_DEFLATED
+                crc, size, data = precompressed.pop(file_path).result()
+                compressed_size = len(data)
+                body = iter((data,))
+            else:
+                method = zipfile.ZIP_DEFLATED
+                flags |= _ZIP_FLAG_DATA_DESCRIPTOR
+                crc, size, compressed_size = 0, 0, 0
+                body = None
+
+            header = struct.pack(
+                '<IHHHHHIIIHH', 0x04034b50, _ZIP_VERSION, flags, method, dos_time, dos_date,
+                crc, compressed_size, size, len(name), 0,
+            ) + name
+            local_header_offset = offset
+            yield header
+            offset += len(header)
+
+            if body is not None:
+                for chunk in body:
+                    yield chunk
+                    offset += len(chunk)
+            else:
+                # Size is unknown until the file is read: deflate on the fly, then write a data descriptor
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+                for chunk in _read_chunks(file_path):
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+                    data = compressor.compress(chunk)
+                    if data:
+                        yield data
+                        compressed_size += len(data)
+                data = compressor.flush()
+                yield data
+                compressed_size += len(data)
+                descriptor = struct.pack('<IIII', 0x08074b50, crc, compressed_size, size)
+                yield descriptor
+                offset += compressed_size + len(descriptor)
+
+            if offset > _ZIP_MAX_OFFSET or size > _ZIP_MAX_OFFSET:
+                raise ValueError("Archive exceeds 4 GiB, ZIP64 is not supported by stream_zip")
+            central_directory.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | _ZIP_VERSION, _ZIP_VERSION, flags, method,
+                dos_time, dos_date, crc, compressed_size, size, len(name), 0, 0, 0, 0,
+                (stat.st_mode & 0xFFFF) << 16, local_header_offset,
+            ) + name)
+
+        if len(central_directory) > 0xFFFF:
+            raise ValueError("Archive has too many entries, ZIP64 is not supported by stream_zip")
+        central_directory_data = b''.join(central_directory)
+        yield central_directory_data
+        yield struct.pack(
+            '<IHHHHIIH', 0x06054b50, 0, 0, len(central_directory), len(central_directory),
+            len(central_directory_data), offset, 0,
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
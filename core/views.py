@@ -1,6 +1,8 @@
 # from gevent import monkey
 # monkey.patch_all()
-from django.http import FileResponse
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
 import os
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -10,18 +12,28 @@ from typing import Optional
 from core.suss_file import generate_valid_links, capture_screenshots_for_urls, performance_metrics, main
 from core.pydantic_model import URLModel
 from core.load_test import load_test_main
-from core.utils import zip_file
+from core.utils import stream_zip
+from core.models import AnalysisJob
+from core.jobs import submit_job, ensure_workers_started
+from core.serializers import AnalysisJobSerializer
+from core.workspace import JobWorkspace
+from core import metrics
+from core.llm.config import run_async
+from core.llm.review_cache import review_cache_stats
+from core.lighthouse.pagespeed_cache import get_pagespeed_store
+from core import metric_history
 import asyncio
-import shutil
 import json
+import math
 
 # authentication and permision classes
 from rest_framework.permissions import AllowAny
 
-# Custom FileResponse to delete the file after sending
+# Custom FileResponse to delete the file (and its job workspace) after sending
 class DeleteOnCloseFileResponse(FileResponse):
     def __init__(self, *args, **kwargs):
         self._file_to_delete = kwargs.pop('file_to_delete', None)
+        self._workspace = kwargs.pop('workspace', None)
         super().__init__(*args, **kwargs)
 
     def close(self):
@@ -31,12 +43,36 @@ class DeleteOnCloseFileResponse(FileResponse):
                 os.remove(self._file_to_delete)
             except Exception as e:
                 print(f"Error deleting file on close: {e}")
+        if self._workspace is not None:
+            self._workspace.cleanup()
+
+
+def workspace_zip_response(reports_dir, filename='reports.zip', workspace=None):
+    """Stream `reports_dir` as a ZIP; the job workspace (if given) is deleted once streaming ends."""
+    def archive():
+        try:
+            yield from stream_zip(main_dir=reports_dir)
+        finally:
+            if workspace is not None:
+                workspace.cleanup()
+
+    response = StreamingHttpResponse(archive(), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 class HealthCheckView(APIView):
     def get(self, request):
         return Response({"message": "Server is running Health Check"})
 
+class StatsView(APIView):
+    """Process-wide counters (cache hits/misses, queue depths, ...)."""
+    def get(self, request):
+        return Response({
+            **metrics.snapshot(),
+            "llm_review_cache": review_cache_stats(),
+        })
+
 class GreetingView(APIView):
     permission_classes = [AllowAny]
     authentication_classes = []
@@ -45,6 +81,7 @@ class GreetingView(APIView):
 
 class WebsitesPerformanceView(APIView):
     def post(self, request):
+        workspace = None
         try:
             if not request.body:
                 return Response(
@@ -55,27 +92,18 @@ class WebsitesPerformanceView(APIView):
             json_data = json.loads(request.body)
             target_url = URLModel(**json_data)
             print("Running Main file")
-            asyncio.run(main(target_url=target_url))
-            filename = zip_file()
-            file_obj = open(filename, 'rb')
-            response = DeleteOnCloseFileResponse(
-                file_obj,
-                as_attachment=True,
-                filename=os.path.basename(filename),
-                file_to_delete=filename
-            )
-            return response
+            workspace = JobWorkspace()
+            run_async(main(target_url=target_url, workspace=workspace))
+            return workspace_zip_response(workspace.reports_dir, workspace=workspace)
             
         except Exception as e:
+            # The response owns the workspace once it is created, so only clean up on failure
+            if workspace is not None:
+                workspace.cleanup()
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        finally:
-            # Clean up the reports directory
-            if os.path.exists("reports"):
-                shutil.rmtree("reports")
-                print("Deleted reports directory")
 
 class CaptureScreenshotsView(APIView):
     permission_classes = [AllowAny]
@@ -91,31 +119,21 @@ class CaptureScreenshotsView(APIView):
         
         target_url = URLModel(**json_data)
         
+        workspace = JobWorkspace()
         try:
-            asyncio.run(capture_screenshots_for_urls(target_url=target_url))
-            filename = zip_file()
-            file_obj = open(filename, 'rb')
-            response = DeleteOnCloseFileResponse(
-                file_obj,
-                as_attachment=True,
-                filename=os.path.basename(filename),
-                file_to_delete=filename
-            )
-            return response
+            run_async(capture_screenshots_for_urls(target_url=target_url, workspace=workspace))
+            return workspace_zip_response(workspace.reports_dir, workspace=workspace)
 
         except Exception as e:
+            workspace.cleanup()
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        finally:
-            # Clean up the reports directory
-            if os.path.exists("reports"):
-                shutil.rmtree("reports")
-                print("Deleted reports directory")
 
 class LighthouseTestView(APIView):
     def post(self, request):
+        workspace = None
         try:
             if not request.body:
                 return Response(
@@ -125,17 +143,27 @@ class LighthouseTestView(APIView):
             json_data = json.loads(request.body)
             target_url = URLModel(**json_data)
             
-            file_path = asyncio.run(performance_metrics(target_url=target_url))
+            workspace = JobWorkspace()
+            # A target measured within the PageSpeed TTL reuses its URLs, so its cached runs skip the crawl
+            store = get_pagespeed_store()
+            urls = store.site_urls(target_url.url) if store and not target_url.force_fresh else None
+            if urls is None:
+                urls = generate_valid_links(target_url.url, force_fresh=bool(target_url.force_fresh))
+                if store and urls:
+                    store.put_site_urls(target_url.url, urls)
+            file_path = asyncio.run(performance_metrics(target_url=target_url, workspace=workspace, urls=urls))
             # Return the JSON file as a downloadable response
             file_obj = open(file_path, 'rb')
             response = DeleteOnCloseFileResponse(
                 file_obj,
                 as_attachment=True,
                 filename=os.path.basename(file_path),
-                file_to_delete=file_path
+                workspace=workspace
             )
             return response
         except Exception as e:
+            if workspace is not None:
+                workspace.cleanup()
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -144,6 +172,7 @@ class LighthouseTestView(APIView):
 
 class LoadTestsView(APIView):
     def post(self, request):
+        workspace = None
         try:
             if not request.body:
                 return Response(
@@ -156,17 +185,12 @@ class LoadTestsView(APIView):
             # Validate JSON with Pydantic
             target_url = URLModel(**json_data)
 
-            asyncio.run(load_test_main(target_url=target_url))  # ✅ Run async function synchronously
+            workspace = JobWorkspace()
+            asyncio.run(load_test_main(target_url=target_url, workspace=workspace))  # ✅ Run async function synchronously
 
-            filename = zip_file()
-            # Create response with auto-cleanup
-            file_obj = open(filename, 'rb')
-            response = DeleteOnCloseFileResponse(
-                file_obj,
-                as_attachment=True,
-                filename=os.path.basename(filename),
-                file_to_delete=filename
-            )
+            # Stream the archive; the response cleans up the job workspace when done
+            response = workspace_zip_response(workspace.reports_dir, workspace=workspace)
+            workspace = None
             return response
 
         except json.JSONDecodeError:
@@ -185,10 +209,9 @@ class LoadTestsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         finally:
-            # Clean up the reports directory
-            if os.path.exists("reports"):
-                shutil.rmtree("reports")
-                print("Deleted reports directory")
+            # The response cleans up the workspace once sent; otherwise drop it here
+            if workspace is not None:
+                workspace.cleanup()
 
 
 class GenerateValidLinksView(APIView):
@@ -202,7 +225,7 @@ class GenerateValidLinksView(APIView):
 
             json_data = json.loads(request.body)
             target_url = URLModel(**json_data)
-            response = generate_valid_links(target_url=target_url.url)
+            response = generate_valid_links(target_url=target_url.url, force_fresh=bool(target_url.force_fresh))
             return Response({
                 "message": f"Valid links for {target_url.url}: {response}"
             })
@@ -216,7 +239,7 @@ class ImageReview(APIView):
     
     def get(self, request):
         from PIL import Image
-        from core.llm.config import ApiClient
+        from core.llm.config import get_api_client
         import requests
         from io import BytesIO
         import asyncio
@@ -236,7 +259,12 @@ class ImageReview(APIView):
                     "message": f"Error opening image: {e}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
-            issue_identify_by_llm = asyncio.run(ApiClient().generate_content_for_image(image=image))
+            issue_identify_by_llm = run_async(get_api_client().generate_content_for_image(image=image))
+            if issue_identify_by_llm is None:
+                return Response(
+                    {"error": "LLM review is unavailable, try again later"},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
             llm_response = json.loads(issue_identify_by_llm.text)[0]['response']
             return Response({
                 "message": f"Response: {llm_response}"
@@ -246,8 +274,136 @@ class ImageReview(APIView):
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        finally:
-            # Clean up the reports directory
-            if os.path.exists("reports"):
-                shutil.rmtree("reports")
-                print("Deleted reports directory")
\ No newline at end of file
+
+
+class JobSubmitView(APIView):
+    """Queue a long-running analysis and return its job id straight away."""
+    def post(self, request, kind):
+        try:
+            if kind not in dict(AnalysisJob.KIND_CHOICES):
+                return Response(
+                    {"error": f"Unknown job kind: {kind}"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if not request.body:
+                return Response(
+                    {"error": "Request body must be JSON"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            json_data = json.loads(request.body)
+            target_url = URLModel(**json_data)
+            user = request.user if request.user.is_authenticated else None
+            job = submit_job(kind, target_url, user=user)
+            return Response({
+                "job_id": str(job.job_id),
+                "status": job.status,
+                "status_url": reverse('job-status', kwargs={'job_id': job.job_id}),
+                "result_url": reverse('job-result', kwargs={'job_id': job.job_id}),
+            }, status=status.HTTP_202_ACCEPTED)
+
+        except json.JSONDecodeError:
+            return Response(
+                {"error": "Invalid JSON format"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValidationError as ve:
+            return Response(
+                {"error": ve.errors()},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+def get_user_job(request, job_id):
+    jobs = AnalysisJob.objects.filter(job_id=job_id)
+    if request.user.is_authenticated:
+        jobs = jobs.filter(user_email=request.user)
+    return jobs.first()
+
+
+class JobStatusView(APIView):
+    def get(self, request, job_id):
+        job = get_user_job(request, job_id)
+        if job is None:
+            return Response(
+                {"error": "Job not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if job.status == AnalysisJob.STATUS_PENDING:
+            ensure_workers_started()
+        return Response(AnalysisJobSerializer(job).data)
+
+
+class JobResultView(APIView):
+    def get(self, request, job_id):
+        job = get_user_job(request, job_id)
+        if job is None:
+            return Response(
+                {"error": "Job not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if job.status != AnalysisJob.STATUS_SUCCEEDED:
+            return Response(
+                {"error": f"Job is {job.status}", "status": job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not job.result_path or not os.path.isdir(job.result_path):
+            return Response(
+                {"error": "Job result has expired"},
+                status=status.HTTP_410_GONE
+            )
+        return workspace_zip_response(job.result_path, filename=f"{job.kind}_{job.job_id}.zip")
+
+
+# Every metric view also takes ?source=pagespeed|local, PERFORMANCE_METRICS_SOURCE by default
+class MetricLatestView(APIView):
+    """Newest stored run of a URL: ?url=...[&strategy=mobile|desktop]."""
+    def get(self, request):
+        url = request.query_params.get('url')
+        if not url:
+            return Response({"error": "url is required"}, status=status.HTTP_400_BAD_REQUEST)
+        runs = metric_history.latest(url, request.query_params.get('strategy'), request.query_params.get('source'))
+        if not runs:
+            return Response({"error": "No metrics recorded for this URL"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"url": url, "runs": runs})
+
+
+class MetricP75View(APIView):
+    """75th percentile of one metric over a window: ?url=...&metric=lcp[&strategy=mobile][&days=28]."""
+    def get(self, request):
+        url, metric = request.query_params.get('url'), request.query_params.get('metric')
+        if not url or not metric:
+            return Response({"error": "url and metric are required"}, status=status.HTTP_400_BAD_REQUEST)
+        strategy = request.query_params.get('strategy', 'mobile')
+        max_days = settings.METRIC_HISTORY_RETENTION_DAYS
+        try:
+            days = float(request.query_params.get('days', 28))
+        except ValueError:
+            days = math.nan
+        # NaN fails both comparisons
+        if not 0 < days <= max_days:
+            return Response(
+                {"error": f"days must be a number above 0 and at most {max_days:g}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        result = metric_history.percentile_75(url, metric, strategy, days, request.query_params.get('source'))
+        if result is None:
+            return Response({"error": "No samples in this window"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"url": url, "metric": metric, "strategy": strategy, "days": days, **result})
+
+
+class MetricDeltaView(APIView):
+    """Change of every metric between the last two runs: ?url=...[&strategy=mobile|desktop]."""
+    def get(self, request):
+        url = request.query_params.get('url')
+        if not url:
+            return Response({"error": "url is required"}, status=status.HTTP_400_BAD_REQUEST)
+        runs = metric_history.delta(url, request.query_params.get('strategy'), request.query_params.get('source'))
+        if not runs:
+            return Response({"error": "Fewer than two runs recorded for this URL"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"url": url, "runs": runs})
@@ -0,0 +1,44 @@
+import os
+import shutil
+import uuid
+import logging
+from typing import Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorkspace:
+    """Job-scoped directory holding every artifact written by one analysis run.
+
+    Layout is ``<WORKSPACE_ROOT>/<job_id>/reports/...`` so archives keep the
+    ``reports/`` prefix clients already expect, while concurrent runs never share a path.
+    """
+
+    def __init__(self, job_id: Optional[str] = None, root: Optional[str] = None):
+        self.job_id = str(job_id or uuid.uuid4())
+        self.root = str(root or settings.WORKSPACE_ROOT)
+        self.path = os.path.join(self.root, self.job_id)
+        self.reports_dir = os.path.join(self.path, 'reports')
+        os.makedirs(self.reports_dir, exist_ok=True)
+
+    def subdir(self, *parts: str) -> str:
+        """Return (and create) a directory below this workspace's reports folder."""
+        path = os.path.join(self.reports_dir, *parts)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def cleanup(self):
+        """Delete this workspace, leaving other jobs' directories alone."""
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
+            logger.info(f"Deleted workspace {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+    def __repr__(self):
+        return f"<JobWorkspace(job_id={self.job_id}, path={self.path})>"
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 import authapp.config as conf
@@ -207,3 +208,139 @@ SESSION_COOKIE_SAMESITE = "None"
 SESSION_COOKIE_SECURE = True  # Needed for SameSite=None
 CSRF_COOKIE_SAMESITE = "None"
 CSRF_COOKIE_SECURE = True
+
+# Background analysis jobs (see core/jobs.py)
+JOB_WORKER_COUNT = int(os.getenv('JOB_WORKER_COUNT', 2))
+JOB_WORKERS_IN_PROCESS = os.getenv('JOB_WORKERS_IN_PROCESS', 'true').lower() == 'true'
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 120))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 2))
+JOB_RESULT_TTL_SECONDS = int(os.getenv('JOB_RESULT_TTL_SECONDS', 24 * 60 * 60))
+
+# Every analysis run writes into its own <WORKSPACE_ROOT>/<job_id>/ directory, <job_id>-<attempt> for queued jobs (see core/workspace.py)
+WORKSPACE_ROOT = Path(os.getenv('WORKSPACE_ROOT', BASE_DIR / 'workspaces'))
+
+# Warm WebDriver pool (see core/automation/driver_pool.py)
+WEBDRIVER_REMOTE_URL = os.getenv(
+    'WEBDRIVER_REMOTE_URL',
+    f"http://{os.getenv('SELENIUM_HOST', 'selenium')}:{os.getenv('SELENIUM_PORT', '4444')}/wd/hub"
+)
+WEBDRIVER_POOL_SIZE = int(os.getenv('WEBDRIVER_POOL_SIZE', 4))
+# Open the sessions when the server or `manage.py runworkers` starts (see core/apps.py)
+WEBDRIVER_POOL_WARM_UP = os.getenv('WEBDRIVER_POOL_WARM_UP', 'true').lower() == 'true'
+WEBDRIVER_MAX_USES = int(os.getenv('WEBDRIVER_MAX_USES', 50))
+WEBDRIVER_MAX_HEAP_GROWTH_MB = float(os.getenv('WEBDRIVER_MAX_HEAP_GROWTH_MB', 256))
+WEBDRIVER_LEASE_TIMEOUT = float(os.getenv('WEBDRIVER_LEASE_TIMEOUT', 120))
+# Every blocking Selenium call runs on a dedicated executor with a per-operation timeout
+WEBDRIVER_EXECUTOR_WORKERS = int(os.getenv('WEBDRIVER_EXECUTOR_WORKERS', WEBDRIVER_POOL_SIZE * 2))
+WEBDRIVER_OPERATION_TIMEOUT = float(os.getenv('WEBDRIVER_OPERATION_TIMEOUT', 30))
+WEBDRIVER_PAGE_LOAD_TIMEOUT = float(os.getenv('WEBDRIVER_PAGE_LOAD_TIMEOUT', 60))
+WEBDRIVER_SESSION_TIMEOUT = float(os.getenv('WEBDRIVER_SESSION_TIMEOUT', 90))
+
+# 'parallel' captures each device viewport on its own driver, 'serial' resizes one tab per URL
+SCREENSHOT_CAPTURE_MODE = os.getenv('SCREENSHOT_CAPTURE_MODE', 'parallel')
+SCREENSHOT_MAX_CONCURRENCY = int(os.getenv('SCREENSHOT_MAX_CONCURRENCY', WEBDRIVER_POOL_SIZE))
+# Screenshots are captured over CDP into memory: png, jpeg or webp (quality applies to jpeg/webp)
+SCREENSHOT_FORMAT = os.getenv('SCREENSHOT_FORMAT', 'png')
+SCREENSHOT_QUALITY = int(os.getenv('SCREENSHOT_QUALITY', 80))
+# Write screenshots into the job workspace (and so into the archive); off keeps them in memory only
+SCREENSHOT_KEEP_ARTIFACTS = os.getenv('SCREENSHOT_KEEP_ARTIFACTS', 'true').lower() == 'true'
+
+# Perceptual-hash cache for LLM screenshot reviews (see core/llm/review_cache.py)
+LLM_REVIEW_CACHE_ENABLED = os.getenv('LLM_REVIEW_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_REVIEW_CACHE_PERSISTENT = os.getenv('LLM_REVIEW_CACHE_PERSISTENT', 'true').lower() == 'true'
+LLM_REVIEW_CACHE_TTL_SECONDS = int(os.getenv('LLM_REVIEW_CACHE_TTL_SECONDS', 24 * 60 * 60))
+LLM_REVIEW_CACHE_MAX_ENTRIES = int(os.getenv('LLM_REVIEW_CACHE_MAX_ENTRIES', 1024))
+# Hamming distance (bits out of 64) still counted as the same screenshot; the DB index guarantees recall up to 3
+LLM_REVIEW_CACHE_MAX_DISTANCE = int(os.getenv('LLM_REVIEW_CACHE_MAX_DISTANCE', 2))
+
+# Screenshots sent to the LLM in one multimodal request (1 = one request per screenshot),
+# capped by the inline payload size
+LLM_REVIEW_BATCH_SIZE = int(os.getenv('LLM_REVIEW_BATCH_SIZE', 3))
+LLM_REVIEW_BATCH_MAX_BYTES = int(os.getenv('LLM_REVIEW_BATCH_MAX_BYTES', 15 * 1024 * 1024))
+
+# Gemini quota the LLM scheduler (core/llm/scheduler.py) keeps every worker under
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', 15))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', 1_000_000))
+LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', 120))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 4))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv('LLM_BACKOFF_BASE_SECONDS', 1))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv('LLM_BACKOFF_MAX_SECONDS', 60))
+# Consecutive failures that open the circuit, and how long it stays open before a probe request
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('LLM_CIRCUIT_FAILURE_THRESHOLD', 5))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv('LLM_CIRCUIT_RESET_SECONDS', 30))
+# Longest a call waits for a slot before giving up
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 300))
+
+# How often the per-job JSONL result sink fsyncs (core/result_sink.py)
+RESULT_SINK_FSYNC_INTERVAL = float(os.getenv('RESULT_SINK_FSYNC_INTERVAL', 1))
+
+# LLM link rankings are reused for the same site and link set (core/llm/ranking_cache.py);
+# past the TTL a ranking is still served for STALE_SECONDS while it is refreshed in the background
+LINK_RANKING_CACHE_ENABLED = os.getenv('LINK_RANKING_CACHE_ENABLED', 'true').lower() == 'true'
+LINK_RANKING_CACHE_TTL_SECONDS = int(os.getenv('LINK_RANKING_CACHE_TTL_SECONDS', 6 * 60 * 60))
+LINK_RANKING_CACHE_STALE_SECONDS = int(os.getenv('LINK_RANKING_CACHE_STALE_SECONDS', 7 * 24 * 60 * 60))
+
+# Identical in-flight analyses are coalesced (core/singleflight.py); finished results are
+# reused for this long. Screenshots hold image bytes, so they are kept only briefly.
+SINGLEFLIGHT_MEMO_SECONDS = float(os.getenv('SINGLEFLIGHT_MEMO_SECONDS', 30))
+SINGLEFLIGHT_CAPTURE_MEMO_SECONDS = float(os.getenv('SINGLEFLIGHT_CAPTURE_MEMO_SECONDS', 5))
+
+# Link crawler and health checks (core/scrape/crawler.py)
+CRAWLER_USER_AGENT = os.getenv('CRAWLER_USER_AGENT', 'Mozilla/5.0 (compatible; trryfix-bot/1.0)')
+LINK_CHECK_CONCURRENCY = int(os.getenv('LINK_CHECK_CONCURRENCY', 50))
+LINK_CHECK_PER_HOST = int(os.getenv('LINK_CHECK_PER_HOST', 8))
+LINK_CHECK_TIMEOUT = float(os.getenv('LINK_CHECK_TIMEOUT', 10))
+LINK_CHECK_DNS_CACHE_SECONDS = int(os.getenv('LINK_CHECK_DNS_CACHE_SECONDS', 300))
+# Global budget per crawl: links checked at most, and seconds spent checking them
+LINK_CHECK_MAX_LINKS = int(os.getenv('LINK_CHECK_MAX_LINKS', 300))
+LINK_CHECK_TIME_BUDGET = float(os.getenv('LINK_CHECK_TIME_BUDGET', 60))
+# Link health cache: a check is trusted for a TTL that depends on its status, then re-checked
+# with If-None-Match/If-Modified-Since; rows unchecked for RETENTION seconds are purged
+LINK_HEALTH_CACHE_ENABLED = os.getenv('LINK_HEALTH_CACHE_ENABLED', 'true').lower() == 'true'
+LINK_HEALTH_TTL_OK_SECONDS = int(os.getenv('LINK_HEALTH_TTL_OK_SECONDS', 24 * 60 * 60))
+LINK_HEALTH_TTL_CLIENT_ERROR_SECONDS = int(os.getenv('LINK_HEALTH_TTL_CLIENT_ERROR_SECONDS', 60 * 60))
+LINK_HEALTH_TTL_ERROR_SECONDS = int(os.getenv('LINK_HEALTH_TTL_ERROR_SECONDS', 5 * 60))
+LINK_HEALTH_CACHE_RETENTION_SECONDS = int(os.getenv('LINK_HEALTH_CACHE_RETENTION_SECONDS', 7 * 24 * 60 * 60))
+# Crawl budget: link depth from the start page, pages fetched, seconds, and pages fetched at once
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', 2))
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', 50))
+CRAWL_TIME_BUDGET = float(os.getenv('CRAWL_TIME_BUDGET', 30))
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', 8))
+# Pages are parsed while they download and cut off past this size
+CRAWL_MAX_PAGE_BYTES = int(os.getenv('CRAWL_MAX_PAGE_BYTES', 5 * 1024 * 1024))
+
+# How generate_valid_links ranks links: 'llm' sends every live link to Gemini, 'hybrid' sends
+# the top LINK_RANKING_CANDIDATES of the local pre-ranker, 'heuristic' uses the pre-ranker only
+LINK_RANKING_MODE = os.getenv('LINK_RANKING_MODE', 'hybrid')
+LINK_RANKING_CANDIDATES = int(os.getenv('LINK_RANKING_CANDIDATES', 25))
+
+# PageSpeed Insights client (core/lighthouse/pagespeed.py). Point PAGESPEED_API_URL at
+# `manage.py pagespeedstub` to run against recorded payloads instead of Google
+PAGESPEED_API_URL = os.getenv('PAGESPEED_API_URL', 'https://www.googleapis.com/pagespeedonline/v5/runPagespeed')
+PAGESPEED_API_KEY = os.getenv('PAGESPEED_API_KEY', '')
+PAGESPEED_CONCURRENCY = int(os.getenv('PAGESPEED_CONCURRENCY', 4))
+PAGESPEED_TIMEOUT = float(os.getenv('PAGESPEED_TIMEOUT', 120))
+PAGESPEED_MAX_RETRIES = int(os.getenv('PAGESPEED_MAX_RETRIES', 2))
+PAGESPEED_BACKOFF_BASE_SECONDS = float(os.getenv('PAGESPEED_BACKOFF_BASE_SECONDS', 2))
+PAGESPEED_BACKOFF_MAX_SECONDS = float(os.getenv('PAGESPEED_BACKOFF_MAX_SECONDS', 30))
+# Lighthouse categories to run, comma-separated; they are part of the cache key
+PAGESPEED_CATEGORIES = [c for c in os.getenv('PAGESPEED_CATEGORIES', 'performance').split(',') if c]
+# PageSpeed cache: fresh for TTL, served while refreshing for STALE more, LRU-evicted past MAX_BYTES
+PAGESPEED_CACHE_ENABLED = os.getenv('PAGESPEED_CACHE_ENABLED', 'true').lower() == 'true'
+PAGESPEED_CACHE_TTL_SECONDS = int(os.getenv('PAGESPEED_CACHE_TTL_SECONDS', 6 * 60 * 60))
+PAGESPEED_CACHE_STALE_SECONDS = int(os.getenv('PAGESPEED_CACHE_STALE_SECONDS', 24 * 60 * 60))
+PAGESPEED_CACHE_MAX_BYTES = int(os.getenv('PAGESPEED_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Where performance numbers come from: 'pagespeed' (Google's API) or 'local' (Chrome sessions from
+# the driver pool, core/lighthouse/local_vitals.py); both produce the same report shape
+PERFORMANCE_METRICS_SOURCE = os.getenv('PERFORMANCE_METRICS_SOURCE', 'pagespeed')
+# Local runs apply Lighthouse's mobile/desktop network and CPU throttling; measuring several pages at
+# once skews TBT, so they run one at a time per event loop by default
+LOCAL_VITALS_THROTTLING = os.getenv('LOCAL_VITALS_THROTTLING', 'true').lower() == 'true'
+LOCAL_VITALS_CONCURRENCY = int(os.getenv('LOCAL_VITALS_CONCURRENCY', 1))
+# A page is measured once no long task has ended for QUIET seconds, or after SETTLE_TIMEOUT
+LOCAL_VITALS_QUIET_SECONDS = float(os.getenv('LOCAL_VITALS_QUIET_SECONDS', 3))
+LOCAL_VITALS_SETTLE_TIMEOUT = float(os.getenv('LOCAL_VITALS_SETTLE_TIMEOUT', 20))
+# Metric history: raw samples are kept RAW_DAYS, then folded into daily means kept until RETENTION_DAYS
+METRIC_HISTORY_RAW_DAYS = float(os.getenv('METRIC_HISTORY_RAW_DAYS', 30))
+METRIC_HISTORY_RETENTION_DAYS = float(os.getenv('METRIC_HISTORY_RETENTION_DAYS', 365))